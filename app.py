@@ -1,6 +1,11 @@
 import streamlit as st
 from streamlit.components.v1 import html
 
+from utils import warmup
+
+# Imports, fonts and connections for the AI pages, off the request path
+warmup.start()
+
 html(
   """
   <script>
@@ -0,0 +1,98 @@
+"""Concurrent TTS-style requests: executor-wrapped blocking calls vs the shared async loop.
+
+    python -m benchmarks.aio_bench [--requests 32] [--latency 0.3]
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from utils import aio
+
+PAYLOAD = {"contents": [{"parts": [{"text": "Sing these words in a pop style: hello"}]}]}
+
+
+def stub_server(latency):
+
+    class SlowTts(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency)
+            body = json.dumps({"candidates": [{"content": {"parts": [{"inlineData": {"data": "AAAA"}}]}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        request_queue_size = 128  # The default of 5 drops bursts of concurrent connects
+
+    server = Server(("127.0.0.1", 0), SlowTts)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def executor_wrapped(url, n, workers):
+    # The old shape: asyncio.run per job, blocking post in a thread pool
+    pool = ThreadPoolExecutor(max_workers=workers)
+
+    async def one():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, lambda: requests.post(url, json=PAYLOAD, timeout=10))
+
+    async def all_():
+        return await asyncio.gather(*(one() for _ in range(n)))
+
+    try:
+        return asyncio.run(all_())
+    finally:
+        pool.shutdown()
+
+
+def shared_loop(url, n):
+    async def all_():
+        return await asyncio.gather(*(aio.post_json(url, PAYLOAD, timeout=10) for _ in range(n)))
+
+    return aio.run(all_())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    server = stub_server(args.latency)
+    url = f"http://127.0.0.1:{server.server_port}/tts"
+
+    print(f"{'pipeline':<28}{'threads':>8}{'wall s':>9}{'req/s':>8}")
+    for name, threads, fn in [
+        ("executor, 4 threads", 4, lambda: executor_wrapped(url, args.requests, 4)),
+        (f"executor, {args.requests} threads", args.requests, lambda: executor_wrapped(url, args.requests, args.requests)),
+        ("shared async loop", 1, lambda: shared_loop(url, args.requests)),
+    ]:
+        start = time.perf_counter()
+        responses = fn()
+        wall = time.perf_counter() - start
+        assert all(r.status_code == 200 for r in responses)
+        print(f"{name:<28}{threads:>8}{wall:>9.2f}{args.requests / wall:>8.1f}")
+
+    print("aio stats:", aio.stats())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Audio helper hot paths against stored baselines: a regression gate before optimising them.
+
+    python -m benchmarks.audio_hotpaths [--seconds 10 60 600] [--check | --update-baseline]
+
+Times every helper the pages run on each generation or upload, on synthetic
+signals of 10 s to 10 minutes in mono and stereo:
+
+    safe_read_audio, load_audio_energy   utils.waveform, on a 44.1 kHz WAV file
+    to_wav_bytes                         utils.audio_io (singify's convert_to_wav_bytes)
+    pcm_to_wav                           utils.audio_io, raw 24 kHz PCM
+    inline_audio_to_wav                  utils.audio_io (the old convert_to_wav), base64 + MIME
+    write_wav                            utils.audio_io (the old save_wave_file), to a file
+
+Each case runs until it has at least ``--min-runs`` runs and a second of
+wall time, and the fastest run is kept: noise only ever adds time, so the
+minimum is far steadier than the median. Machines differ, so a memory-copy
+calibration is stored next to the baseline, and the baseline is scaled up
+on a slower machine (never down). ``--check`` exits non-zero when any case is more than
+``--threshold`` times its baseline twice in a row (a flagged case is
+measured again, for longer, before it counts); ``--update-baseline``
+rewrites benchmarks/baselines/audio_hotpaths.json.
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from utils.audio_io import inline_audio_to_wav, pcm_to_wav, to_wav_bytes, write_wav
+from utils.waveform import load_audio_energy, safe_read_audio
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "audio_hotpaths.json")
+
+UPLOAD_RATE = 44100
+TTS_RATE = 24000
+TTS_MIME = f"audio/L16;codec=pcm;rate={TTS_RATE}"
+
+# Sub-millisecond cases are mostly timer noise; ignore drift below this
+NOISE_MS = 0.5
+
+CALIBRATION_BYTES = 64 * 2 ** 20
+
+
+def pcm(seconds, channels, rate):
+    """Interleaved 16-bit PCM: a swelling tone, slightly detuned per channel."""
+    t = np.arange(int(seconds * rate)) / rate
+    swell = 0.3 + 0.7 * np.abs(np.sin(2 * np.pi * 0.7 * t))
+    y = np.stack([np.sin(2 * np.pi * (220 + 3 * c) * t) * swell for c in range(channels)], axis=1)
+    return (y * 12000).astype("<i2").tobytes()
+
+
+def timed(fn, min_runs, min_seconds, max_runs):
+    """Fastest run of ``fn()`` in milliseconds, after one warm-up call."""
+    fn()
+    times = []
+    started = time.perf_counter()
+    while len(times) < max_runs and (len(times) < min_runs or time.perf_counter() - started < min_seconds):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+def slower(ms, expected, threshold):
+    return ms > expected * threshold and ms - expected > NOISE_MS
+
+
+def calibrate():
+    """Milliseconds to copy 64 MB, the unit timings are compared in."""
+    buf = np.ones(CALIBRATION_BYTES, dtype=np.uint8)
+    return timed(lambda: buf.copy(), 20, 1.0, 200)
+
+
+def cases(seconds, channels, tmp):
+    """``{hot path: fn}`` for one signal; inputs are built once, outside the timing."""
+    layout = "stereo" if channels == 2 else "mono"
+    upload = pcm_to_wav(pcm(seconds, channels, UPLOAD_RATE), rate=UPLOAD_RATE, channels=channels)
+    upload_path = os.path.join(tmp, f"upload-{seconds}-{layout}.wav")
+    with open(upload_path, "wb") as f:
+        f.write(upload)
+
+    tts = pcm(seconds, channels, TTS_RATE)
+    tts_b64 = base64.b64encode(tts).decode()
+    out_path = os.path.join(tmp, "out.wav")
+
+    return {
+        "safe_read_audio": lambda: safe_read_audio(upload_path),
+        "load_audio_energy": lambda: load_audio_energy(upload_path),
+        "to_wav_bytes": lambda: to_wav_bytes(upload),
+        "pcm_to_wav": lambda: pcm_to_wav(tts, channels=channels),
+        "inline_audio_to_wav": lambda: inline_audio_to_wav(tts_b64, TTS_MIME),
+        "write_wav": lambda: write_wav(out_path, tts, channels=channels),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, nargs="+", default=[10, 60, 600])
+    parser.add_argument("--min-runs", type=int, default=5)
+    parser.add_argument("--max-runs", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=1.5, help="regression: slower than this many times the baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any case regressed against the baseline")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    baseline = {"calibration_ms": None, "cases": {}}
+    if os.path.exists(BASELINE):
+        with open(BASELINE, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    calibration = calibrate()
+    # Scale the stored timings to a slower machine, never down to a faster
+    # one: the copy speed swings between runs on the same machine, and file
+    # writes do not follow it, so shrinking the baseline caused false alarms
+    speed = calibration / baseline["calibration_ms"] if baseline["calibration_ms"] else 1.0
+    scale = max(speed, 1.0)
+    print(f"calibration: {calibration:.2f} ms per 64 MB copy"
+          + (f" ({speed:.2f}x the baseline machine)" if baseline["calibration_ms"] else "") + "\n")
+    print(f"{'case':<44}{'ms':>10}{'baseline':>10}{'ratio':>8}")
+
+    results = {}
+    regressed = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for seconds in args.seconds:
+            for channels in (1, 2):
+                layout = "stereo" if channels == 2 else "mono"
+                for path, fn in cases(seconds, channels, tmp).items():
+                    name = f"{path}/{seconds}s-{layout}"
+                    ms = timed(fn, args.min_runs, 1.0, args.max_runs)
+                    results[name] = round(ms, 3)
+
+                    base = baseline["cases"].get(name)
+                    if base is None:
+                        print(f"{name:<44}{ms:>10.2f}{'-':>10}{'-':>8}")
+                        continue
+                    expected = base * scale
+                    flag = ""
+                    if slower(ms, expected, args.threshold):
+                        # One unlucky stretch of runs is not a regression
+                        ms = min(ms, timed(fn, args.min_runs * 3, 3.0, args.max_runs))
+                        results[name] = round(ms, 3)
+                        flag = "  (re-measured)"
+                        if slower(ms, expected, args.threshold):
+                            regressed.append(name)
+                            flag = "  REGRESSED"
+                    ratio = ms / expected
+                    print(f"{name:<44}{ms:>10.2f}{expected:>10.2f}{ratio:>7.2f}x{flag}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        # Cases not rerun are kept, rescaled to this machine's calibration
+        kept = {name: round(ms * speed, 3) for name, ms in baseline["cases"].items()}
+        with open(BASELINE, "w", encoding="utf-8") as f:
+            json.dump({"calibration_ms": round(calibration, 3), "cases": {**kept, **results}},
+                      f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nbaseline written to {os.path.relpath(BASELINE)}")
+
+    if args.check and regressed:
+        print(f"\n{len(regressed)} hot path(s) regressed beyond {args.threshold}x: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Compare utils.audio_io against the per-page WAV helpers it replaced.
+
+    python -m benchmarks.audio_io_bench [--seconds 60] [--repeat 20]
+
+The legacy helpers below are verbatim copies of what the pages used to ship
+(save_wave / save_wave_file / pcm_to_wav / write_pcm_as_wav / convert_to_wav),
+including the base64 decode each call site did before handing PCM over.
+"""
+
+import argparse
+import base64
+import io
+import os
+import struct
+import tempfile
+import time
+import tracemalloc
+import wave
+
+from utils.audio_io import PcmBuffer, pcm_to_wav, write_wav
+
+
+# ---------------- LEGACY ----------------
+def legacy_save_wave(filename, pcm_data, channels=1, rate=24000, sample_width=2):
+    with wave.open(filename, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sample_width)
+        wf.setframerate(rate)
+        wf.writeframes(pcm_data)
+
+
+def legacy_save_wave_file(pcm_data, channels=1, rate=24000, sample_width=2):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sample_width)
+        wf.setframerate(rate)
+        wf.writeframes(pcm_data)
+    buffer.seek(0)
+    return buffer
+
+
+def legacy_pcm_to_wav(pcm_bytes, sample_rate=24000, channels=1, sample_width=2):
+    import numpy as np
+
+    pcm_array = np.frombuffer(pcm_bytes, dtype=np.int16)
+
+    wav_buffer = io.BytesIO()
+    with wave.open(wav_buffer, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sample_width)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm_array.tobytes())
+
+    return wav_buffer.getvalue()
+
+
+def legacy_convert_to_wav(audio_data, sample_rate=24000, bits_per_sample=16):
+    data_size = len(audio_data)
+    block_align = bits_per_sample // 8
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16, 1, 1,
+        sample_rate, sample_rate * block_align, block_align, bits_per_sample,
+        b"data", data_size,
+    )
+    return header + audio_data
+
+
+# ---------------- CASES ----------------
+def make_payload(seconds):
+    pcm = os.urandom(seconds * 24000 * 2)
+    return pcm, base64.b64encode(pcm).decode()
+
+
+def cases(pcm, b64, path, chunks):
+    return {
+        "aipodcast file": (
+            lambda: legacy_save_wave(path, base64.b64decode(b64)),
+            lambda: write_wav(path, b64),
+        ),
+        "text2audio buffer": (
+            lambda: legacy_save_wave_file(base64.b64decode(b64 + "=" * (-len(b64) % 4))),
+            lambda: io.BytesIO(pcm_to_wav(b64)),
+        ),
+        "singify bytes": (
+            lambda: legacy_pcm_to_wav(base64.b64decode(b64)),
+            lambda: pcm_to_wav(b64),
+        ),
+        "singperfect file": (
+            lambda: legacy_save_wave(path, pcm),
+            lambda: write_wav(path, pcm),
+        ),
+        "audiostory stream": (
+            lambda: legacy_convert_to_wav(b"".join(list(chunks))),
+            lambda: _stream_into_buffer(chunks),
+        ),
+    }
+
+
+def _stream_into_buffer(chunks):
+    buf = PcmBuffer()
+    for chunk in chunks:
+        buf.append(chunk)
+    return buf.wav_bytes()
+
+
+def measure(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=60, help="length of synthetic 24 kHz mono audio")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pcm, b64 = make_payload(args.seconds)
+    chunk_size = 24000 * 2  # ~1 s per streamed chunk
+    chunks = [pcm[i:i + chunk_size] for i in range(0, len(pcm), chunk_size)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.wav")
+
+        print(f"{args.seconds}s of PCM ({len(pcm) / 1e6:.1f} MB), {args.repeat} runs each\n")
+        print(f"{'case':<20}{'legacy ms':>12}{'new ms':>10}{'speedup':>9}{'legacy peak MB':>16}{'new peak MB':>13}")
+
+        for name, (old, new) in cases(pcm, b64, path, chunks).items():
+            old_t, old_mem = measure(old, args.repeat)
+            new_t, new_mem = measure(new, args.repeat)
+            print(
+                f"{name:<20}{old_t * 1e3:>12.2f}{new_t * 1e3:>10.2f}{old_t / new_t:>8.1f}x"
+                f"{old_mem / 1e6:>16.1f}{new_mem / 1e6:>13.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Cold start per page: import time and first render in a fresh interpreter.
+
+    python -m benchmarks.cold_start [--pages app aipodcast ...] [--repeat 3]
+
+Each measurement starts a new Python process with ``-X importtime``, imports
+Streamlit (which every server has loaded before the first session), then
+renders the page once with AppTest, as the first visitor after a wake-up
+would. "render ms" is that first run; "imports ms" is the part of it spent
+importing modules Streamlit had not already loaded; the heaviest of those
+are listed by top-level package.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+
+PAGES = ["app", "aipodcast", "text2audio", "singify", "singperfect", "audiostory", "ailearner", "usage"]
+
+MARKER = "cold_start: render"
+
+# Runs in the child; stdout carries the result, stderr the import timings
+CHILD = """
+import json, sys, time
+import logging
+logging.disable(logging.WARNING)
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({path!r}, default_timeout=120)
+at.secrets.update({secrets!r})
+print({marker!r}, file=sys.stderr, flush=True)
+start = time.perf_counter()
+at.run()
+render = time.perf_counter() - start
+print(json.dumps({{"render": render, "exception": [e.message for e in at.exception]}}))
+"""
+
+SECRETS = {**{f"KEY_{i}": f"fake-key-{i}" for i in range(1, 12)}, "youtube": "fake-youtube-key"}
+
+
+def page_path(page):
+    return os.path.abspath("app.py" if page == "app" else os.path.join("pages", f"{page}.py"))
+
+
+def parse_importtime(stderr):
+    """``{top-level package: cumulative ms}`` for imports after the marker."""
+    packages = Counter()
+    seen = False
+    for line in stderr.splitlines():
+        if line.startswith(MARKER):
+            seen = True
+            continue
+        if not seen or not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented; only top-level ones add up without overlap
+        if not name.startswith("  "):
+            try:
+                packages[name.strip().split(".")[0]] += int(cumulative) / 1000
+            except ValueError:
+                pass
+    return packages
+
+
+def measure(page):
+    code = CHILD.format(path=page_path(page), secrets=SECRETS, marker=MARKER)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, timeout=300, cwd=os.getcwd())
+    if proc.returncode or not proc.stdout.strip():
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "no output")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result["render"] * 1000, parse_importtime(proc.stderr), result["exception"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", nargs="+", default=PAGES, choices=PAGES)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh processes per page; the median is shown")
+    parser.add_argument("--top", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'page':<13}{'render ms':>11}{'imports ms':>12}  heaviest imports")
+    for page in args.pages:
+        runs = []
+        for _ in range(args.repeat):
+            try:
+                runs.append(measure(page))
+            except Exception as e:
+                print(f"{page:<13}  failed: {e}")
+                break
+        if not runs:
+            continue
+
+        runs.sort(key=lambda r: r[0])
+        render, packages, exceptions = runs[len(runs) // 2]
+        heaviest = ", ".join(f"{name} {ms:.0f}" for name, ms in packages.most_common(args.top))
+        print(f"{page:<13}{render:>11.0f}{sum(packages.values()):>12.0f}  {heaviest}")
+        for message in exceptions[:1]:
+            print(f"{'':<13}  exception: {message.splitlines()[0]}")
+
+
+if __name__ == "__main__":
+    main()
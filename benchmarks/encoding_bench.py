@@ -0,0 +1,44 @@
+"""Size and encode time per download format for a synthetic voice-like signal.
+
+    python -m benchmarks.encoding_bench [--seconds 60 300]
+"""
+
+import argparse
+import math
+import struct
+
+from utils.audio_io import DEFAULT_RATE, pcm_to_wav
+from utils.encoding import DEFAULT_FORMATS, encode, ffmpeg_available
+
+
+def synthetic_wav(seconds, rate=DEFAULT_RATE):
+    # A few drifting harmonics with a syllable-rate envelope compress roughly like speech
+    samples = []
+    for n in range(seconds * rate):
+        t = n / rate
+        f0 = 140 + 30 * math.sin(2 * math.pi * 0.3 * t)
+        env = 0.5 + 0.5 * math.sin(2 * math.pi * 4 * t)
+        v = sum(math.sin(2 * math.pi * f0 * k * t) / k for k in (1, 2, 3))
+        samples.append(int(9000 * env * v))
+    return pcm_to_wav(struct.pack(f"<{len(samples)}h", *samples), rate=rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, nargs="+", default=[60, 300])
+    args = parser.parse_args()
+
+    if not ffmpeg_available():
+        raise SystemExit("ffmpeg not found on PATH")
+
+    print(f"{'length':>8}{'format':>8}{'size MB':>10}{'vs WAV':>9}{'encode s':>10}")
+    for seconds in args.seconds:
+        wav = synthetic_wav(seconds)
+        print(f"{seconds:>7}s{'wav':>8}{len(wav) / 1e6:>10.2f}{'1.00':>9}{'-':>10}")
+        for fmt in DEFAULT_FORMATS:
+            out = encode(wav, fmt)
+            print(f"{seconds:>7}s{fmt:>8}{out.size / 1e6:>10.2f}{out.size / len(wav):>9.2f}{out.seconds:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Per-key fault injection: what failover costs each page's key rotation.
+
+    python -m benchmarks.failover_bench [--faults 429 timeout malformed partial]
+                                        [--pages aipodcast ...] [--check | --update-baseline]
+
+For every page and fault, all but ``--healthy`` of the 11 keys answer every
+request with that fault: 429 RESOURCE_EXHAUSTED, a hang past the attempt
+timeout, a 200 whose body the page cannot use, or a stream that dies
+halfway. The page's ``pipeline_bench`` scenario then runs ``--repeats``
+times in a row, so rotation can learn from earlier 429s as it would in a
+live server. Per case it reports time to success, wasted calls (upstream
+requests that hit a fault) per run and failed runs, next to a fault-free run.
+
+Attempt timeouts are scaled down through the pages' own ``[timeouts]``
+secrets, so a hung key costs about a second rather than minutes. Key order
+is seeded, which keeps wasted calls repeatable: ``--check`` compares them and
+the timings with benchmarks/baselines/failover.json and exits non-zero on a
+regression; ``--update-baseline`` rewrites that file.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+from benchmarks.fake_gemini import FAULTS, Behaviour, FakeGemini
+from benchmarks.pipeline_bench import SCENARIOS, SECRETS, percentile, session
+from utils import http_session, metering
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "failover.json")
+
+KEYS = [SECRETS[f"KEY_{i}"] for i in range(1, 12)]
+
+# Roughly a second per attempt whatever the model, and never less
+TIMEOUTS = {"scale": 0.02, "min_attempt": 1.0}
+
+# A case regresses when it is this much worse than its baseline
+SLOWER = 1.5
+SLOWER_SECONDS = 0.5
+MORE_WASTED = 1.25
+MORE_WASTED_CALLS = 1.0
+
+
+def run_case(fake, page, fault, healthy, repeats, seed):
+    fake.behaviour.faults = {} if fault == "none" else {key: fault for key in KEYS[healthy:]}
+    # Fresh quota state, so one case's 429s do not reorder the next case's keys
+    metering._meter = metering.Meter()
+    random.seed(seed)
+
+    seconds = []
+    failed = 0
+    before = fake.stats.copy()
+    for i in range(repeats):
+        at = session(page, secrets={"timeouts": {page: TIMEOUTS}})
+        start = time.perf_counter()
+        try:
+            SCENARIOS[page](at, i)
+            seconds.append(time.perf_counter() - start)
+        except Exception:
+            failed += 1
+
+    wasted = sum(fake.stats[name] - before[name] for name in FAULTS)
+    return {
+        "seconds": round(percentile(seconds, 0.5), 3) if seconds else None,
+        "wasted": round(wasted / repeats, 2),
+        "failed": failed,
+    }
+
+
+def regressions(case, base):
+    """Reasons ``case`` is worse than ``base``; empty if it is not."""
+    found = []
+    if case["failed"] > base["failed"]:
+        found.append(f"failed {base['failed']} -> {case['failed']}")
+    if case["wasted"] > base["wasted"] * MORE_WASTED + MORE_WASTED_CALLS:
+        found.append(f"wasted {base['wasted']} -> {case['wasted']}")
+    if base["seconds"] is not None and (
+            case["seconds"] is None or case["seconds"] > base["seconds"] * SLOWER + SLOWER_SECONDS):
+        found.append(f"seconds {base['seconds']} -> {case['seconds']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--faults", nargs="+", default=list(FAULTS), choices=list(FAULTS))
+    parser.add_argument("--pages", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--healthy", type=int, default=2, help="keys left without the fault")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true", help="exit 1 if any case regressed against the baseline")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE, encoding="utf-8") as f:
+            baseline = json.load(f)["cases"]
+
+    # A hung key only has to outlast the scaled-down attempt timeout
+    behaviour = Behaviour(latency=args.latency, sigma=0.2, hang=30, seed=args.seed)
+    results = {}
+    failures = []
+
+    with FakeGemini(behaviour) as fake:
+        fake.intercept(http_session.session(), "https://www.googleapis.com", "https://api.github.com")
+        print(f"{len(KEYS) - args.healthy} of {len(KEYS)} keys faulty, {args.repeats} runs per case\n")
+        print(f"{'page':<13}{'fault':<11}{'ok':>4}{'p50 s':>8}{'+s':>7}{'wasted':>8}{'failed':>8}  baseline")
+
+        for page in args.pages:
+            clean = None
+            for fault in ["none"] + args.faults:
+                case = run_case(fake, page, fault, args.healthy, args.repeats, args.seed)
+                name = f"{page}/{fault}"
+                results[name] = case
+
+                if fault == "none":
+                    clean = case["seconds"]
+                extra = case["seconds"] - clean if case["seconds"] is not None and clean is not None else None
+                base = baseline.get(name)
+                verdict = "-"
+                if base:
+                    found = regressions(case, base)
+                    verdict = "REGRESSED: " + ", ".join(found) if found else "ok"
+                    if found:
+                        failures.append(name)
+
+                seconds = f"{case['seconds']:.2f}" if case["seconds"] is not None else "-"
+                extra = f"{extra:+.2f}" if extra is not None else "-"
+                print(f"{page:<13}{fault:<11}{args.repeats - case['failed']:>4}{seconds:>8}{extra:>7}"
+                      f"{case['wasted']:>8.2f}{case['failed']:>8}  {verdict}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        settings = {"healthy": args.healthy, "repeats": args.repeats, "latency": args.latency,
+                    "seed": args.seed, "timeouts": TIMEOUTS}
+        with open(BASELINE, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "cases": {**baseline, **results}}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nbaseline written to {os.path.relpath(BASELINE)}")
+
+    if args.check and failures:
+        print(f"\n{len(failures)} case(s) regressed: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""Local stand-in for the Gemini API, for offline benchmarks and load tests.
+
+    python -m benchmarks.fake_gemini [--port 8765] [--latency 0.4] [--rate-limited 0.1]
+    GOOGLE_GEMINI_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+
+Implements ``models/{model}:generateContent`` and
+``models/{model}:streamGenerateContent?alt=sse`` closely enough for the genai
+SDK and the raw REST call in singify: text, JSON-schema answers (one
+Markdown string per schema property), and 24 kHz PCM audio when
+``responseModalities`` asks for it, each with ``usageMetadata``.
+
+Latency is drawn from a lognormal around ``latency`` seconds; streams then
+trickle ``chunks`` pieces ``chunk_interval`` apart. ``rate_limited`` answers
+that share of requests with 429 RESOURCE_EXHAUSTED. ``faults`` maps an API
+key to a fault applied to every request with that key (see ``FAULTS``).
+
+Pages pick the server up from ``GOOGLE_GEMINI_BASE_URL``, which the genai
+SDK reads itself; ``FakeGemini`` sets it while running. ``intercept`` also
+points the shared HTTP session's YouTube and GitHub searches at it.
+"""
+
+import argparse
+import base64
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from requests.adapters import HTTPAdapter
+
+RATE = 24000
+AUDIO_MIME = f"audio/L16;codec=pcm;rate={RATE}"
+
+# Speech pace of the synthetic audio, and a cap so huge prompts stay cheap
+SECONDS_PER_WORD = 0.4
+MAX_AUDIO_SECONDS = 120
+
+WORDS = ("pitch rhythm breath melody practice lesson chapter story voice tempo "
+         "harmony verse chorus river mountain journey python module project week").split()
+
+# 429: rate limited; timeout: never answers in time; malformed: 200 with a
+# body the page cannot use; partial: a stream that dies halfway
+FAULTS = ("429", "timeout", "malformed", "partial")
+
+PATH = re.compile(r"/v1beta/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)$")
+
+
+@dataclass
+class Behaviour:
+    latency: float = 0.3
+    sigma: float = 0.4
+    chunks: int = 8
+    chunk_interval: float = 0.02
+    words: int = 250
+    rate_limited: float = 0.0
+    hang: float = 600.0
+    faults: dict = field(default_factory=dict)
+    seed: int = 0
+
+
+def _text(n, rng):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def _pcm(seconds):
+    t = np.arange(int(seconds * RATE)) / RATE
+    y = 0.3 * np.sin(2 * np.pi * 220 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    return (y * 32767).astype("<i2").tobytes()
+
+
+def _prompt(body):
+    """(words of text, bytes of inline data) in a generateContent request."""
+    words = 0
+    inline = 0
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            words += len(str(part.get("text", "")).split())
+            data = (part.get("inlineData") or part.get("inline_data") or {}).get("data", "")
+            inline += len(data) * 3 // 4
+    return words, inline
+
+
+def _usage(prompt_words, inline_bytes, text_words=0, audio_seconds=0.0):
+    audio_tokens = int(audio_seconds * 25)
+    prompt = int(prompt_words * 1.3) + inline_bytes // 1000
+    candidates = int(text_words * 1.3) + audio_tokens
+    usage = {"promptTokenCount": prompt, "candidatesTokenCount": candidates, "totalTokenCount": prompt + candidates}
+    if audio_tokens:
+        usage["candidatesTokensDetails"] = [{"modality": "AUDIO", "tokenCount": audio_tokens}]
+    return usage
+
+
+class FakeGemini:
+    """``with FakeGemini(Behaviour(...)) as fake:`` serves on ``fake.url``."""
+
+    def __init__(self, behaviour=None, port=0):
+        self.behaviour = behaviour or Behaviour()
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.behaviour.seed)
+        self._server = self._make_server(port)
+        self._previous_env = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def delay(self):
+        b = self.behaviour
+        with self._lock:
+            return b.latency * math.exp(self._rng.gauss(0, b.sigma)) if b.latency else 0.0
+
+    def rate_limited(self):
+        with self._lock:
+            return self._rng.random() < self.behaviour.rate_limited
+
+    # ---------------- ANSWERS ----------------
+    def chunks(self, model, body):
+        """Response chunks (dicts) for a request; one chunk for generateContent."""
+        b = self.behaviour
+        config = body.get("generationConfig", {})
+        prompt_words, inline_bytes = _prompt(body)
+        rng = random.Random(prompt_words * 7919 + inline_bytes)
+
+        if "AUDIO" in [m.upper() for m in config.get("responseModalities", [])]:
+            seconds = min(max(prompt_words * SECONDS_PER_WORD, 1.0), MAX_AUDIO_SECONDS)
+            pcm = _pcm(seconds)
+            n = max(b.chunks, 1)
+            step = -(-len(pcm) // n) // 2 * 2
+            parts = [pcm[i:i + step] for i in range(0, len(pcm), step)]
+            chunks = [{"inlineData": {"mimeType": AUDIO_MIME, "data": base64.b64encode(p).decode()}} for p in parts]
+            usage = _usage(prompt_words, inline_bytes, audio_seconds=seconds)
+
+        elif config.get("responseMimeType") == "application/json":
+            names = list((config.get("responseSchema") or {}).get("properties", {})) or ["text"]
+            answer = json.dumps({name: f"## {name}\n\n" + _text(b.words // len(names) + 40, rng) for name in names})
+            chunks = [{"text": answer}]
+            usage = _usage(prompt_words, inline_bytes, text_words=b.words)
+
+        else:
+            text = _text(b.words, rng)
+            n = max(b.chunks, 1)
+            step = -(-len(text) // n)
+            chunks = [{"text": text[i:i + step]} for i in range(0, len(text), step)]
+            usage = _usage(prompt_words, inline_bytes, text_words=b.words)
+
+        out = [{"candidates": [{"content": {"role": "model", "parts": [part]}, "index": 0}], "modelVersion": model}
+               for part in chunks]
+        out[-1]["candidates"][0]["finishReason"] = "STOP"
+        out[-1]["usageMetadata"] = usage
+        return out
+
+    @staticmethod
+    def merge(chunks):
+        """One generateContent body from stream chunks (audio parts joined)."""
+        parts = [c["candidates"][0]["content"]["parts"][0] for c in chunks]
+        if "inlineData" in parts[0]:
+            pcm = b"".join(base64.b64decode(p["inlineData"]["data"]) for p in parts)
+            part = {"inlineData": {"mimeType": AUDIO_MIME, "data": base64.b64encode(pcm).decode()}}
+        else:
+            part = {"text": "".join(p["text"] for p in parts)}
+        merged = json.loads(json.dumps(chunks[-1]))
+        merged["candidates"][0]["content"]["parts"] = [part]
+        return merged
+
+    # ---------------- SERVER ----------------
+    def _make_server(self, port):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type="application/json"):
+                data = json.dumps(body).encode() if not isinstance(body, bytes) else body
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                # The search APIs ailearner calls next to Gemini
+                url = urlsplit(self.path)
+                query = parse_qs(url.query).get("q", [""])[0]
+                n = int(parse_qs(url.query).get("maxResults", parse_qs(url.query).get("per_page", ["10"]))[0])
+                fake.count("search")
+                time.sleep(fake.delay())
+                if url.path.endswith("/youtube/v3/search"):
+                    items = [{"id": {"videoId": f"vid{i}"}, "snippet": {"title": f"{query} lesson {i}"}} for i in range(n)]
+                elif url.path.endswith("/search/repositories"):
+                    items = [{"full_name": f"example/{query.replace(' ', '-')}-{i}", "html_url": f"https://github.com/example/{i}",
+                              "description": f"{query} project {i}"} for i in range(n)]
+                else:
+                    return self._send(404, {"message": "not found"})
+                self._send(200, {"items": items})
+
+            def do_POST(self):
+                url = urlsplit(self.path)
+                match = PATH.search(url.path)
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not match:
+                    return self._send(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+
+                key = self.headers.get("x-goog-api-key") or parse_qs(url.query).get("key", [""])[0]
+                fault = fake.behaviour.faults.get(key)
+                stream = match["method"] == "streamGenerateContent"
+                fake.count("requests")
+
+                time.sleep(fake.delay())
+
+                if fault == "timeout":
+                    fake.count("timeout")
+                    time.sleep(fake.behaviour.hang)
+                    return
+                if fault == "429" or fake.rate_limited():
+                    fake.count("429")
+                    return self._send(429, {"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).",
+                                                      "status": "RESOURCE_EXHAUSTED"}})
+                if fault == "malformed":
+                    fake.count("malformed")
+                    return self._send(200, {"candidates": [{"content": {"role": "model", "parts": [{"text": "{\"learning_"}]}}]})
+
+                chunks = fake.chunks(match["model"], body)
+                if not stream:
+                    fake.count("ok")
+                    return self._send(200, fake.merge(chunks))
+
+                # Server-sent events, one JSON chunk per event, chunked so a
+                # partial stream is a broken body rather than a short one
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, chunk in enumerate(chunks):
+                    if fault == "partial" and i >= len(chunks) // 2:
+                        fake.count("partial")
+                        self.close_connection = True
+                        return
+                    event = f"data: {json.dumps(chunk)}\r\n\r\n".encode()
+                    self.wfile.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+                    self.wfile.flush()
+                    if i < len(chunks) - 1:
+                        time.sleep(fake.behaviour.chunk_interval)
+                self.wfile.write(b"0\r\n\r\n")
+                fake.count("ok")
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 128  # The default of 5 drops bursts of concurrent connects
+
+        return Server(("127.0.0.1", port), Handler)
+
+    def intercept(self, session, *prefixes):
+        """Send a requests ``session``'s calls to these URL prefixes here instead."""
+        target = self.url
+
+        class Redirect(HTTPAdapter):
+            def send(self, request, **kwargs):
+                url = urlsplit(request.url)
+                request.url = f"{target}{url.path}?{url.query}"
+                return super().send(request, **kwargs)
+
+        for prefix in prefixes:
+            session.mount(prefix, Redirect())
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self._previous_env = os.environ.get("GOOGLE_GEMINI_BASE_URL")
+        os.environ["GOOGLE_GEMINI_BASE_URL"] = self.url
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._previous_env is None:
+            os.environ.pop("GOOGLE_GEMINI_BASE_URL", None)
+        else:
+            os.environ["GOOGLE_GEMINI_BASE_URL"] = self._previous_env
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--sigma", type=float, default=0.4)
+    parser.add_argument("--rate-limited", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeGemini(Behaviour(latency=args.latency, sigma=args.sigma, rate_limited=args.rate_limited), port=args.port)
+    fake.start()
+    print(f"Fake Gemini on {fake.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(5)
+            print(dict(fake.stats))
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
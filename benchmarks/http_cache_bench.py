@@ -0,0 +1,91 @@
+"""Hit, miss and ETag revalidation of the search cache against a local stub API.
+
+    python -m benchmarks.http_cache_bench [--calls 50]
+"""
+
+import argparse
+import hashlib
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils import http_cache
+from utils.http_cache import ResponseCache, cache_key, normalize_query
+
+ITEMS = [{"full_name": f"owner/repo{i}", "html_url": f"https://example.test/{i}", "description": None} for i in range(15)]
+
+
+class StubSearch(BaseHTTPRequestHandler):
+    requests_seen = 0
+    not_modified = 0
+
+    def do_GET(self):
+        type(self).requests_seen += 1
+        body = json.dumps({"items": ITEMS}).encode()
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+
+        if self.headers.get("If-None-Match") == etag:
+            type(self).not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        time.sleep(0.05)  # Stand in for a real round trip
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def trim(data):
+    return [{"name": i["full_name"], "url": i["html_url"]} for i in data["items"]]
+
+
+def timed(cache, key, url, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        cache.get(key, url, transform=trim)
+    return (time.perf_counter() - start) / calls * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSearch)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/search"
+
+    with tempfile.TemporaryDirectory() as store:
+        key = cache_key("github", q=normalize_query("  Learn   RUST "), n=15)
+        assert key == cache_key("github", q=normalize_query("learn rust"), n=15)
+
+        print(f"{'scenario':<22}{'ms/call':>10}{'upstream':>10}{'304s':>7}")
+
+        def row(name, cache, calls=args.calls):
+            before, before_304 = StubSearch.requests_seen, StubSearch.not_modified
+            ms = timed(cache, key, url, calls)
+            print(f"{name:<22}{ms:>10.2f}{StubSearch.requests_seen - before:>10}"
+                  f"{StubSearch.not_modified - before_304:>7}")
+
+        row("cold miss", ResponseCache(store), calls=1)
+        row("fresh hits", ResponseCache(store))
+        row("expired, revalidate", ResponseCache(store, ttl=0, stale=0))
+        row("stale-while-revalidate", ResponseCache(store, ttl=0, stale=3600))
+        time.sleep(0.5)
+
+    server.shutdown()
+    print("counters:", http_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Per-call latency of bare ``requests`` vs the pooled session, with reuse counters.
+
+    python -m benchmarks.http_session_bench [--calls 200] [--threads 8]
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from utils import http_session
+
+
+class Echo(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real APIs
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(post, url, calls, threads):
+    payload = {"contents": [{"parts": [{"text": "x" * 512}]}]}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda _: post(url, json=payload, timeout=10).raise_for_status(), range(calls)))
+    return (time.perf_counter() - start) / calls * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Echo)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/generate"
+
+    # Loopback hides the TLS handshake, so real-world savings are larger
+    print(f"{'client':<16}{'ms/call':>10}")
+    print(f"{'requests.post':<16}{run(requests.post, url, args.calls, args.threads):>10.2f}")
+    print(f"{'pooled session':<16}{run(http_session.post, url, args.calls, args.threads):>10.2f}")
+    print("session stats:", http_session.stats())
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
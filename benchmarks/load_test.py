@@ -0,0 +1,193 @@
+"""Concurrent AppTest sessions per page against the fake Gemini, to find each page's ceiling.
+
+    python -m benchmarks.load_test [--sessions 1 2 4 8 16] [--latency 0.3]
+                                   [--rate-limited 0.0] [--pages aipodcast ...]
+
+For every N, N sessions of a page start the same scripted interaction as
+``pipeline_bench`` at once (uploads, widget changes, button clicks, waiting
+for the job). Per N it reports click-to-result and per-script-run times,
+memory and temp-file growth per session (measured while the sessions are
+still open), and how key rotation coped: attempts per rotation and failed
+rotations. The ceiling is the first N whose p95 exceeds ``--slo`` times the
+single-session p95, or where any session fails.
+
+AppTest is not safe to run concurrently, so script runs are serialised while
+everything they start (jobs, upstream calls, encodes) overlaps as it would in
+a server. "run p95" is the time inside a script run. Pages that do their
+slow work inside the script (singperfect's feedback stream) queue behind each
+other here more than they would behind Streamlit's script threads.
+"""
+
+import argparse
+import gc
+import logging
+import os
+import resource
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.fake_gemini import Behaviour, FakeGemini
+from benchmarks.pipeline_bench import SCENARIOS, percentile, session
+from utils import http_session, jobs, telemetry
+
+run_seconds = threading.local()
+
+# AppTest swaps process-wide state (the runtime, secrets) for the length of a
+# run, so two runs at once trip over each other
+_run_lock = threading.Lock()
+
+
+def _timed_runs():
+    original = AppTest.run
+
+    def run(self, *args, **kwargs):
+        with _run_lock:
+            start = time.perf_counter()
+            try:
+                return original(self, *args, **kwargs)
+            finally:
+                getattr(run_seconds, "values", []).append(time.perf_counter() - start)
+
+    AppTest.run = run
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        # Peak rather than current, but still shows growth
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def temp_usage():
+    """(files, bytes) in the temp dir and the app's own subdirectories."""
+    root = tempfile.gettempdir()
+    files = 0
+    size = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        if dirpath != root and not os.path.basename(dirpath).startswith("exploreai"):
+            dirnames[:] = []
+            continue
+        for name in filenames:
+            try:
+                size += os.path.getsize(os.path.join(dirpath, name))
+                files += 1
+            except OSError:
+                pass
+    return files, size
+
+
+def rotation_totals(page):
+    rotations = attempts = failed = 0
+    for (p, _, _), row in telemetry.summary().items():
+        if p == page:
+            rotations += row["rotations"]
+            attempts += row["calls"]
+            failed += row["failed"]
+    return rotations, attempts, failed
+
+
+def one_session(page, i, start_line):
+    run_seconds.values = []
+    try:
+        at = session(page)
+    except Exception:
+        start_line.abort()
+        raise
+    start_line.wait()
+    start = time.perf_counter()
+    SCENARIOS[page](at, i)
+    return at, time.perf_counter() - start, run_seconds.values
+
+
+def load(page, n, offset):
+    """Run ``n`` sessions at once; returns a row of measurements."""
+    gc.collect()
+    mem_before = rss_mb()
+    tmp_before = temp_usage()
+    rot_before = rotation_totals(page)
+
+    start_line = threading.Barrier(n)
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        futures = [pool.submit(one_session, page, offset + i, start_line) for i in range(n)]
+        results = []
+        errors = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                errors.append(e)
+
+    # Sessions are still referenced here, as they would be in a live server
+    gc.collect()
+    mem_after = rss_mb()
+    tmp_after = temp_usage()
+    rot_after = rotation_totals(page)
+
+    rotations = rot_after[0] - rot_before[0]
+    row = {
+        "n": n,
+        "ok": len(results),
+        "errors": errors,
+        "seconds": [r[1] for r in results],
+        "runs": [s for r in results for s in r[2]],
+        "mb": (mem_after - mem_before) / n,
+        "files": (tmp_after[0] - tmp_before[0]) / n,
+        "kb": (tmp_after[1] - tmp_before[1]) / n / 1024,
+        "attempts": (rot_after[1] - rot_before[1]) / rotations if rotations else 0.0,
+        "failed": rot_after[2] - rot_before[2],
+    }
+    del results
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--sigma", type=float, default=0.4)
+    parser.add_argument("--rate-limited", type=float, default=0.0)
+    parser.add_argument("--slo", type=float, default=3.0, help="ceiling: p95 above this many times the 1-session p95")
+    parser.add_argument("--pages", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    _timed_runs()
+
+    behaviour = Behaviour(latency=args.latency, sigma=args.sigma, rate_limited=args.rate_limited)
+    with FakeGemini(behaviour) as fake:
+        fake.intercept(http_session.session(), "https://www.googleapis.com", "https://api.github.com")
+        print(f"job workers: {jobs.MAX_WORKERS}, upstream p50 {args.latency}s\n")
+
+        for page in args.pages:
+            print(f"{page}\n{'N':>4}{'ok':>4}{'p50 s':>8}{'p95 s':>8}{'run p95 ms':>12}"
+                  f"{'MB/sess':>9}{'tmp files':>10}{'tmp KB':>9}{'att/rot':>9}{'failed':>8}")
+            baseline = None
+            ceiling = None
+            offset = 0
+
+            for n in args.sessions:
+                row = load(page, n, offset)
+                offset += n
+                p95 = percentile(row["seconds"], 0.95) if row["seconds"] else float("inf")
+                baseline = baseline or p95
+                if ceiling is None and (row["errors"] or p95 > args.slo * baseline):
+                    ceiling = n
+
+                p50 = f"{percentile(row['seconds'], 0.5):.2f}" if row["seconds"] else "-"
+                run_p95 = f"{percentile(row['runs'], 0.95) * 1000:.0f}" if row["runs"] else "-"
+                print(f"{n:>4}{row['ok']:>4}{p50:>8}{p95:>8.2f}{run_p95:>12}"
+                      f"{row['mb']:>9.1f}{row['files']:>10.1f}{row['kb']:>9.0f}{row['attempts']:>9.2f}{row['failed']:>8}")
+                for e in row["errors"][:3]:
+                    print(f"      {type(e).__name__}: {e}")
+
+            print(f"  ceiling: {f'{ceiling} sessions' if ceiling else f'not reached at {args.sessions[-1]}'}\n")
+
+
+if __name__ == "__main__":
+    main()
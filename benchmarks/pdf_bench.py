@@ -0,0 +1,90 @@
+"""Story PDF export: per-call font registration vs the process-wide registry.
+
+    python -m benchmarks.pdf_bench [--lines 400] [--runs 5]
+"""
+
+import argparse
+import io
+import re
+import time
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+from utils.fonts import FONT_DIR, FONTS, paragraph, segment_scripts
+
+CORPORA = {
+    "hindi": ["राजू ने कहा, “चलो जंगल की ओर चलते हैं।”", "बिल्ली धीरे से मुस्कुराई और पेड़ पर चढ़ गई।"],
+    "english": ["Meanwhile the dog kept watch by the river.", "The cat smiled and climbed the tree."],
+    "mixed": ["The lion roared: आज कोई नहीं बचेगा!", "Raju whispered, “चलो Kitty, let’s go.”"],
+}
+
+
+def legacy(text, title):
+    # The shape of the old generate_pdf_reportlab
+    buf = io.BytesIO()
+    pdfmetrics.registerFont(TTFont("LegacyLatin", f"{FONT_DIR}/NotoSans-Regular.ttf"))
+    pdfmetrics.registerFont(TTFont("LegacyDeva", f"{FONT_DIR}/NotoSansDevanagari-Regular.ttf"))
+    doc = SimpleDocTemplate(buf, pagesize=A4)
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name="Latin", fontName="LegacyLatin", fontSize=12))
+    styles.add(ParagraphStyle(name="Deva", fontName="LegacyDeva", fontSize=12))
+    story = [Paragraph(title, styles["Latin"]), Spacer(1, 12)]
+    for line in text.split("\n"):
+        if line.strip():
+            style = styles["Deva"] if re.search(r"[\u0900-\u097F]", line) else styles["Latin"]
+            story.append(Paragraph(line, style))
+            story.append(Spacer(1, 6))
+    doc.build(story)
+    return buf.getvalue()
+
+
+def registry(text, title):
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=A4)
+    story = [paragraph(title), Spacer(1, 12)]
+    for line in text.split("\n"):
+        if line.strip():
+            story.append(paragraph(line))
+            story.append(Spacer(1, 6))
+    doc.build(story)
+    return buf.getvalue()
+
+
+def missing_glyphs(text, per_run):
+    """Characters drawn in a font that has no glyph for them."""
+    cmaps = {name: TTFont(name, f"{FONT_DIR}/{file_name}").face.charToGlyph for name, file_name in FONTS.items()}
+    missing = 0
+    for line in text.split("\n"):
+        if per_run:
+            runs = segment_scripts(line)
+        else:
+            runs = [("Deva" if re.search(r"[\u0900-\u097F]", line) else "Latin", line)]
+        missing += sum(1 for font, run in runs for ch in run if ord(ch) not in cmaps[font])
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=400)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'corpus':<10}{'export':<10}{'ms/run':>10}{'KB':>8}{'missing glyphs':>16}")
+    for corpus, lines in CORPORA.items():
+        text = "\n".join(lines[i % len(lines)] for i in range(args.lines))
+
+        for name, fn in (("legacy", legacy), ("registry", registry)):
+            start = time.perf_counter()
+            for _ in range(args.runs):
+                data = fn(text, "My AI Roleplay")
+            ms = (time.perf_counter() - start) / args.runs * 1000
+            missing = missing_glyphs(text, per_run=fn is registry)
+            print(f"{corpus:<10}{name:<10}{ms:>10.1f}{len(data) / 1024:>8.0f}{missing:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""End-to-end page pipelines against a local fake Gemini: latency percentiles and throughput.
+
+    python -m benchmarks.pipeline_bench [--iterations 5] [--latency 0.3] [--rate-limited 0.1]
+                                        [--pages aipodcast text2audio ...]
+
+Each iteration opens a fresh AppTest session of the page, enters unique
+inputs, clicks the page's generate button and waits for the result to be
+rendered, exactly as a user would. "seconds" is click to result; "calls"
+counts upstream requests per iteration (retries and failovers included).
+Nothing leaves the machine: Gemini, YouTube and GitHub all hit the fake.
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.fake_gemini import Behaviour, FakeGemini
+from utils import http_session, jobs
+from utils.audio_io import pcm_to_wav
+
+SECRETS = {**{f"KEY_{i}": f"fake-key-{i}" for i in range(1, 12)}, "youtube": "fake-youtube-key"}
+
+PAGES_DIR = os.path.abspath("pages")
+
+
+def song(seconds, rate=24000):
+    t = np.arange(int(seconds * rate)) / rate
+    y = np.sin(2 * np.pi * 220 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 2 * t))
+    return pcm_to_wav((y * 12000).astype("<i2").tobytes(), rate=rate)
+
+
+def session(page, timeout=120, secrets=None):
+    at = AppTest.from_file(os.path.join(PAGES_DIR, f"{page}.py"), default_timeout=timeout)
+    at.secrets.update({**SECRETS, **(secrets or {})})
+    at.run()
+    return at
+
+
+def check(at):
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+
+def wait_job(at, state_key, timeout=120):
+    """Block until the page's job finishes, then rerun so its result renders."""
+    job_id = at.session_state[state_key]
+    deadline = time.monotonic() + timeout
+    while True:
+        job = jobs.get(job_id)
+        if job is None or job.finished:
+            break
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{state_key} still running after {timeout}s")
+        time.sleep(0.01)
+    at.run()
+    check(at)
+    return job
+
+
+def button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+
+# ---------------- SCENARIOS ----------------
+# Each takes a fresh session and an iteration number, and drives one
+# generation to completion; the caller times it.
+
+def aipodcast(at, i):
+    at.text_input[0].set_value(f"The history of tea, part {i}")
+    button(at, "Generate Podcast").click()
+    at.run()
+    wait_job(at, "podcast_job")
+    assert at.session_state.audio_wav, "no podcast audio"
+
+
+def text2audio(at, i):
+    at.session_state.input_text = f"Chapter {i}. " + "The quick brown fox jumps over the lazy dog. " * 40
+    at.session_state.text_confirmed = True
+    at.run()
+    button(at, "🎵 Convert to Audio").click()
+    at.run()
+    wait_job(at, "tts_job")
+    assert at.session_state.audio_generated, "no audio"
+
+
+def singify(at, i):
+    at.audio_input[0].upload(f"clip{i}.wav", song(5 + i % 3))
+    at.run()
+    button(at, "🎶 Transcribe & Sing").click()
+    at.run()
+    wait_job(at, "sing_job")
+    assert at.session_state.vocal_wav, "no singing voice"
+
+
+def singperfect(at, i):
+    # Lyrics extraction needs a file_uploader upload, which AppTest lacks;
+    # the reference is injected and the streamed feedback is what is timed
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
+        f.write(song(30))
+    at.session_state.ref_tmp_path = f.name
+    at.session_state.lyrics_text = "la la la\n" * 20
+    at.audio_input[0].upload(f"take{i}.wav", song(10 + i % 3))
+    at.run()
+    check(at)
+    assert at.session_state.feedback_text not in (None, "Evaluation unavailable."), "no feedback"
+
+
+def audiostory(at, i):
+    at.text_area[0].set_value(f"Dog, cat, lion, owl {i}")
+    at.checkbox[0].check()
+    button(at, "Generate Story").click()
+    at.run()
+    wait_job(at, "story_job")
+    assert at.session_state["story"], "no story"
+
+    button(at, "Generate Audio").click()
+    at.run()
+    wait_job(at, "audio_job")
+    assert at.session_state["audio"], "no story audio"
+
+
+def ailearner(at, i):
+    at.text_input[0].set_value(f"Rust programming {i}")
+    at.button[0].click()
+    at.run()
+    wait_job(at, "learner_job")
+    assert at.session_state.learning_plan, "no learning plan"
+
+
+SCENARIOS = {
+    "aipodcast": aipodcast,
+    "text2audio": text2audio,
+    "singify": singify,
+    "singperfect": singperfect,
+    "audiostory": audiostory,
+    "ailearner": ailearner,
+}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3, help="median upstream latency in seconds")
+    parser.add_argument("--sigma", type=float, default=0.4)
+    parser.add_argument("--rate-limited", type=float, default=0.0, help="share of upstream calls answered 429")
+    parser.add_argument("--pages", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    args = parser.parse_args()
+
+    # Pages log every request at INFO and Streamlit warns about deprecations
+    logging.disable(logging.WARNING)
+
+    behaviour = Behaviour(latency=args.latency, sigma=args.sigma, rate_limited=args.rate_limited)
+    with FakeGemini(behaviour) as fake:
+        fake.intercept(http_session.session(), "https://www.googleapis.com", "https://api.github.com")
+
+        print(f"{'page':<13}{'ok':>4}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'per min':>9}{'calls':>7}{'429s':>6}")
+        for page in args.pages:
+            seconds = []
+            before = fake.stats.copy()
+            started = time.perf_counter()
+
+            for i in range(args.iterations):
+                at = session(page)
+                start = time.perf_counter()
+                try:
+                    SCENARIOS[page](at, i)
+                    seconds.append(time.perf_counter() - start)
+                except Exception as e:
+                    print(f"  {page} #{i} failed: {e}")
+
+            elapsed = time.perf_counter() - started
+            calls = (fake.stats["requests"] + fake.stats["search"] - before["requests"] - before["search"]) / args.iterations
+            limited = fake.stats["429"] - before["429"]
+            if not seconds:
+                print(f"{page:<13}{0:>4}{'-':>8}{'-':>8}{'-':>8}{'-':>9}{calls:>7.1f}{limited:>6}")
+                continue
+            print(f"{page:<13}{len(seconds):>4}"
+                  f"{percentile(seconds, 0.5):>8.2f}{percentile(seconds, 0.95):>8.2f}{percentile(seconds, 0.99):>8.2f}"
+                  f"{len(seconds) / elapsed * 60:>9.1f}{calls:>7.1f}{limited:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Script-run time per cheap widget interaction, before and after fragment isolation.
+
+    python -m benchmarks.rerun_bench [--before REV] [--runs 5]
+
+Each page is loaded with realistic input (a long text, a 3-minute reference
+song, a 30-second recording), then one cheap widget is changed repeatedly.
+"full run" is what every interaction used to cost: the whole page script.
+"fragment" is the time spent inside the fragment that owns the widget, which
+is all a fragment-scoped rerun executes in the browser. ``st.fragment`` is
+wrapped to time fragment bodies; AppTest itself always reruns the full script.
+
+``--before`` also times the full run of each page as of that git revision.
+"""
+
+import argparse
+import functools
+import hashlib
+import os
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from utils.audio_io import pcm_to_wav
+
+SECRETS = {f"KEY_{i}": f"fake-key-{i}" for i in range(1, 12)}
+
+fragment_seconds = defaultdict(float)
+
+
+def _timed_fragments():
+    original = st.fragment
+
+    def fragment(func=None, **kwargs):
+        def wrap(fn):
+            @functools.wraps(fn)
+            def timed(*args, **kw):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kw)
+                finally:
+                    fragment_seconds[fn.__name__] += time.perf_counter() - start
+            return original(timed, **kwargs)
+        return wrap(func) if func is not None else wrap
+
+    st.fragment = fragment
+
+
+def song(seconds, rate=24000):
+    t = np.arange(seconds * rate) / rate
+    y = np.sin(2 * np.pi * 220 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 2 * t))
+    return pcm_to_wav((y * 12000).astype("<i2").tobytes(), rate=rate)
+
+
+def _write(data):
+    f = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+    f.write(data)
+    f.close()
+    return f.name
+
+
+# ---------------- SCENARIOS ----------------
+# (page, fragment owning the widget, setup(at), interact(at, i))
+
+def text2audio_setup(at):
+    at.session_state.input_text = "The quick brown fox jumps over the lazy dog. " * 6000
+    at.session_state.text_confirmed = True
+
+
+def text2audio_interact(at, i):
+    box = next(s for s in at.selectbox if s.label == "Select Voice")
+    box.set_value(box.options[i % 2 + 1].split(" – ")[0])
+
+
+def singify_setup(at):
+    at.run()
+    at.audio_input[0].upload("clip.wav", song(30))
+
+
+def singify_interact(at, i):
+    box = next(s for s in at.selectbox if s.label == "Singing Style")
+    box.set_value(["Ballad", "Rap"][i % 2])
+
+
+def singperfect_setup(at):
+    recording = song(30)
+    at.session_state.ref_tmp_path = _write(song(180))
+    at.session_state.lyrics_text = "la la la\n" * 40
+    at.session_state.feedback_text = "Good pitch, steady rhythm."
+    at.session_state.last_recording_hash = hashlib.md5(recording).hexdigest()
+    at.session_state.recorded_file_path = _write(recording)
+    at.run()
+    at.audio_input[0].upload("take.wav", recording)
+
+
+def singperfect_interact(at, i):
+    box = next(s for s in at.selectbox if s.label == "🗣️ Feedback language")
+    box.set_value(["Hindi", "English"][i % 2])
+
+
+SCENARIOS = [
+    ("text2audio", "audio_section", text2audio_setup, text2audio_interact, "voice"),
+    ("singify", "sing_section", singify_setup, singify_interact, "style"),
+    ("singperfect", "feedback_options", singperfect_setup, singperfect_interact, "feedback language"),
+]
+
+
+def measure(path, setup, interact, fragment, runs):
+    at = AppTest.from_file(path, default_timeout=60)
+    at.secrets.update(SECRETS)
+    setup(at)
+    at.run()
+
+    full = []
+    frag = []
+    for i in range(runs):
+        interact(at, i)
+        fragment_seconds.clear()
+        start = time.perf_counter()
+        at.run()
+        full.append(time.perf_counter() - start)
+        frag.append(fragment_seconds.get(fragment))
+        if at.exception:
+            raise RuntimeError(f"{path}: {at.exception[0].message}")
+
+    median = lambda xs: sorted(xs)[len(xs) // 2] * 1000
+    return median(full), (median(frag) if all(f is not None for f in frag) else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--before", help="git revision to time the old pages from")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    _timed_fragments()
+
+    print(f"{'page':<13}{'interaction':<19}{'before ms':>10}{'full run ms':>13}{'fragment ms':>13}")
+    for page, fragment, setup, interact, label in SCENARIOS:
+        path = os.path.abspath(os.path.join("pages", f"{page}.py"))
+        full, frag = measure(path, setup, interact, fragment, args.runs)
+
+        before = "-"
+        if args.before:
+            old = subprocess.run(["git", "show", f"{args.before}:pages/{page}.py"], capture_output=True, check=True).stdout
+            old_path = os.path.join(tempfile.mkdtemp(), f"{page}.py")
+            with open(old_path, "wb") as f:
+                f.write(old)
+            before = f"{measure(old_path, setup, interact, None, args.runs)[0]:.0f}"
+
+        frag_ms = f"{frag:.0f}" if frag is not None else "-"
+        print(f"{page:<13}{label:<19}{before:>10}{full:>13.0f}{frag_ms:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Energy analysis and chart cost vs song length: old per-rerun matplotlib vs cached envelopes.
+
+    python -m benchmarks.waveform_bench [--minutes 0.5 3 10]
+
+The legacy chart columns need matplotlib, which the app no longer depends
+on (``pip install matplotlib``); without it they are shown as "-".
+"""
+
+import argparse
+import importlib.util
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from utils.audio_io import pcm_to_wav
+from utils.waveform import (EnvelopePyramid, comparison_figure, energy_pyramid,
+                            load_audio_energy, safe_read_audio)
+
+
+def legacy_energy(path):
+    # The loop singperfect used to run twice per rerun
+    y, sr = safe_read_audio(path)
+    frame_len = int(0.05 * sr)
+    hop = int(0.025 * sr)
+    energies = np.array([np.mean(np.abs(y[i:i + frame_len])) for i in range(0, len(y) - frame_len, hop)])
+    return energies / np.max(energies)
+
+
+def legacy_chart(ref, user):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 4))
+    ax.plot(ref, label="Reference")
+    ax.plot(user, label="You")
+    ax.legend()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")  # What st.pyplot ships to the browser
+    plt.close(fig)
+    return len(buf.getvalue())
+
+
+def song_file(minutes, rate=24000):
+    t = np.arange(int(minutes * 60 * rate)) / rate
+    y = np.sin(2 * np.pi * 220 * t) * (0.3 + 0.7 * np.abs(np.sin(2 * np.pi * 0.7 * t)))
+    f = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+    f.write(pcm_to_wav((y * 12000).astype("<i2").tobytes(), rate=rate))
+    f.close()
+    return f.name
+
+
+def ms(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, nargs="+", default=[0.5, 3, 10])
+    args = parser.parse_args()
+
+    print(f"{'song':>6}{'legacy energy':>15}{'legacy chart':>14}{'png KB':>8}"
+          f"{'energy':>9}{'pyramid':>9}{'cached':>8}{'chart':>8}{'json KB':>9}")
+    user = song_file(0.5)
+
+    legacy = importlib.util.find_spec("matplotlib") is not None
+    # Keep library import time out of the first row
+    if legacy:
+        legacy_chart(np.ones(10), np.ones(10))
+    comparison_figure({"warm-up": EnvelopePyramid(np.ones(10))})
+
+    for minutes in args.minutes:
+        path = song_file(minutes)
+
+        ref_old, t_old = ms(legacy_energy, path)
+        if legacy:
+            png, t_chart_old = ms(legacy_chart, ref_old, legacy_energy(user))
+            chart_old = f"{t_chart_old:>12.0f}ms{png / 1024:>8.0f}"
+        else:
+            chart_old = f"{'-':>14}{'-':>8}"
+
+        energy, t_energy = ms(load_audio_energy, path)
+        _, t_pyramid = ms(EnvelopePyramid, energy)
+        energy_pyramid(path)
+        energy_pyramid(user)
+        ref, t_cached = ms(energy_pyramid, path)
+        fig, t_chart = ms(comparison_figure, {"Reference": ref, "You": energy_pyramid(user)})
+        payload = len(fig.to_json())
+
+        print(f"{minutes:>5}m{t_old:>13.0f}ms{chart_old}"
+              f"{t_energy:>7.0f}ms{t_pyramid:>7.1f}ms{t_cached:>6.2f}ms{t_chart:>6.0f}ms{payload / 1024:>9.0f}")
+        os.remove(path)
+
+    os.remove(user)
+
+
+if __name__ == "__main__":
+    main()
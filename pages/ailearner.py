@@ -1,14 +1,21 @@
 import streamlit as st
-from google import genai
-import requests
 import json
 import random
+import uuid
 from streamlit.components.v1 import html
 import logging
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import letter
-from io import BytesIO
+from concurrent.futures import FIRST_COMPLETED,ThreadPoolExecutor,wait
+
+from utils import metering,telemetry,warmup
+from utils.cancel import check
+from utils.deadline import Timeouts, payload_size
+from utils.history import PAGE_SIZE,store as history_store
+from utils.http_cache import cache_key,cached_get,normalize_query
+from utils.jobs import JobError
+from utils.streaming import collect_stream,stream_with_key_rotation
+from utils.widgets import job_running, pdf_download, poll_job, start_job
+
+warmup.start()
 
 logging.basicConfig(
 level=logging.INFO,
@@ -75,45 +82,89 @@ YOUTUBE_API_KEY=safe_get_secret("youtube","YouTube API Key")
 GITHUB_TOKEN=st.secrets.get("GITHUB_TOKEN")
 
 # ================= KEY ROTATION =================
+TEXT_MODEL="gemini-2.5-flash-lite"
+
+TIMEOUTS=Timeouts.configured("ailearner",budget=90)
+
+# Sections generated at once; each starts on a different key
+FANOUT_WORKERS=4
+
+# Sections render side by side, so the streamed plan is redrawn by polling
+STREAM_POLL_INTERVAL=0.5
+
 def get_key_rotation_list():
-    return list(api_keys.values())
+    return metering.order(api_keys.values(),TEXT_MODEL)
+
+def section_keys(ordered,slot):
+    """Keys for one fan-out section, from a job's single headroom ordering:
+    key ``slot`` first, so parallel sections start on different keys, then
+    the rest, still best first, as fallbacks."""
+    if not ordered:
+        return ordered
+    slot%=len(ordered)
+    return [ordered[slot]]+ordered[:slot]+ordered[slot+1:]
 
-def gemini_generate(key,prompt):
+def gemini_generate(key,prompt,http_options=None,config=None):
 
-    client=genai.Client(api_key=key)
+    # Imported on first use; the SDK alone is most of a cold page load
+    from google import genai
+
+    client=genai.Client(api_key=key,http_options=http_options)
 
     response=client.models.generate_content(
-    model="gemini-2.5-flash-lite",
-    contents=prompt
+    model=TEXT_MODEL,
+    contents=prompt,
+    config=config
     )
 
     return response.text
 
 
-def generate_with_key_rotation(prompt):
+def generate_with_key_rotation(prompt,cancel=None,keys=None):
 
-    for key in get_key_rotation_list():
-        try:
-            return gemini_generate(key,prompt)
-        except Exception:
-            continue
+    keys=keys or get_key_rotation_list()
+    deadline=TIMEOUTS.start(TEXT_MODEL,payload_size(prompt))
 
-    return "⚠️ All API keys failed"
+    with telemetry.rotation("ailearner",TEXT_MODEL,prompt) as rotation:
+        for idx,key in enumerate(keys):
+            check(cancel,skipped=len(keys)-idx)
+            http_options=deadline.http_options()
+            try:
+                with rotation.attempt(key) as call:
+                    return call.response(gemini_generate(key,prompt,http_options))
+            except Exception:
+                continue
 
+    return "⚠️ All API keys failed"
 
-def decide_with_key_rotation(prompt):
 
-    for key in get_key_rotation_list():
-        try:
-            return json.loads(gemini_generate(key,prompt))
-        except Exception:
-            continue
+def decide_with_key_rotation(prompt,cancel=None,keys=None,config=None):
+
+    keys=keys or get_key_rotation_list()
+    deadline=TIMEOUTS.start(TEXT_MODEL,payload_size(prompt))
+
+    with telemetry.rotation("ailearner",TEXT_MODEL,prompt) as rotation:
+        for idx,key in enumerate(keys):
+            check(cancel,skipped=len(keys)-idx)
+            http_options=deadline.http_options()
+            try:
+                with rotation.attempt(key) as call:
+                    text=call.response(gemini_generate(key,prompt,http_options,config))
+                    try:
+                        return json.loads(text)
+                    except ValueError:
+                        # The key answered; bad JSON is the model's, not the key's.
+                        # Leave it to the per-section fallback instead of asking every key
+                        call.fail("MalformedJSON")
+                        return None
+            except Exception:
+                continue
 
     return None
 
 # ================= SESSION =================
 st.session_state.setdefault("learning_plan","")
-st.session_state.setdefault("history",[])
+st.session_state.setdefault("history_owner",uuid.uuid4().hex)
 st.session_state.setdefault("resource_decision",{})
 st.session_state.setdefault("videos",[])
 st.session_state.setdefault("repos",[])
@@ -122,6 +173,9 @@ st.session_state.setdefault("practice","")
 st.session_state.setdefault("reading","")
 
 # ================= YOUTUBE =================
+# Only the fields we render; keeps responses and cache entries small
+YOUTUBE_FIELDS="items(id/videoId,snippet/title)"
+
 def search_youtube(query,max_results=20):
 
     if not YOUTUBE_API_KEY:
@@ -136,17 +190,22 @@ def search_youtube(query,max_results=20):
         "q":query,
         "key":YOUTUBE_API_KEY,
         "maxResults":max_results,
-        "type":"video"
+        "type":"video",
+        "fields":YOUTUBE_FIELDS
         }
 
-        r=requests.get(url,params=params,timeout=10)
-        r.raise_for_status()
-
-        return [
-        (i["snippet"]["title"],
-        f"https://www.youtube.com/watch?v={i['id']['videoId']}")
-        for i in r.json().get("items",[])
+        videos=cached_get(
+        cache_key("youtube",q=normalize_query(query),n=max_results),
+        url,
+        params=params,
+        transform=lambda data:[
+        [i["snippet"]["title"],
+        f"https://www.youtube.com/watch?v={i['id']['videoId']}"]
+        for i in data.get("items",[])
         ]
+        )
+
+        return [tuple(v) for v in videos]
 
     except Exception:
         return []
@@ -170,43 +229,246 @@ def search_github(query,max_results=15):
         "per_page":max_results
         }
 
-        r=requests.get(url,headers=headers,params=params,timeout=10)
-        r.raise_for_status()
-
-        return [
+        # GitHub has no field mask, so trim to what we render before caching
+        return cached_get(
+        cache_key("github",q=normalize_query(query),n=max_results),
+        url,
+        params=params,
+        headers=headers,
+        transform=lambda data:[
         {
         "name":item["full_name"],
         "url":item["html_url"],
         "description":item["description"] or "No description"
         }
-        for item in r.json().get("items",[])
+        for item in data.get("items",[])
         ]
+        )
 
     except Exception:
         return []
 
 # ================= AI =================
-def generate_learning_plan(context):
-
-    prompt=f"""
-Create a personalized learning plan with:
+PLAN_INSTRUCTIONS="""Create a personalized learning plan with:
 - Weekly roadmap
 - Daily tasks
 - Topics to search on YouTube
-- Practice projects
+- Practice projects"""
+
+def generate_learning_plan(context,cancel=None,keys=None):
+    """Yields the plan as it is written."""
+
+    prompt=f"""
+{PLAN_INSTRUCTIONS}
+
+Context:
+{context}
+"""
+
+    return stream_with_key_rotation(
+    keys or get_key_rotation_list(),
+    TEXT_MODEL,
+    prompt,
+    deadline=TIMEOUTS.start(TEXT_MODEL,payload_size(prompt)),
+    cancel=cancel,
+    page="ailearner"
+    )
+
+
+def simple_llm(prompt,cancel=None,keys=None):
+    return generate_with_key_rotation(prompt,cancel=cancel,keys=keys)
+
+
+# ================= SINGLE CALL =================
+TEXT_SECTIONS=("learning_plan","case_studies","practice","reading")
+
+# Anything shorter than this is treated as a malformed section
+MIN_SECTION_CHARS=40
+
+# A plain dict; the SDK validates it into GenerateContentConfig per call
+SECTIONS_CONFIG={
+"response_mime_type":"application/json",
+"response_schema":{
+"type":"OBJECT",
+"properties":{name:{"type":"STRING"} for name in TEXT_SECTIONS},
+"required":list(TEXT_SECTIONS),
+"property_ordering":list(TEXT_SECTIONS)
+}
+}
+
+def generate_all_sections(goal,context,cancel=None,keys=None):
+
+    prompt=f"""
+You are preparing learning resources. Reply with JSON only; every value is Markdown.
+
+learning_plan: {PLAN_INSTRUCTIONS}
+case_studies: 3 case studies about {goal}
+practice: 5 exercises for {goal}
+reading: A reading guide for {goal}
 
 Context:
 {context}
 """
 
-    return generate_with_key_rotation(prompt)
+    return decide_with_key_rotation(prompt,cancel=cancel,keys=keys,config=SECTIONS_CONFIG)
+
+
+def split_sections(data):
+    """Return (valid sections, names that need regenerating)."""
 
+    if not isinstance(data,dict):
+        return {},list(TEXT_SECTIONS)
 
-def simple_llm(prompt):
-    return generate_with_key_rotation(prompt)
+    valid={}
+    missing=[]
+
+    for name in TEXT_SECTIONS:
+        value=data.get(name)
+        if isinstance(value,str) and len(value.strip())>=MIN_SECTION_CHARS:
+            valid[name]=value
+        else:
+            missing.append(name)
+
+    return valid,missing
+
+
+def generate_resources(job,goal,context,single_call=True):
+
+    token=job.token
+    ordered=get_key_rotation_list()
+
+    # Per-section fallbacks; in single-call mode only used for malformed sections
+    section_tasks={
+    "learning_plan":lambda:collect_stream(job,"learning_plan:stream",generate_learning_plan(context,cancel=token,keys=section_keys(ordered,0))),
+    "case_studies":lambda:simple_llm(f"Give 3 case studies about {goal}",cancel=token,keys=section_keys(ordered,1)),
+    "practice":lambda:simple_llm(f"Create 5 exercises for {goal}",cancel=token,keys=section_keys(ordered,2)),
+    "reading":lambda:simple_llm(f"Create reading guide for {goal}",cancel=token,keys=section_keys(ordered,3))
+    }
+
+    tasks={
+    "videos":lambda:search_youtube(goal),
+    "repos":lambda:search_github(goal)
+    }
+
+    if single_call:
+        tasks["sections"]=lambda:generate_all_sections(goal,context,cancel=token,keys=ordered)
+    else:
+        tasks.update(section_tasks)
+
+    total=len(TEXT_SECTIONS)+2
+    result={}
+    job.update(0.05,"🧠 Generating...")
+
+    pool=ThreadPoolExecutor(max_workers=FANOUT_WORKERS,thread_name_prefix="learner")
+
+    def publish(name,value):
+        result[name]=value
+        # Each section shows up on the page as soon as it lands
+        job.update(len(result)/total,f"✅ {len(result)}/{total} sections ready",**{name:value})
+
+    try:
+        pending={pool.submit(fn):name for name,fn in tasks.items()}
+
+        while pending:
+            done,_=wait(pending,return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name=pending.pop(future)
+
+                try:
+                    value=future.result()
+                except JobError as e:
+                    # One slow section should not throw away the others
+                    value=str(e)
+
+                if name!="sections":
+                    publish(name,value)
+                    continue
+
+                valid,missing=split_sections(value)
+
+                for section,text in valid.items():
+                    publish(section,text)
+
+                for section in missing:
+                    logging.info("ailearner: regenerating malformed section %s",section)
+                    pending[pool.submit(section_tasks[section])]=section
+
+    finally:
+        pool.shutdown(wait=False,cancel_futures=True)
+
+    check(token)
+
+    return result
+
+
+def on_resources_done(result):
+
+    for name,value in result.items():
+        st.session_state[name]=value
+
+    plan=st.session_state.learning_plan
+    history_store().add(st.session_state.history_owner,plan_title(plan),plan)
+
+
+def plan_title(plan):
+
+    for line in plan.splitlines():
+        line=line.strip("#*_ \t")
+        if line:
+            return line[:80]
+
+    return "Learning plan"
+
+
+def render_sections(data):
+
+    if data.get("learning_plan"):
+        st.subheader("📘 Your Learning Plan")
+        st.markdown(data["learning_plan"])
+        st.divider()
+
+    elif data.get("learning_plan:stream"):
+        # Still being written; the poller redraws it as more text arrives
+        st.subheader("📘 Your Learning Plan")
+        st.markdown(data["learning_plan:stream"]+" ▌")
+        st.divider()
+
+    if "videos" in data:
+        st.subheader("📺 Recommended Videos")
+
+        for title,link in data["videos"]:
+            st.markdown(f"- [{title}]({link})")
+
+    if "repos" in data:
+        st.subheader("💻 GitHub Projects")
+
+        for repo in data["repos"]:
+            st.markdown(
+            f"- **[{repo['name']}]({repo['url']})**  \n_{repo['description']}_"
+            )
+
+    if data.get("case_studies"):
+        st.subheader("📚 Case Studies")
+        st.markdown(data["case_studies"])
+
+    if data.get("practice"):
+        st.subheader("🧪 Practice")
+        st.markdown(data["practice"])
+
+    if data.get("reading"):
+        st.subheader("📖 Reading Guide")
+        st.markdown(data["reading"])
 
 # ================= PDF =================
-def create_pdf():
+REPORT_SECTIONS=("learning_plan","videos","repos","case_studies","practice","reading")
+
+def create_pdf(learning_plan,videos,repos,case_studies,practice,reading):
+
+    from io import BytesIO
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph,SimpleDocTemplate,Spacer
 
     buffer=BytesIO()
     doc=SimpleDocTemplate(buffer,pagesize=letter)
@@ -219,14 +481,14 @@ def create_pdf():
 
     story.append(Paragraph("Learning Plan",styles["Heading2"]))
 
-    for line in st.session_state.learning_plan.split("\n"):
+    for line in learning_plan.split("\n"):
         story.append(Paragraph(line,styles["Normal"]))
         story.append(Spacer(1,5))
 
     story.append(Spacer(1,20))
     story.append(Paragraph("Recommended Videos",styles["Heading2"]))
 
-    for title,link in st.session_state.videos:
+    for title,link in videos:
 
         story.append(
         Paragraph(
@@ -238,7 +500,7 @@ def create_pdf():
     story.append(Spacer(1,20))
     story.append(Paragraph("GitHub Projects",styles["Heading2"]))
 
-    for repo in st.session_state.repos:
+    for repo in repos:
 
         story.append(
         Paragraph(
@@ -250,25 +512,25 @@ def create_pdf():
         story.append(Paragraph(repo["description"],styles["Normal"]))
         story.append(Spacer(1,10))
 
-    if st.session_state.case_studies:
+    if case_studies:
 
         story.append(Paragraph("Case Studies",styles["Heading2"]))
 
-        for line in st.session_state.case_studies.split("\n"):
+        for line in case_studies.split("\n"):
             story.append(Paragraph(line,styles["Normal"]))
 
-    if st.session_state.practice:
+    if practice:
 
         story.append(Paragraph("Practice Exercises",styles["Heading2"]))
 
-        for line in st.session_state.practice.split("\n"):
+        for line in practice.split("\n"):
             story.append(Paragraph(line,styles["Normal"]))
 
-    if st.session_state.reading:
+    if reading:
 
         story.append(Paragraph("Reading Guide",styles["Heading2"]))
 
-        for line in st.session_state.reading.split("\n"):
+        for line in reading.split("\n"):
             story.append(Paragraph(line,styles["Normal"]))
 
     doc.build(story)
@@ -304,6 +566,11 @@ with st.form("onboarding"):
     default=["Videos"]
     )
 
+    single_call=st.toggle(
+    "⚡ Fast mode (one AI request for all sections)",
+    value=True
+    )
+
     submitted=st.form_submit_button("🚀 Generate")
 
 # ================= GENERATION =================
@@ -317,67 +584,46 @@ Duration: {duration}
 Style: {', '.join(style)}
 """
 
-    with st.spinner("🧠 Generating..."):
-
-        st.session_state.learning_plan=generate_learning_plan(context)
+    start_job("learner_job","ailearner",generate_resources,goal,context,single_call)
 
-        st.session_state.videos=search_youtube(goal)
-
-        st.session_state.repos=search_github(goal)
-
-        st.session_state.case_studies=simple_llm(f"Give 3 case studies about {goal}")
-
-        st.session_state.practice=simple_llm(f"Create 5 exercises for {goal}")
-
-        st.session_state.reading=simple_llm(f"Create reading guide for {goal}")
-
-        st.session_state.history.append(st.session_state.learning_plan)
+poll_job("learner_job",on_resources_done,label="🧠 Generating...",render_partial=render_sections,interval=STREAM_POLL_INTERVAL)
 
 # ================= DISPLAY =================
-if st.session_state.learning_plan:
+if st.session_state.learning_plan and not job_running("learner_job"):
 
-    st.subheader("📘 Your Learning Plan")
-    st.markdown(st.session_state.learning_plan)
-    st.divider()
-
-    st.subheader("📺 Recommended Videos")
-
-    for title,link in st.session_state.videos:
-        st.markdown(f"- [{title}]({link})")
-
-    st.subheader("💻 GitHub Projects")
-
-    for repo in st.session_state.repos:
-        st.markdown(
-        f"- **[{repo['name']}]({repo['url']})**  \n_{repo['description']}_"
-        )
-
-    st.subheader("📚 Case Studies")
-    st.markdown(st.session_state.case_studies)
-
-    st.subheader("🧪 Practice")
-    st.markdown(st.session_state.practice)
-
-    st.subheader("📖 Reading Guide")
-    st.markdown(st.session_state.reading)
+    render_sections({name:st.session_state[name] for name in REPORT_SECTIONS})
 
     st.divider()
 
 # ================= DOWNLOAD =================
 if st.session_state.learning_plan:
 
-    st.download_button(
-    label="📥 Download Full Learning Report PDF",
-    data=create_pdf(),
-    file_name="AI_Learner_Report.pdf",
-    mime="application/pdf"
+    pdf_download(
+    "Full Learning Report PDF",
+    "AI_Learner_Report.pdf",
+    create_pdf,
+    *(st.session_state[name] for name in REPORT_SECTIONS),
+    key="download_report"
     )
 
 # ================= HISTORY =================
+# Only one page of titles is listed and only toggled plans are loaded
 with st.expander("🗂️ History"):
 
-    for i,h in enumerate(st.session_state.history):
+    owner=st.session_state.history_owner
+    total=history_store().count(owner)
+
+    if not total:
+        st.caption("No learning plans yet.")
+
+    else:
+        pages=(total+PAGE_SIZE-1)//PAGE_SIZE
+        page=st.number_input("Page",1,pages,1,key="history_page")-1 if pages>1 else 0
+
+        for i,(entry_id,created,title,size) in enumerate(history_store().page(owner,page)):
+
+            version=total-page*PAGE_SIZE-i
 
-        st.markdown(f"### Version {i+1}")
-        st.markdown(h)
-        st.divider()
\ No newline at end of file
+            if st.toggle(f"Version {version} · {title}",key=f"history_{entry_id}"):
+                st.markdown(history_store().get(owner,entry_id))
+                st.divider()
\ No newline at end of file
@@ -10,13 +10,19 @@ from streamlit.components.v1 import html
 
 # -----------------------------
 
-from google import genai
-from google.genai import types
-import wave
 import random
-import base64
 import logging
 
+from utils import metering, telemetry, warmup
+from utils.audio_io import pcm_to_wav
+from utils.cancel import check
+from utils.deadline import Timeouts, payload_size
+from utils.jobs import JobError
+from utils.streaming import StreamFailed, collect_stream, stream_with_key_rotation, text_stream
+from utils.widgets import audio_player, job_running, poll_job, start_job
+
+warmup.start()
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s",
@@ -56,6 +62,8 @@ st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 ttsmodel = "gemini-2.5-flash-preview-tts"
 textmodel = "gemini-2.5-flash-lite"
 
+TIMEOUTS = Timeouts.configured("aipodcast", budget=180)
+
 # --- Load API Keys ---
 try:
     api_keys = [
@@ -86,16 +94,9 @@ def map_language_code(language: str) -> str:
         return "bho-IN"
     return "en-US"
 
-# --- WAV Save ---
-def save_wave(filename: str, pcm_data: bytes, channels=1, rate=24000, sample_width=2):
-    with wave.open(filename, "wb") as wf:
-        wf.setnchannels(channels)
-        wf.setsampwidth(sample_width)
-        wf.setframerate(rate)
-        wf.writeframes(pcm_data)
-
 # --- Script Generator ---
-def generate_script(topic: str) -> str:
+def generate_script(topic: str, cancel=None):
+    """Yields the script as it is written."""
 
     prompt = f"""
     Write a friendly and engaging podcast script about "{topic}".
@@ -106,24 +107,18 @@ def generate_script(topic: str) -> str:
     Keep it conversational and natural.
     """
 
-    for key in api_keys:
-        try:
-            client = genai.Client(api_key=key)
-
-            resp = client.models.generate_content(
-                model=textmodel,
-                contents=prompt
-            )
-
-            return resp.text or "Script generation failed."
-
-        except Exception:
-            continue
-
-    return "❌ All API keys exhausted. Please try later."
+    return stream_with_key_rotation(
+        metering.order(api_keys, textmodel),
+        textmodel,
+        prompt,
+        deadline=TIMEOUTS.start(textmodel, payload_size(prompt)),
+        cancel=cancel,
+        failure_message="❌ All API keys exhausted. Please try later.",
+        page="aipodcast"
+    )
 
 # --- Audio Generator ---
-def generate_audio(script_text: str, voice_name="Kore", language="English"):
+def generate_audio(script_text: str, voice_name="Kore", language="English", cancel=None):
 
     if language.lower() == "hindi":
         style_prompt = "Speak this in a warm and expressive Hindi accent."
@@ -134,6 +129,10 @@ def generate_audio(script_text: str, voice_name="Kore", language="English"):
 
     contents = f"{style_prompt}\n\n{script_text}"
 
+    # Deferred: the SDK takes about half a second to import and the form doesn't need it
+    from google import genai
+    from google.genai import types
+
     config = types.GenerateContentConfig(
         response_modalities=["AUDIO"],
         speech_config=types.SpeechConfig(
@@ -146,29 +145,66 @@ def generate_audio(script_text: str, voice_name="Kore", language="English"):
         )
     )
 
-    for key in api_keys:
-        try:
-            client = genai.Client(api_key=key)
+    deadline = TIMEOUTS.start(ttsmodel, payload_size(contents))
 
-            response = client.models.generate_content(
-                model=ttsmodel,
-                contents=contents,
-                config=config
-            )
+    keys = metering.order(api_keys, ttsmodel)
+
+    with telemetry.rotation("aipodcast", ttsmodel, contents) as rotation:
+        for idx, key in enumerate(keys):
+            check(cancel, skipped=len(keys) - idx)
+            http_options = deadline.http_options()
+            try:
+                with rotation.attempt(key) as call:
+                    client = genai.Client(api_key=key, http_options=http_options)
+
+                    response = call.response(client.models.generate_content(
+                        model=ttsmodel,
+                        contents=contents,
+                        config=config
+                    ))
 
-            pcm_data = response.candidates[0].content.parts[0].inline_data.data
+                    pcm_data = response.candidates[0].content.parts[0].inline_data.data
 
-            if isinstance(pcm_data, str):
-                pcm_data = base64.b64decode(pcm_data)
+                return pcm_to_wav(pcm_data)
 
-            filename = "podcast.wav"
-            save_wave(filename, pcm_data)
-            return filename
+            except Exception:
+                continue
 
-        except Exception:
-            continue
+    return None
 
-    return ""
+# --- Podcast Job ---
+def podcast_job(job, topic: str, voice_name: str, language: str):
+    job.update(0.1, "Creating podcast script...")
+
+    try:
+        script = collect_stream(job, "script", generate_script(topic, cancel=job.token))
+    except StreamFailed as e:
+        return {"script": str(e), "audio_wav": None}
+
+    if not script:
+        return {"script": "Script generation failed.", "audio_wav": None}
+
+    job.update(0.4, "Converting to audio...")
+    # The script is already paid for: keep it even if the audio fails
+    try:
+        audio_wav = generate_audio(script, voice_name, language, cancel=job.token)
+    except JobError as e:
+        job.notice(str(e))
+        return {"script": script, "audio_wav": None}
+
+    if audio_wav is None:
+        job.notice("❌ All voice generation servers are busy or unavailable. Please try again later.")
+
+    return {"script": script, "audio_wav": audio_wav}
+
+
+def on_podcast_done(result):
+    st.session_state.script = result["script"]
+    st.session_state.audio_wav = result["audio_wav"]
+
+
+def show_script_stream(partial):
+    st.write_stream(text_stream(partial, "script"))
 
 # --- UI ---
 st.title("🎙️ VoiceVerse AI Podcast Generator")
@@ -177,8 +213,8 @@ st.title("🎙️ VoiceVerse AI Podcast Generator")
 if "script" not in st.session_state:
     st.session_state.script = ""
 
-if "audio_file" not in st.session_state:
-    st.session_state.audio_file = ""
+if "audio_wav" not in st.session_state:
+    st.session_state.audio_wav = None
 
 topic = st.text_input("Enter your podcast topic:")
 language = st.selectbox("Choose a language:", ["English", "Hindi", "Bhojpuri"])
@@ -190,37 +226,32 @@ male_voices = ["Puck", "Charon", "Fenrir"]
 voice = st.selectbox("Choose a voice:", female_voices if gender == "Female" else male_voices)
 
 # --- Generate Button ---
-if st.button("Generate Podcast"):
+inputs = (topic, language, voice)
+
+if st.button("Generate Podcast", disabled=job_running("podcast_job")):
 
     if not topic.strip():
         st.info("✍️ Please enter a topic.")
     else:
-
-        with st.spinner("Creating podcast script..."):
-            script = generate_script(topic)
-            st.session_state.script = script
-            st.session_state.audio_file = ""
-
-        if "❌" not in script:
-            with st.spinner("Converting to audio..."):
-                audio_file = generate_audio(script, voice, language)
-                st.session_state.audio_file = audio_file
+        st.session_state.script = ""
+        st.session_state.audio_wav = None
+        start_job("podcast_job", "aipodcast", podcast_job, topic, voice, language, inputs=inputs)
+
+poll_job(
+    "podcast_job",
+    on_podcast_done,
+    label="Creating podcast script...",
+    render_partial=show_script_stream,
+    inputs=inputs
+)
 
 # --- Persist Script ---
 if st.session_state.script:
     st.text_area("Generated Script", st.session_state.script, height=300)
 
 # --- Persist Audio ---
-if st.session_state.audio_file:
-    st.audio(st.session_state.audio_file)
-
-    with open(st.session_state.audio_file, "rb") as f:
-        st.download_button(
-            "📥 Download Podcast",
-            f,
-            file_name="voiceverse_podcast.wav",
-            mime="audio/wav"
-        )
+if st.session_state.audio_wav:
+    audio_player(st.session_state.audio_wav, "voiceverse_podcast", key="download_podcast")
 
     st.success("🎉 Podcast ready!")
 
@@ -1,17 +1,18 @@
 import streamlit as st
 import io
-import re
 import random
-import struct
-from google import genai
-from google.genai import types
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from streamlit.components.v1 import html
 
+from utils import metering, telemetry, warmup
+from utils.audio_io import PcmBuffer, is_wav_mime_type
+from utils.cancel import Cancelled, check
+from utils.deadline import Timeouts, payload_size
+from utils.streaming import collect_stream, stream_with_key_rotation, text_stream
+from utils.jobs import JobError
+from utils.widgets import audio_player, job_running, pdf_download, poll_job, start_job
+
+warmup.start()
+
 
 # ---------------- UI CLEANUP ----------------
 try:
@@ -47,12 +48,15 @@ st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 GEMMA_MODEL = "gemini-2.5-flash"
 TTS_MODEL = "gemini-2.5-flash-preview-tts"
 
+# Long stories are narrated in one streamed request
+TIMEOUTS = Timeouts.configured("audiostory", budget=420, max_attempt=360)
+
 st.set_page_config(page_title="AI Roleplay Story", layout="wide")
 st.title("AI Roleplay Story Generator")
 
 
 # ---------------- LOAD API KEYS ----------------
-clients = []
+api_keys = []
 
 try:
     api_keys = [
@@ -64,8 +68,6 @@ try:
 
     if not api_keys:
         st.error("⚠️ No API keys configured.")
-    else:
-        clients = [genai.Client(api_key=k) for k in api_keys]
 
 except Exception as e:
     st.error("⚠️ Failed to initialize AI service.")
@@ -73,18 +75,30 @@ except Exception as e:
 
 
 # ---------------- KEY ROTATION ----------------
-def call_with_key_rotation(fn):
-    last_error = None
+# Clients are built per attempt so each one carries that attempt's timeout
+def call_with_key_rotation(fn, deadline, cancel=None, model=TTS_MODEL, request=None):
+    from google import genai
 
-    for idx, client in enumerate(clients):
-        try:
-            return fn(client)
-        except Exception as e:
-            last_error = e
-            print(f"Key {idx+1} failed:", e)
+    keys = metering.order(api_keys, model)
+
+    with telemetry.rotation("audiostory", model, request, kind="stream") as rotation:
+        for idx, key in enumerate(keys):
+            check(cancel, skipped=len(keys) - idx)
+            http_options = deadline.http_options()
+            try:
+                with rotation.attempt(key) as call:
+                    client = genai.Client(api_key=key, http_options=http_options)
+                    result = fn(client, call)
+                    if result is not None:
+                        return call.response(result)
+                    # Answered without audio: another key may not
+                    call.fail("EmptyResponse")
+            except Cancelled:
+                raise
+            except Exception:
+                continue
 
-    st.error("🚫 AI service is busy or unavailable.")
-    return None
+    raise JobError("🚫 AI service is busy or unavailable.")
 
 
 # ---------------- INPUTS ----------------
@@ -127,28 +141,23 @@ def map_language_code(lang):
 
 
 # ---------------- PDF ----------------
+# Fonts and styles are registered once per process; mixed-script lines switch
+# font per run (see utils/fonts.py)
 def generate_pdf_reportlab(text, title="AI Roleplay Story"):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Spacer
 
-    buf = io.BytesIO()
+    from utils.fonts import paragraph
 
-    pdfmetrics.registerFont(TTFont("Latin", "NotoSans-Regular.ttf"))
-    pdfmetrics.registerFont(TTFont("Deva", "NotoSansDevanagari-Regular.ttf"))
+    buf = io.BytesIO()
 
     doc = SimpleDocTemplate(buf, pagesize=A4)
-    styles = getSampleStyleSheet()
-
-    styles.add(ParagraphStyle(name="Latin", fontName="Latin", fontSize=12))
-    styles.add(ParagraphStyle(name="Deva", fontName="Deva", fontSize=12))
 
-    def is_deva(t):
-        return bool(re.search(r'[\u0900-\u097F]', t))
-
-    story = [Paragraph(title, styles["Latin"]), Spacer(1, 12)]
+    story = [paragraph(title), Spacer(1, 12)]
 
     for line in text.split("\n"):
         if line.strip():
-            style = styles["Deva"] if is_deva(line) else styles["Latin"]
-            story.append(Paragraph(line, style))
+            story.append(paragraph(line))
             story.append(Spacer(1, 6))
 
     doc.build(story)
@@ -157,190 +166,172 @@ def generate_pdf_reportlab(text, title="AI Roleplay Story"):
 
 
 # ---------------- STORY GENERATION ----------------
-if st.button("Generate Story"):
-
-    if clients:
-
-        with st.spinner("✨ Creating your story..."):
-
-            def generate_story(client):
-                prompt = (
-                    f"Write a {length} {genre} roleplay story in {language} ONLY. "
-                    f"Introduce characters first ({characters})."
-                )
+def generate_story(length, genre, language, characters, cancel=None):
+    prompt = (
+        f"Write a {length} {genre} roleplay story in {language} ONLY. "
+        f"Introduce characters first ({characters})."
+    )
 
-                resp = client.models.generate_content(
-                    model=GEMMA_MODEL,
-                    contents=[prompt]
-                )
+    return stream_with_key_rotation(
+        metering.order(api_keys, GEMMA_MODEL),
+        GEMMA_MODEL,
+        [prompt],
+        deadline=TIMEOUTS.start(GEMMA_MODEL, payload_size(prompt)),
+        cancel=cancel,
+        failure_message="🚫 AI service is busy or unavailable.",
+        page="audiostory"
+    )
 
-                return resp.text
 
-            story = call_with_key_rotation(generate_story)
+def story_job(job, length, genre, language, characters):
+    job.update(0.1, "✨ Creating your story...")
+    return collect_stream(job, "story", generate_story(length, genre, language, characters, cancel=job.token))
 
-            if story:
-                st.session_state["story"] = story
-                st.session_state["audio"] = None  # Reset old audio
-                st.toast("📖 Story ready!", icon="✅")
 
+def on_story_done(story):
+    if story:
+        st.session_state["story"] = story
+        st.session_state["audio"] = None  # Reset old audio
+        st.toast("📖 Story ready!", icon="✅")
 
-# ---------------- DISPLAY STORY ----------------
-if st.session_state["story"]:
 
+def show_story_stream(partial):
     st.subheader("Story Script")
-    st.write(st.session_state["story"])
+    st.write_stream(text_stream(partial, "story"))
 
-    pdf = generate_pdf_reportlab(st.session_state["story"], "My AI Roleplay")
-
-    st.download_button(
-        "Download Story PDF",
-        pdf,
-        "story.pdf",
-        "application/pdf",
-        key="download_pdf"
-    )
 
+story_inputs = (length, genre, language, characters)
 
-# ---------------- AUDIO HELPERS ----------------
-def parse_audio_mime_type(mime_type: str):
+if st.button("Generate Story", disabled=job_running("story_job")):
 
-    bits_per_sample = 16
-    rate = 24000
+    if api_keys:
+        start_job("story_job", "audiostory.story", story_job, *story_inputs, inputs=story_inputs)
 
-    parts = mime_type.split(";")
+poll_job(
+    "story_job",
+    on_story_done,
+    label="✨ Creating your story...",
+    render_partial=show_story_stream,
+    inputs=story_inputs
+)
 
-    for param in parts:
 
-        param = param.strip()
+# ---------------- DISPLAY STORY ----------------
+if st.session_state["story"] and not job_running("story_job"):
 
-        if param.lower().startswith("rate="):
-            try:
-                rate = int(param.split("=")[1])
-            except:
-                pass
+    st.subheader("Story Script")
+    st.write(st.session_state["story"])
 
-        if "audio/L" in param:
-            try:
-                bits_per_sample = int(param.split("L")[1])
-            except:
-                pass
-
-    return {"bits_per_sample": bits_per_sample, "rate": rate}
-
-
-def convert_to_wav(audio_data: bytes, mime_type: str):
-
-    params = parse_audio_mime_type(mime_type)
-
-    bits_per_sample = params["bits_per_sample"]
-    sample_rate = params["rate"]
-
-    num_channels = 1
-    data_size = len(audio_data)
-    bytes_per_sample = bits_per_sample // 8
-
-    block_align = num_channels * bytes_per_sample
-    byte_rate = sample_rate * block_align
-    chunk_size = 36 + data_size
-
-    header = struct.pack(
-        "<4sI4s4sIHHIIHH4sI",
-        b"RIFF",
-        chunk_size,
-        b"WAVE",
-        b"fmt ",
-        16,
-        1,
-        num_channels,
-        sample_rate,
-        byte_rate,
-        block_align,
-        bits_per_sample,
-        b"data",
-        data_size,
+    # Built only when asked for, then cached by story text
+    pdf_download(
+        "Story PDF",
+        "story.pdf",
+        generate_pdf_reportlab,
+        st.session_state["story"],
+        "My AI Roleplay",
+        key="download_pdf"
     )
 
-    return header + audio_data
-
 
 # ---------------- AUDIO ----------------
-if add_audio and st.session_state["story"] and clients:
+# Rough narration pace, only used to turn streamed seconds into a progress bar
+WORDS_PER_SECOND = 2.5
 
-    if st.button("Generate Audio"):
 
-        with st.spinner("🔊 Generating audio..."):
+def generate_audio(client, call, job, deadline, story, language, voice_choice):
+    from google.genai import types
 
-            def generate_audio(client):
-
-                config = types.GenerateContentConfig(
-                    response_modalities=["AUDIO"],
-                    speech_config=types.SpeechConfig(
-                        language_code=map_language_code(language),
-                        voice_config=types.VoiceConfig(
-                            prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                                voice_name=map_voice(voice_choice)
-                            )
-                        )
-                    )
+    config = types.GenerateContentConfig(
+        response_modalities=["AUDIO"],
+        speech_config=types.SpeechConfig(
+            language_code=map_language_code(language),
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                    voice_name=map_voice(voice_choice)
                 )
+            )
+        )
+    )
 
-                contents = [
-                    types.Content(
-                        role="user",
-                        parts=[types.Part.from_text(text=st.session_state["story"])]
-                    )
-                ]
-
-                audio_chunks = []
-                mime_type = None
-
-                for chunk in client.models.generate_content_stream(
-                    model=TTS_MODEL,
-                    contents=contents,
-                    config=config
-                ):
-
-                    if (
-                        chunk.candidates is None
-                        or chunk.candidates[0].content is None
-                        or chunk.candidates[0].content.parts is None
-                    ):
-                        continue
+    contents = [
+        types.Content(
+            role="user",
+            parts=[types.Part.from_text(text=story)]
+        )
+    ]
 
-                    part = chunk.candidates[0].content.parts[0]
+    expected_seconds = max(len(story.split()) / WORDS_PER_SECOND, 1.0)
+    pcm = None
+    mime_type = None
+
+    for chunk in client.models.generate_content_stream(
+        model=TTS_MODEL,
+        contents=contents,
+        config=config
+    ):
+
+        # Stop pulling the stream as soon as the job is superseded or out of time
+        job.token.raise_if_cancelled()
+        deadline.check()
+        call.usage(chunk.usage_metadata)
+
+        if (
+            chunk.candidates is None
+            or chunk.candidates[0].content is None
+            or chunk.candidates[0].content.parts is None
+        ):
+            continue
+
+        part = chunk.candidates[0].content.parts[0]
+
+        if part.inline_data and part.inline_data.data:
+            if pcm is None:
+                mime_type = part.inline_data.mime_type
+                pcm = PcmBuffer.from_mime_type(mime_type)
+            pcm.append(part.inline_data.data)
+            job.update(
+                min(pcm.duration / expected_seconds, 0.95),
+                f"🔊 {pcm.duration:.0f}s of audio generated..."
+            )
+
+    if pcm is None:
+        return None
+
+    if is_wav_mime_type(mime_type):
+        return pcm.pcm().tobytes()
+
+    return pcm.wav_bytes()
+
+
+def audio_job(job, story, language, voice_choice):
+    deadline = TIMEOUTS.start(TTS_MODEL, payload_size(story))
+    return call_with_key_rotation(
+        lambda client, call: generate_audio(client, call, job, deadline, story, language, voice_choice),
+        deadline,
+        cancel=job.token,
+        request=story
+    )
 
-                    if part.inline_data and part.inline_data.data:
-                        mime_type = part.inline_data.mime_type
-                        audio_chunks.append(part.inline_data.data)
 
-                if not audio_chunks:
-                    return None
+def on_audio_done(audio):
+    if audio:
+        st.session_state["audio"] = audio
 
-                combined_audio = b"".join(audio_chunks)
 
-                if mime_type and "wav" not in mime_type.lower():
-                    combined_audio = convert_to_wav(combined_audio, mime_type)
+if add_audio and st.session_state["story"] and api_keys:
 
-                return combined_audio
+    audio_inputs = (st.session_state["story"], language, voice_choice)
 
-            audio = call_with_key_rotation(generate_audio)
+    if st.button("Generate Audio", disabled=job_running("audio_job")):
+        start_job("audio_job", "audiostory.audio", audio_job, *audio_inputs, inputs=audio_inputs)
 
-            if audio:
-                st.session_state["audio"] = audio
+    poll_job("audio_job", on_audio_done, label="🔊 Generating audio...", inputs=audio_inputs)
 
 
 # ---------- Display Audio ----------
 if st.session_state["audio"]:
 
-    st.audio(st.session_state["audio"])
-
-    st.download_button(
-        "Download Audio",
-        st.session_state["audio"],
-        "story.wav",
-        "audio/wav",
-        key="download_audio"
-    )
+    audio_player(st.session_state["audio"], "story", key="download_audio")
 
 
 st.markdown("---")
\ No newline at end of file
@@ -2,15 +2,19 @@ import streamlit as st
 import base64
 import tempfile
 import random
-import io
-import asyncio
-import soundfile as sf
-from google import genai
-import requests
-import wave
-import numpy as np
+import os
+import hashlib
 from streamlit.components.v1 import html
 
+from utils import aio, metering, telemetry, warmup
+from utils.audio_io import decode_inline_audio, pcm_to_wav, to_wav_bytes
+from utils.cancel import Cancelled, check
+from utils.deadline import Timeouts, payload_size
+from utils.jobs import JobError
+from utils.widgets import audio_player, job_running, poll_job, start_job
+
+warmup.start()
+
 
 html(
   """
@@ -54,6 +58,12 @@ st.title("🎤 Singify")
 st.caption("Record or upload a line → Transcribe → Sing 🎶")
 
 sttmodel = "gemini-2.5-flash"
+ttsmodel = "gemini-2.5-flash-preview-tts"
+
+# Same override the genai SDK honours, so the REST call follows it to a local stand-in
+GEMINI_BASE_URL = os.environ.get("GOOGLE_GEMINI_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+
+TIMEOUTS = Timeouts.configured("singify", budget=120)
 
 # --- API Keys List ---
 api_keys = [
@@ -75,8 +85,8 @@ random.shuffle(api_keys)
 # ---------------- Session State ----------------
 if 'transcript' not in st.session_state:
     st.session_state.transcript = None
-if 'vocal_path' not in st.session_state:
-    st.session_state.vocal_path = None
+if 'vocal_wav' not in st.session_state:
+    st.session_state.vocal_wav = None
 if 'original_path' not in st.session_state:
     st.session_state.original_path = None
 if 'generation_complete' not in st.session_state:
@@ -85,24 +95,15 @@ if 'current_style' not in st.session_state:
     st.session_state.current_style = None
 if 'current_voice' not in st.session_state:
     st.session_state.current_voice = None
-
-# Sidebar
-singing_style = st.selectbox("Singing Style", ["Pop", "Ballad", "Rap", "Soft"])
-voice_option = st.selectbox("Voice", ["Kore", "Charon", "Fenrir", "Aoede"])
-
-audio_bytes = None
-tmp_path = None
+if 'original_digest' not in st.session_state:
+    st.session_state.original_digest = None
 
 # -------------------------
 # Convert audio to WAV
 # -------------------------
 def convert_to_wav_bytes(file_bytes):
     try:
-        with io.BytesIO(file_bytes) as f:
-            data, samplerate = sf.read(f, always_2d=True)
-        out_bytes = io.BytesIO()
-        sf.write(out_bytes, data, samplerate, format='WAV')
-        return out_bytes.getvalue()
+        return to_wav_bytes(file_bytes)
     except Exception:
         st.warning("⚠️ We couldn’t process that audio format. Try another file or re-record.")
         return None
@@ -110,114 +111,113 @@ def convert_to_wav_bytes(file_bytes):
 # -------------------------
 # Audio Input
 # -------------------------
-st.subheader("📤 Choose Audio Input Method")
-tab1, tab2 = st.tabs(["📁 Upload Audio File", "🎙️ Record Audio"])
-
-with tab1:
-    uploaded = st.file_uploader(
-        "Choose an audio file",
-        type=["wav", "mp3", "m4a", "ogg", "flac"]
-    )
-
-    if uploaded:
-        file_bytes = uploaded.read()
-        ext = uploaded.name.split('.')[-1].lower()
-
-        if ext != "wav":
-            with st.spinner("🔄 Converting audio…"):
-                audio_bytes = convert_to_wav_bytes(file_bytes)
-        else:
-            audio_bytes = file_bytes
-
-        if audio_bytes:
-            tmp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-            tmp_path = tmp_file.name
-            with open(tmp_path, "wb") as f:
-                f.write(audio_bytes)
-
-            st.session_state.original_path = tmp_path
-            st.audio(tmp_path, format="audio/wav")
-
-with tab2:
-    recorded_audio_native = st.audio_input("🎙️ Record your voice")
-
-    if recorded_audio_native:
-        audio_bytes = recorded_audio_native.read()
-        tmp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-        tmp_path = tmp_file.name
-        with open(tmp_path, "wb") as f:
-            f.write(audio_bytes)
-        st.session_state.original_path = tmp_path
-        st.audio(tmp_path)
+# Each input is converted and written to disk once, keyed on its content;
+# a new input reruns the whole page so the sing section picks it up
+def use_audio(audio_bytes):
+    digest = hashlib.md5(audio_bytes).hexdigest()
+    if digest == st.session_state.original_digest:
+        return
 
-# -------------------------
-# Friendly TTS (Auto Key Rotation)
-# -------------------------
-async def synthesize_speech(text_prompt, voice_name="Kore"):
-    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-tts:generateContent"
-
-    for key in api_keys:
-        try:
-            headers = {"x-goog-api-key": key, "Content-Type": "application/json"}
-
-            data = {
-                "contents": [{"parts": [{"text": text_prompt}]}],
-                "generationConfig": {
-                    "responseModalities": ["AUDIO"],
-                    "speechConfig": {
-                        "voiceConfig": {
-                            "prebuiltVoiceConfig": {"voiceName": voice_name}
-                        }
-                    }
-                }
-            }
+    tmp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+    with open(tmp_file.name, "wb") as f:
+        f.write(audio_bytes)
 
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None, lambda: requests.post(url, headers=headers, json=data)
-            )
+    st.session_state.original_path = tmp_file.name
+    st.session_state.original_digest = digest
+    st.rerun()
 
-            if response.status_code == 200:
-                audio_base64 = response.json()["candidates"][0]["content"]["parts"][0]["inlineData"]["data"]
-                return base64.b64decode(audio_base64)
 
-        except Exception:
-            continue
+@st.fragment
+def audio_input_section():
+    st.subheader("📤 Choose Audio Input Method")
+    tab1, tab2 = st.tabs(["📁 Upload Audio File", "🎙️ Record Audio"])
 
-    st.error("❌ All voice generation servers are busy or unavailable. Please try again later.")
-    return None
+    with tab1:
+        uploaded = st.file_uploader(
+            "Choose an audio file",
+            type=["wav", "mp3", "m4a", "ogg", "flac"]
+        )
+
+        if uploaded and uploaded.file_id != st.session_state.get("uploaded_file_id"):
+            file_bytes = uploaded.read()
+            ext = uploaded.name.split('.')[-1].lower()
+
+            if ext != "wav":
+                with st.spinner("🔄 Converting audio…"):
+                    audio_bytes = convert_to_wav_bytes(file_bytes)
+            else:
+                audio_bytes = file_bytes
+
+            if audio_bytes:
+                st.session_state.uploaded_file_id = uploaded.file_id
+                use_audio(audio_bytes)
 
+        if uploaded and st.session_state.original_path:
+            st.audio(st.session_state.original_path, format="audio/wav")
+
+    with tab2:
+        recorded_audio_native = st.audio_input("🎙️ Record your voice")
+
+        if recorded_audio_native:
+            use_audio(recorded_audio_native.getvalue())
+            st.audio(st.session_state.original_path)
+
+
+audio_input_section()
 
 # -------------------------
-# PCM → WAV Converter
+# Friendly TTS (Auto Key Rotation)
 # -------------------------
-def pcm_to_wav(pcm_bytes, sample_rate=24000, channels=1, sample_width=2):
-    try:
-        pcm_array = np.frombuffer(pcm_bytes, dtype=np.int16)
+async def synthesize_speech(text_prompt, voice_name="Kore", cancel=None):
+    url = f"{GEMINI_BASE_URL}/v1beta/models/{ttsmodel}:generateContent"
+    deadline = TIMEOUTS.start(ttsmodel, payload_size(text_prompt))
+
+    keys = metering.order(api_keys, ttsmodel)
+
+    with telemetry.rotation("singify", ttsmodel, text_prompt, kind="http") as rotation:
+        for idx, key in enumerate(keys):
+            check(cancel, skipped=len(keys) - idx)
+            timeout = deadline.next_attempt()
+            try:
+                headers = {"x-goog-api-key": key, "Content-Type": "application/json"}
+
+                data = {
+                    "contents": [{"parts": [{"text": text_prompt}]}],
+                    "generationConfig": {
+                        "responseModalities": ["AUDIO"],
+                        "speechConfig": {
+                            "voiceConfig": {
+                                "prebuiltVoiceConfig": {"voiceName": voice_name}
+                            }
+                        }
+                    }
+                }
 
-        wav_buffer = io.BytesIO()
-        with wave.open(wav_buffer, 'wb') as wf:
-            wf.setnchannels(channels)
-            wf.setsampwidth(sample_width)
-            wf.setframerate(sample_rate)
-            wf.writeframes(pcm_array.tobytes())
+                with rotation.attempt(key) as call:
+                    request = aio.post_json(url, data, headers=headers, timeout=timeout)
+                    response = call.response(await cancel.race(request) if cancel else await request)
 
-        return wav_buffer.getvalue()
+                    if response.status_code == 200:
+                        payload = response.json()
+                        call.usage(payload.get("usageMetadata"))
+                        audio_base64 = payload["candidates"][0]["content"]["parts"][0]["inlineData"]["data"]
+                        return decode_inline_audio(audio_base64)
+                    call.fail(f"HTTP{response.status_code}")
 
-    except Exception:
-        st.warning("⚠️ Failed to convert generated audio.")
-        return None
+            except Cancelled:
+                raise
+            except Exception:
+                continue
+
+    return None
 
 
 # -------------------------
 # Transcribe & Sing (Auto Key Rotation)
 # -------------------------
-async def transcribe_and_sing():
-    if not st.session_state.original_path:
-        st.warning("⚠️ Please upload or record audio first.")
-        return
-
-    audio_path = st.session_state.original_path
+# Submitted as a coroutine job: waits on the shared loop, not on an executor thread
+async def transcribe_and_sing(job, audio_path, style, voice):
+    from google import genai
 
     with open(audio_path, "rb") as f:
         audio_data = f.read()
@@ -225,73 +225,110 @@ async def transcribe_and_sing():
     transcript = None
 
     # ---- STT Key Rotation ----
-    for key in api_keys:
-        try:
-            client = genai.Client(api_key=key)
-
-            resp = client.models.generate_content(
-                model=sttmodel,
-                contents=[{
-                    "role": "user",
-                    "parts": [
-                        {"text": "Please transcribe this speech accurately."},
-                        {"inline_data": {"mime_type": "audio/wav", "data": base64.b64encode(audio_data).decode()}}
-                    ]
-                }]
-            )
-
-            transcript = resp.text.strip()
-            break
-
-        except Exception:
-            continue
+    job.update(0.1, "📝 Transcribing…")
+
+    deadline = TIMEOUTS.start(sttmodel, payload_size(audio_data) * 4 // 3)
+
+    keys = metering.order(api_keys, sttmodel)
+
+    with telemetry.rotation("singify", sttmodel, audio_data) as rotation:
+        for idx, key in enumerate(keys):
+            check(job.token, skipped=len(keys) - idx)
+            http_options = deadline.http_options()
+            try:
+                with rotation.attempt(key) as call:
+                    client = genai.Client(api_key=key, http_options=http_options)
+
+                    resp = call.response(await job.token.race(client.aio.models.generate_content(
+                        model=sttmodel,
+                        contents=[{
+                            "role": "user",
+                            "parts": [
+                                {"text": "Please transcribe this speech accurately."},
+                                {"inline_data": {"mime_type": "audio/wav", "data": base64.b64encode(audio_data).decode()}}
+                            ]
+                        }]
+                    )))
+
+                    transcript = resp.text.strip()
+                break
+
+            except Cancelled:
+                raise
+            except Exception:
+                continue
 
     if transcript is None:
-        st.error("❌ We couldn’t transcribe the audio right now. All servers seem busy. Please try again later.")
-        return
+        raise JobError("❌ We couldn’t transcribe the audio right now. All servers seem busy. Please try again later.")
 
-    st.session_state.transcript = transcript
+    result = {"transcript": transcript, "vocal_wav": None, "style": style, "voice": voice}
 
     # ---- TTS ----
-    tts_prompt = f"Sing these words in a {singing_style.lower()} style: {transcript}"
-    pcm = await synthesize_speech(tts_prompt, voice_option)
+    job.update(0.5, "🎶 Singing…", transcript=transcript)
+
+    tts_prompt = f"Sing these words in a {style.lower()} style: {transcript}"
+    pcm = await synthesize_speech(tts_prompt, voice, cancel=job.token)
 
     if pcm is None:
-        return
+        job.notice("❌ All voice generation servers are busy or unavailable. Please try again later.")
+        return result
 
-    wav_bytes = pcm_to_wav(pcm)
-    if wav_bytes is None:
-        return
+    try:
+        result["vocal_wav"] = pcm_to_wav(pcm)
+    except Exception:
+        job.notice("⚠️ Failed to convert generated audio.")
+    return result
 
-    out_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-    with open(out_file.name, "wb") as f:
-        f.write(wav_bytes)
 
-    st.session_state.vocal_path = out_file.name
-    st.session_state.generation_complete = True
-    st.session_state.current_style = singing_style
-    st.session_state.current_voice = voice_option
+def on_sing_done(result):
+    st.session_state.transcript = result["transcript"]
+
+    if result["vocal_wav"]:
+        st.session_state.vocal_wav = result["vocal_wav"]
+        st.session_state.generation_complete = True
+        st.session_state.current_style = result["style"]
+        st.session_state.current_voice = result["voice"]
 
 
 # -------------------------
 # Main Button
 # -------------------------
-st.subheader("🚀 Generate Singing Voice")
+# Changing style or voice only reruns this section
+@st.fragment
+def sing_section():
+    st.subheader("🚀 Generate Singing Voice")
+
+    singing_style = st.selectbox("Singing Style", ["Pop", "Ballad", "Rap", "Soft"])
+    voice_option = st.selectbox("Voice", ["Kore", "Charon", "Fenrir", "Aoede"])
+
+    sing_inputs = (st.session_state.original_digest, singing_style, voice_option)
+
+    if st.session_state.original_path:
+        if st.button("🎶 Transcribe & Sing", disabled=job_running("sing_job")):
+            start_job(
+                "sing_job",
+                "singify",
+                transcribe_and_sing,
+                st.session_state.original_path,
+                singing_style,
+                voice_option,
+                inputs=sing_inputs
+            )
+    else:
+        st.info("ℹ️ Upload or record audio to get started.")
 
-if st.session_state.original_path:
-    if st.button("🎶 Transcribe & Sing"):
-        with st.spinner("🔊 Generating audio..."):
-            asyncio.run(transcribe_and_sing())
-else:
-    st.info("ℹ️ Upload or record audio to get started.")
+    poll_job("sing_job", on_sing_done, label="🔊 Generating audio...", inputs=sing_inputs)
+
+    # -------------------------
+    # Results
+    # -------------------------
+    if st.session_state.transcript:
+        st.subheader("📝 Transcription")
+        st.write(st.session_state.transcript)
+
+    if st.session_state.vocal_wav:
+        st.subheader("🎶 Your Singing Voice")
+        audio_player(st.session_state.vocal_wav)
 
-# -------------------------
-# Results
-# -------------------------
-if st.session_state.transcript:
-    st.subheader("📝 Transcription")
-    st.write(st.session_state.transcript)
 
-if st.session_state.vocal_path:
-    st.subheader("🎶 Your Singing Voice")
-    st.audio(st.session_state.vocal_path)
\ No newline at end of file
+sing_section()
\ No newline at end of file
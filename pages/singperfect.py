@@ -1,19 +1,21 @@
 import streamlit as st
 import tempfile
 import random
-import numpy as np
-import soundfile as sf
-from pydub import AudioSegment
-import matplotlib.pyplot as plt
-from google import genai
-from google.genai import types
 from streamlit.components.v1 import html
-import wave
-import base64
 import os
 import io
 import hashlib
 
+from utils import metering, singleflight, telemetry, warmup
+from utils.audio_io import pcm_to_wav
+from utils.cancel import check
+from utils.deadline import Timeouts, payload_size
+from utils.jobs import JobError
+from utils.streaming import stream_with_key_rotation
+from utils.widgets import audio_player
+
+warmup.start()
+
 # ==============================
 # Hide Streamlit elements
 # ==============================
@@ -62,6 +64,8 @@ st.set_page_config(page_title="🎙️ AI Vocal Coach", layout="wide")
 sttmodel = "gemini-2.5-flash-lite"
 ttsmodel = "gemini-2.5-flash-preview-tts"
 
+TIMEOUTS = Timeouts.configured("singperfect", budget=150)
+
 # ==============================
 # API Keys
 # ==============================
@@ -77,58 +81,44 @@ if not api_keys:
     st.warning("🔑 AI service not configured.")
     st.stop()
 
-def generate_with_key_rotation(model, contents, config=None):
-    for key in api_keys:
-        try:
-            client = genai.Client(api_key=key)
-            response = client.models.generate_content(
-                model=model,
-                contents=contents,
-                config=config
-            )
-            if response:
-                return response
-        except Exception:
-            continue
-    st.error("⚠️ AI service temporarily unavailable.")
-    return None
-
-# ==============================
-# Utility Functions
-# ==============================
-def safe_read_audio(path):
-    try:
-        y, sr = sf.read(path, always_2d=False)
-        if y.ndim > 1:
-            y = np.mean(y, axis=1)
-        return y.astype(float), sr
-    except Exception:
-        audio = AudioSegment.from_file(path)
-        y = np.array(audio.get_array_of_samples()).astype(float)
-        sr = audio.frame_rate
-        return y, sr
-
-def load_audio_energy(path):
+def generate_with_key_rotation(model, contents, config=None, cancel=None):
+    # Sessions practising the same reference song share one extraction
+    key = singleflight.flight_key(model, contents, config)
     try:
-        y, sr = safe_read_audio(path)
-        frame_len = int(0.05 * sr)
-        hop = int(0.025 * sr)
-        energies = []
-        for i in range(0, len(y) - frame_len, hop):
-            energies.append(np.mean(np.abs(y[i:i + frame_len])))
-        energies = np.array(energies)
-        if np.max(energies) > 0:
-            energies /= np.max(energies)
-        return energies
-    except Exception:
-        return np.array([])
-
-def write_pcm_as_wav(path, pcm_bytes, sample_rate=24000):
-    with wave.open(path, "wb") as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(2)
-        wf.setframerate(sample_rate)
-        wf.writeframes(pcm_bytes)
+        return singleflight.do(key, lambda: _generate_with_key_rotation(model, contents, config, cancel))
+    except JobError as e:
+        st.error(str(e))
+        return None
+
+
+def _generate_with_key_rotation(model, contents, config=None, cancel=None):
+    """Shared across sessions: failures raise JobError for each caller to show."""
+    # Not needed until the first evaluation
+    from google import genai
+
+    deadline = TIMEOUTS.start(model, payload_size(contents))
+
+    keys = metering.order(api_keys, model)
+
+    with telemetry.rotation("singperfect", model, contents) as rotation:
+        for idx, key in enumerate(keys):
+            check(cancel, skipped=len(keys) - idx)
+            # DeadlineExceeded is a JobError too
+            http_options = deadline.http_options()
+            try:
+                with rotation.attempt(key) as call:
+                    client = genai.Client(api_key=key, http_options=http_options)
+                    response = call.response(client.models.generate_content(
+                        model=model,
+                        contents=contents,
+                        config=config
+                    ))
+                    if response:
+                        return response
+                    call.fail("EmptyResponse")
+            except Exception:
+                continue
+    raise JobError("⚠️ AI service temporarily unavailable.")
 
 # ==============================
 # Session State Initialization
@@ -139,17 +129,33 @@ if "feedback_text" not in st.session_state:
 if "last_recording_hash" not in st.session_state:
     st.session_state.last_recording_hash = None
 
+if "feedback_audio" not in st.session_state:
+    st.session_state.feedback_audio = None
+
 # ==============================
 # Step 1
 # ==============================
-st.header("⚙️ Step 1: Choose Feedback Options")
-col1, col2 = st.columns(2)
-with col1:
-    feedback_lang = st.selectbox("🗣️ Feedback language", ["English", "Hindi"])
-with col2:
-    enable_audio_feedback = st.checkbox("🔊 Generate Audio Feedback", value=True)
+# These options only matter for audio feedback, so changing them reruns this
+# fragment alone instead of re-analysing and re-plotting both tracks
+@st.fragment
+def feedback_options():
+    st.header("⚙️ Step 1: Choose Feedback Options")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.selectbox("🗣️ Feedback language", ["English", "Hindi"], key="feedback_lang")
+    with col2:
+        enabled = st.checkbox("🔊 Generate Audio Feedback", value=True, key="enable_audio_feedback")
+
+    st.selectbox("🎤 Choose AI voice", ["Kore", "Ava", "Wave"], key="voice_choice")
+
+    # Showing or hiding the feedback button needs the rest of the page
+    if st.session_state.get("audio_feedback_shown", enabled) != enabled:
+        st.session_state.audio_feedback_shown = enabled
+        st.rerun()
+    st.session_state.audio_feedback_shown = enabled
+
 
-voice_choice = st.selectbox("🎤 Choose AI voice", ["Kore", "Ava", "Wave"])
+feedback_options()
 
 def map_language_code(lang):
     return "en-US" if lang == "English" else "hi-IN"
@@ -202,47 +208,24 @@ recorded_file_path = None
 if recorded_audio_native:
     audio_bytes = recorded_audio_native.getvalue()
 
-    # ✅ Detect new recording using hash
+    # ✅ Detect new recording using hash; only a new one is written to disk
     current_hash = hashlib.md5(audio_bytes).hexdigest()
     if st.session_state.last_recording_hash != current_hash:
         st.session_state.feedback_text = None  # Reset feedback
+        st.session_state.feedback_audio = None
         st.session_state.last_recording_hash = current_hash
 
-    recorded_file_path = tempfile.NamedTemporaryFile(delete=False, suffix=".wav").name
-    with open(recorded_file_path, "wb") as f:
-        f.write(audio_bytes)
+        st.session_state.recorded_file_path = tempfile.NamedTemporaryFile(delete=False, suffix=".wav").name
+        with open(st.session_state.recorded_file_path, "wb") as f:
+            f.write(audio_bytes)
 
-    st.success("✅ Recording captured!")
+    recorded_file_path = st.session_state.recorded_file_path
 
-# ==============================
-# Step 4 Compare + Feedback
-# ==============================
-if st.session_state.ref_tmp_path and recorded_file_path:
-
-    st.subheader("🎶 Reference vs Your Singing")
-
-    col_a, col_b = st.columns(2)
-    with col_a:
-        st.audio(st.session_state.ref_tmp_path)
-    with col_b:
-        st.audio(recorded_file_path)
-
-    with st.spinner("🔍 Analyzing energy patterns..."):
-        ref_energy = load_audio_energy(st.session_state.ref_tmp_path)
-        user_energy = load_audio_energy(recorded_file_path)
-
-    if len(ref_energy) and len(user_energy):
-        fig, ax = plt.subplots(figsize=(10, 4))
-        ax.plot(ref_energy, label="Reference")
-        ax.plot(user_energy, label="You")
-        ax.legend()
-        ax.set_title("Energy Contour Comparison")
-        st.pyplot(fig)
-
-    if len(user_energy) == 0 or np.mean(user_energy) < 0.02:
-        st.error("⚠️ No singing detected.")
-        st.stop()
+    st.success("✅ Recording captured!")
 
+# Generating audio feedback reruns only this fragment, not the analysis above
+@st.fragment
+def feedback_section(recorded_file_path):
     st.subheader("💬 AI Vocal Feedback")
 
     if st.session_state.feedback_text is None:
@@ -264,36 +247,47 @@ Provide:
 5. Final Verdict (Excellent / Good / Average / Poor)
 """
 
-        response = generate_with_key_rotation(
-            sttmodel,
-            [{
-                "role": "user",
-                "parts": [
-                    {"text": evaluation_prompt },
-                    {"inline_data": {"mime_type": "audio/wav", "data": open(st.session_state.ref_tmp_path, "rb").read()}},
-                    {"inline_data": {"mime_type": "audio/wav", "data": open(recorded_file_path, "rb").read()}}
-                ]
-            }]
-        )
-
-        if response:
-            st.session_state.feedback_text = response.candidates[0].content.parts[0].text
-        else:
+        contents = [{
+            "role": "user",
+            "parts": [
+                {"text": evaluation_prompt },
+                {"inline_data": {"mime_type": "audio/wav", "data": open(st.session_state.ref_tmp_path, "rb").read()}},
+                {"inline_data": {"mime_type": "audio/wav", "data": open(recorded_file_path, "rb").read()}}
+            ]
+        }]
+
+        # Feedback appears word by word instead of after the whole evaluation
+        try:
+            st.session_state.feedback_text = st.write_stream(
+                stream_with_key_rotation(
+                    metering.order(api_keys, sttmodel),
+                    sttmodel,
+                    contents,
+                    deadline=TIMEOUTS.start(sttmodel, payload_size(contents)),
+                    failure_message="⚠️ AI service temporarily unavailable.",
+                    page="singperfect"
+                )
+            ) or "Evaluation unavailable."
+        except JobError as e:
+            st.error(str(e))
             st.session_state.feedback_text = "Evaluation unavailable."
+            st.write(st.session_state.feedback_text)
 
-    st.write(st.session_state.feedback_text)
+    else:
+        st.write(st.session_state.feedback_text)
 
-    if enable_audio_feedback:
+    if st.session_state.enable_audio_feedback:
         if st.button("🔊 Generate Audio Feedback"):
             with st.spinner("🔊 Generating audio feedback..."):
+                from google.genai import types
 
                 config = types.GenerateContentConfig(
                     response_modalities=["AUDIO"],
                     speech_config=types.SpeechConfig(
-                        language_code=map_language_code(feedback_lang),
+                        language_code=map_language_code(st.session_state.feedback_lang),
                         voice_config=types.VoiceConfig(
                             prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                                voice_name=voice_choice
+                                voice_name=st.session_state.voice_choice
                             )
                         )
                     )
@@ -307,16 +301,45 @@ Provide:
 
                 if tts_response:
                     part = tts_response.candidates[0].content.parts[0]
-                    pcm_data = part.inline_data.data
+                    st.session_state.feedback_audio = pcm_to_wav(part.inline_data.data)
+                    st.success("✅ Audio feedback ready!")
 
-                    if isinstance(pcm_data, str):
-                        pcm_data = base64.b64decode(pcm_data)
+        # Kept in session state so the player survives this fragment's reruns
+        if st.session_state.feedback_audio:
+            audio_player(st.session_state.feedback_audio)
 
-                    tts_path = tempfile.NamedTemporaryFile(delete=False, suffix=".wav").name
-                    write_pcm_as_wav(tts_path, pcm_data)
 
-                    st.audio(tts_path)
-                    st.success("✅ Audio feedback ready!")
+# ==============================
+# Step 4 Compare + Feedback
+# ==============================
+if st.session_state.ref_tmp_path and recorded_file_path:
+
+    st.subheader("🎶 Reference vs Your Singing")
+
+    col_a, col_b = st.columns(2)
+    with col_a:
+        st.audio(st.session_state.ref_tmp_path)
+    with col_b:
+        st.audio(recorded_file_path)
+
+    # Contours are cached per file; the chart is drawn from screen-sized envelopes.
+    # numpy, soundfile and plotly only load once there is something to compare
+    from utils.waveform import comparison_figure, energy_pyramid
+
+    with st.spinner("🔍 Analyzing energy patterns..."):
+        ref_energy = energy_pyramid(st.session_state.ref_tmp_path)
+        user_energy = energy_pyramid(recorded_file_path)
+
+    if len(ref_energy) and len(user_energy):
+        fig = comparison_figure({"Reference": ref_energy, "You": user_energy})
+        st.plotly_chart(fig, width="stretch")
+        del fig
+
+    if len(user_energy) == 0 or user_energy.mean < 0.02:
+        st.error("⚠️ No singing detected.")
+        st.stop()
+
+    feedback_section(recorded_file_path)
 
 else:
     st.info("🎵 Upload a song and record your voice to begin.")
\ No newline at end of file
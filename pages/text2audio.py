@@ -1,13 +1,18 @@
 import streamlit as st
-from google import genai
-import random
-from google.genai import types
-import wave
 from io import BytesIO
 import time
-import base64
+import hashlib
 from streamlit.components.v1 import html
 
+from utils import metering, telemetry, warmup
+from utils.audio_io import decode_inline_audio, pcm_to_wav
+from utils.cancel import check
+from utils.deadline import Timeouts, payload_size
+from utils.jobs import JobError
+from utils.widgets import audio_player, job_running, poll_job, start_job
+
+warmup.start()
+
 # Hide Streamlit default elements
 html(
     """
@@ -55,6 +60,9 @@ st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 textmodel = "gemini-2.5-flash-lite"
 ttsmodel = "gemini-2.5-flash-preview-tts"
 
+# Up to 4000 words of TTS in one request, so this page gets the longest budget
+TIMEOUTS = Timeouts.configured("text2audio", budget=420, max_attempt=360)
+
 # Initialize session state
 defaults = {
     "audio_generated": False,
@@ -67,25 +75,14 @@ defaults = {
     "text_confirmed": False,
     "input_text": "",
     "typed_text_temp": "",
-    "current_typed_text": ""
+    "current_typed_text": "",
+    "uploaded_file_id": None
 }
 for k, v in defaults.items():
     if k not in st.session_state:
         st.session_state[k] = v
 
 
-# Helper: Save PCM as WAV
-def save_wave_file(pcm_data, channels=1, rate=24000, sample_width=2):
-    buffer = BytesIO()
-    with wave.open(buffer, "wb") as wf:
-        wf.setnchannels(channels)
-        wf.setsampwidth(sample_width)
-        wf.setframerate(rate)
-        wf.writeframes(pcm_data)
-    buffer.seek(0)
-    return buffer
-
-
 # Extract text from uploaded file
 def extract_text_from_file(uploaded_file):
     file_type = uploaded_file.name.split('.')[-1].lower()
@@ -119,14 +116,13 @@ def get_all_api_keys():
 
 
 # -------- SUMMARIZE WITH KEY ROTATION --------
-def summarize_text(text, api_keys_list, max_words=3500):
-    random.shuffle(api_keys_list)
+def summarize_text(text, api_keys_list, max_words=3500, cancel=None):
+    from google import genai
 
-    for key in api_keys_list:
-        try:
-            client = genai.Client(api_key=key)
+    api_keys_list = metering.order(api_keys_list, textmodel)
+    deadline = TIMEOUTS.start(textmodel, payload_size(text))
 
-            prompt = f"""
+    prompt = f"""
 Please provide a comprehensive summary of the following text.
 Keep it under {max_words} words.
 
@@ -135,185 +131,230 @@ TEXT:
 SUMMARY:
 """
 
-            response = client.models.generate_content(
-                model=textmodel,
-                contents=prompt
-            )
+    with telemetry.rotation("text2audio", textmodel, prompt) as rotation:
+        for idx, key in enumerate(api_keys_list):
+            check(cancel, skipped=len(api_keys_list) - idx)
+            http_options = deadline.http_options()
+            try:
+                with rotation.attempt(key) as call:
+                    client = genai.Client(api_key=key, http_options=http_options)
+
+                    response = call.response(client.models.generate_content(
+                        model=textmodel,
+                        contents=prompt
+                    ))
 
-            if response and response.text:
-                return response.text
+                    if response and response.text:
+                        return response.text
+                    call.fail("EmptyResponse")
 
-        except Exception:
-            continue
+            except Exception:
+                continue
 
-    st.warning("🤖 All API keys failed while summarizing.")
     return None
 
 
 # -------- TTS WITH KEY ROTATION --------
-def generate_audio_tts(text, api_keys_list, voice_name='Kore', speaking_style=''):
-    random.shuffle(api_keys_list)
-
-    for key in api_keys_list:
-        try:
-            client = genai.Client(api_key=key)
-            prompt = f"{speaking_style}: {text}" if speaking_style else text
-
-            response = client.models.generate_content(
-                model=ttsmodel,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_modalities=["AUDIO"],
-                    speech_config=types.SpeechConfig(
-                        voice_config=types.VoiceConfig(
-                            prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                                voice_name=voice_name,
+def generate_audio_tts(text, api_keys_list, voice_name='Kore', speaking_style='', cancel=None):
+    from google import genai
+    from google.genai import types
+
+    api_keys_list = metering.order(api_keys_list, ttsmodel)
+    deadline = TIMEOUTS.start(ttsmodel, payload_size(text, speaking_style))
+    prompt = f"{speaking_style}: {text}" if speaking_style else text
+
+    with telemetry.rotation("text2audio", ttsmodel, prompt) as rotation:
+        for idx, key in enumerate(api_keys_list):
+            check(cancel, skipped=len(api_keys_list) - idx)
+            http_options = deadline.http_options()
+            try:
+                with rotation.attempt(key) as call:
+                    client = genai.Client(api_key=key, http_options=http_options)
+
+                    response = call.response(client.models.generate_content(
+                        model=ttsmodel,
+                        contents=prompt,
+                        config=types.GenerateContentConfig(
+                            response_modalities=["AUDIO"],
+                            speech_config=types.SpeechConfig(
+                                voice_config=types.VoiceConfig(
+                                    prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                                        voice_name=voice_name,
+                                    )
+                                ),
                             )
-                        ),
-                    )
-                )
-            )
+                        )
+                    ))
+
+                    if (
+                        hasattr(response, "candidates")
+                        and response.candidates
+                        and response.candidates[0].content
+                        and response.candidates[0].content.parts
+                    ):
+                        audio_part = response.candidates[0].content.parts[0]
+                        if hasattr(audio_part, "inline_data") and audio_part.inline_data.data:
+                            return decode_inline_audio(audio_part.inline_data.data)
+                    call.fail("NoAudio")
+
+            except Exception:
+                continue
 
-            if (
-                hasattr(response, "candidates")
-                and response.candidates
-                and response.candidates[0].content
-                and response.candidates[0].content.parts
-            ):
-                audio_part = response.candidates[0].content.parts[0]
-                if hasattr(audio_part, "inline_data") and audio_part.inline_data.data:
-                    b64_data = audio_part.inline_data.data
-
-                    if isinstance(b64_data, bytes):
-                        return b64_data
-                    elif isinstance(b64_data, str):
-                        b64_data += "=" * (-len(b64_data) % 4)
-                        return base64.b64decode(b64_data)
-
-        except Exception:
-            continue
-
-    st.warning("🎧 All API keys failed while generating audio.")
     return None
 
 
-def main():
-    st.title("🎙️ Text-to-Audio Converter")
-    st.markdown("### Convert your text files to natural-sounding speech")
-    st.markdown("---")
+# -------- CONVERT (BACKGROUND JOB) --------
+def convert_to_audio(job, text, api_keys_list, voice_name, speaking_style, max_words):
+    summary = None
 
-    MAX_WORDS_FOR_TTS = 4000
-    api_keys = get_all_api_keys()
+    if len(text.split()) > max_words:
+        job.update(0.1, "Summarizing long text…")
+        summary = summarize_text(text, api_keys_list, max_words, cancel=job.token)
 
-    st.subheader("🎵 Voice Options")
+        if summary:
+            text = summary
+        else:
+            job.notice("🤖 All API keys failed while summarizing.")
 
-    voice_options = {
-            'Kore': 'Firm and clear',
-            'Puck': 'Upbeat and energetic',
-            'Zephyr': 'Bright and friendly',
-            'Charon': 'Informative and steady',
-            'Fenrir': 'Excitable and dynamic',
-            'Aoede': 'Breezy and light',
-            'Leda': 'Youthful and vibrant',
-            'Orus': 'Firm and authoritative',
-            'Callirrhoe': 'Easy-going and relaxed',
-            'Autonoe': 'Bright and articulate'
-        }
+    job.update(0.4, "Creating audio…")
+    audio_data = generate_audio_tts(text, api_keys_list, voice_name, speaking_style, cancel=job.token)
 
-    selected_voice = st.selectbox(
-            "Select Voice",
-            options=list(voice_options.keys()),
-            format_func=lambda x: f"{x} – {voice_options[x]}"
-        )
+    if not audio_data:
+        raise JobError("🎧 All API keys failed while generating audio.")
 
-    speaking_style = st.text_input(
-            "🎭 Optional speaking style",
-            placeholder="e.g., calm, confident, conversational"
-        )
+    return {"summary": summary, "wav": pcm_to_wav(audio_data)}
 
-    col1, col2 = st.columns(2)
 
-    # ---------------- INPUT ----------------
-    with col1:
-        st.header("📝 Input Text")
-        tab1, tab2 = st.tabs(["📁 Upload File", "✍️ Type Text"])
-
-        with tab1:
-            uploaded = st.file_uploader("Upload a file", type=["txt", "pdf", "docx", "doc"])
-            if uploaded:
-                extracted = extract_text_from_file(uploaded)
-                if extracted:
-                    st.session_state.input_text = extracted
-                    st.session_state.text_confirmed = True
-
-        with tab2:
-            with st.form("text_form"):
-                text_input = st.text_area("Paste or type text here", height=300)
-                submitted = st.form_submit_button("Confirm text")
-            if submitted and text_input.strip():
-                st.session_state.input_text = text_input
+def on_audio_done(result):
+    if result["summary"]:
+        st.session_state.summary_text = result["summary"]
+
+    st.session_state.audio_buffer = BytesIO(result["wav"])
+    st.session_state.audio_generated = True
+
+
+# -------- INPUT SECTION --------
+# Fragments: typing a style or picking a voice reruns only the audio section,
+# so uploaded files are not re-extracted and the preview is not redrawn
+@st.fragment
+def input_section():
+    st.header("📝 Input Text")
+    tab1, tab2 = st.tabs(["📁 Upload File", "✍️ Type Text"])
+
+    with tab1:
+        uploaded = st.file_uploader("Upload a file", type=["txt", "pdf", "docx", "doc"])
+        if uploaded and uploaded.file_id != st.session_state.uploaded_file_id:
+            extracted = extract_text_from_file(uploaded)
+            if extracted:
+                st.session_state.input_text = extracted
                 st.session_state.text_confirmed = True
+                st.session_state.uploaded_file_id = uploaded.file_id
                 st.rerun()
 
-        # ✅ SHOW TEXT TO USER (PERSISTENT)
-        if st.session_state.text_confirmed and st.session_state.input_text:
-            st.markdown("### 📖 Text Preview")
-            st.text_area(
-                "Preview",
-                value=st.session_state.input_text,
-                height=250,
-                disabled=True
-            )
-
-    # ---------------- AUDIO ----------------
-    with col2:
-        st.header("🔊 Generate Audio")
+    with tab2:
+        with st.form("text_form"):
+            text_input = st.text_area("Paste or type text here", height=300)
+            submitted = st.form_submit_button("Confirm text")
+        if submitted and text_input.strip():
+            st.session_state.input_text = text_input
+            st.session_state.text_confirmed = True
+            st.rerun()
+
+    # ✅ SHOW TEXT TO USER (PERSISTENT)
+    if st.session_state.text_confirmed and st.session_state.input_text:
+        st.markdown("### 📖 Text Preview")
+        st.text_area(
+            "Preview",
+            value=st.session_state.input_text,
+            height=250,
+            disabled=True
+        )
 
-        if api_keys and st.session_state.text_confirmed and st.session_state.input_text:
 
-            txt = st.session_state.input_text
-            wc = len(txt.split())
-            needs_summary = wc > MAX_WORDS_FOR_TTS
+# -------- AUDIO SECTION --------
+VOICE_OPTIONS = {
+    'Kore': 'Firm and clear',
+    'Puck': 'Upbeat and energetic',
+    'Zephyr': 'Bright and friendly',
+    'Charon': 'Informative and steady',
+    'Fenrir': 'Excitable and dynamic',
+    'Aoede': 'Breezy and light',
+    'Leda': 'Youthful and vibrant',
+    'Orus': 'Firm and authoritative',
+    'Callirrhoe': 'Easy-going and relaxed',
+    'Autonoe': 'Bright and articulate'
+}
 
-            if st.button("🎵 Convert to Audio"):
 
-                use_text = txt
+@st.fragment
+def audio_section(api_keys, max_words):
+    st.header("🔊 Generate Audio")
 
-                if needs_summary:
-                    with st.spinner("Summarizing long text…"):
-                        summary = summarize_text(txt, api_keys, MAX_WORDS_FOR_TTS)
+    st.subheader("🎵 Voice Options")
 
-                    if summary:
-                        use_text = summary
-                        st.session_state.summary_text = summary
+    selected_voice = st.selectbox(
+        "Select Voice",
+        options=list(VOICE_OPTIONS.keys()),
+        format_func=lambda x: f"{x} – {VOICE_OPTIONS[x]}"
+    )
 
-                with st.spinner("Creating audio…"):
-                    audio_data = generate_audio_tts(
-                        use_text,
-                        api_keys,
-                        selected_voice,
-                        speaking_style
-                    )
+    speaking_style = st.text_input(
+        "🎭 Optional speaking style",
+        placeholder="e.g., calm, confident, conversational"
+    )
 
-                if audio_data:
-                    st.session_state.audio_buffer = save_wave_file(audio_data)
-                    st.session_state.audio_generated = True
+    if api_keys and st.session_state.text_confirmed and st.session_state.input_text:
 
-        # ✅ PERSIST AUDIO PLAYER
-        if st.session_state.audio_generated and st.session_state.audio_buffer:
-            st.audio(st.session_state.audio_buffer, format="audio/wav")
+        inputs = (
+            hashlib.md5(st.session_state.input_text.encode("utf-8")).hexdigest(),
+            selected_voice,
+            speaking_style
+        )
 
-            ts = time.strftime("%Y%m%d-%H%M%S")
-            st.download_button(
-                "⬇️ Download audio",
-                data=st.session_state.audio_buffer,
-                file_name=f"audio_{ts}.wav",
-                mime="audio/wav"
+        if st.button("🎵 Convert to Audio", disabled=job_running("tts_job")):
+            start_job(
+                "tts_job",
+                "text2audio",
+                convert_to_audio,
+                st.session_state.input_text,
+                list(api_keys),
+                selected_voice,
+                speaking_style,
+                max_words,
+                inputs=inputs
             )
 
-        else:
-            st.info("👈 Please upload or type text first.")
+        poll_job("tts_job", on_audio_done, label="Creating audio…", inputs=inputs)
+
+    # ✅ PERSIST AUDIO PLAYER
+    if st.session_state.audio_generated and st.session_state.audio_buffer:
+        ts = time.strftime("%Y%m%d-%H%M%S")
+        audio_player(
+            st.session_state.audio_buffer.getvalue(),
+            f"audio_{ts}",
+            key="download_audio"
+        )
+
+    else:
+        st.info("👈 Please upload or type text first.")
+
+
+def main():
+    st.title("🎙️ Text-to-Audio Converter")
+    st.markdown("### Convert your text files to natural-sounding speech")
+    st.markdown("---")
+
+    MAX_WORDS_FOR_TTS = 4000
+    api_keys = get_all_api_keys()
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        input_section()
+
+    with col2:
+        audio_section(api_keys, MAX_WORDS_FOR_TTS)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,135 @@
+import streamlit as st
+import hmac
+import time
+
+from utils import cancel, http_session, metering, singleflight, telemetry, warmup
+
+st.set_page_config(page_title="📈 Usage", layout="wide")
+
+st.markdown("""
+<style>
+#MainMenu {visibility:hidden;}
+footer {visibility:hidden;}
+[data-testid="stStatusWidget"], [data-testid="stToolbar"] {display:none;}
+</style>
+""", unsafe_allow_html=True)
+
+REFRESH_SECONDS = 15
+
+# ---- Admin gate ----
+admin_token = st.secrets.get("ADMIN_TOKEN")
+if not admin_token:
+    st.error("🔒 This page is disabled. Set ADMIN_TOKEN in secrets to enable it.")
+    st.stop()
+
+token = st.query_params.get("token") or st.text_input("Admin token", type="password")
+if not token:
+    st.stop()
+if not hmac.compare_digest(str(token), str(admin_token)):
+    st.error("🔒 Wrong token.")
+    st.stop()
+
+# ---- Keys ----
+# Only the hashed id is shown; the slot name tells admins which secret it is
+slots = {}
+for i in range(1, 12):
+    key = st.secrets.get(f"KEY_{i}")
+    if key:
+        slots[metering.key_id(key)] = f"KEY_{i}"
+
+
+def clock(ts):
+    return time.strftime("%H:%M", time.localtime(ts))
+
+
+def key_rows(meter):
+    now = time.time()
+    known = {k for k, _ in meter.known()}
+    rows = []
+    for model in metering.QUOTAS:
+        for key in sorted(set(slots) | known, key=lambda k: slots.get(k, "~" + k)):
+            f = meter.forecast(key, model, now)
+            if f.throttled_until > now:
+                status = f"⛔ throttled until {clock(f.throttled_until)}"
+            elif f.rpd >= f.quota.rpd:
+                status = "⛔ daily quota used"
+            elif f.exhausts_at and f.exhausts_at - now < metering.DAY:
+                status = f"⚠️ exhausts ~{clock(f.exhausts_at)}"
+            else:
+                status = "✅"
+            rows.append({
+                "key": slots.get(key, key),
+                "id": key,
+                "model": model,
+                "RPM": f"{f.rpm}/{f.quota.rpm}",
+                "TPM": f"{f.tpm}/{f.quota.tpm}",
+                "RPD": f"{f.rpd}/{f.quota.rpd}",
+                "headroom %": round(max(f.headroom, 0) * 100),
+                "status": status,
+            })
+    return rows
+
+
+def page_rows(meter, seconds):
+    return [
+        {"page": page, "model": model, **totals}
+        for (page, model), totals in sorted(meter.by_page(seconds).items())
+    ]
+
+
+def latency_rows():
+    rows = []
+    for (page, model, kind), row in sorted(telemetry.summary().items()):
+        rows.append({
+            "page": page, "model": model, "kind": kind,
+            "calls": row["calls"], "errors": row["errors"],
+            "p50 s": row["p50"], "p95 s": row["p95"], "p99 s": row["p99"],
+            "failover s": round(row["failover_total"], 2),
+        })
+    return rows
+
+
+def counter_rows(counts):
+    return [{"counter": name, "count": n} for name, n in sorted(counts.items())]
+
+
+@st.fragment(run_every=REFRESH_SECONDS)
+def dashboard():
+    meter = metering.meter()
+
+    st.subheader("🔑 Quota by key")
+    st.caption("Sliding windows: RPM/TPM over the last minute, RPD over the last 24 hours. "
+               "Rotation tries keys with the most headroom first.")
+    st.dataframe(key_rows(meter), width="stretch", hide_index=True)
+
+    st.subheader("📄 Tokens by page")
+    hour, day = st.tabs(["Last hour", "Last 24 hours"])
+    with hour:
+        st.dataframe(page_rows(meter, 60 * 60), width="stretch", hide_index=True)
+    with day:
+        st.dataframe(page_rows(meter, metering.DAY), width="stretch", hide_index=True)
+
+    st.subheader("⏱️ Latency")
+    st.dataframe(latency_rows(), width="stretch", hide_index=True)
+
+    st.subheader("🛑 Cancellations")
+    st.caption("Work dropped because nobody was waiting for it any more: jobs cancelled by reason, "
+               "rotation loops stopped, key attempts skipped and calls abandoned mid-flight.")
+    st.dataframe(counter_rows(cancel.stats()), width="stretch", hide_index=True)
+
+    st.subheader("🔌 Connections")
+    st.caption("Shared HTTP session for YouTube and GitHub lookups: requests, errors, connections "
+               "opened and the share of requests that reused an open connection.")
+    st.dataframe(counter_rows(http_session.stats()), width="stretch", hide_index=True)
+
+    warm = warmup.report()
+    if warm:
+        st.caption("Warm-up after start: " + ", ".join(f"{step} {seconds:.2f}s" for step, seconds in warm.items()))
+
+    shared = singleflight.stats()
+    if shared:
+        st.caption("Shared in-flight work: " + ", ".join(f"{name.replace('_', ' ')} {n}" for name, n in sorted(shared.items())))
+
+
+st.title("📈 Usage")
+dashboard()
@@ -0,0 +1,70 @@
+"""One long-lived event loop, with a pooled async HTTP client, for async pipelines.
+
+``asyncio.run`` inside each job built a fresh loop, and the blocking calls it
+wrapped still held one executor thread each, so nothing actually overlapped.
+Coroutines submitted here all share a single loop running on a daemon thread:
+many clips or style variants can wait on the network at once without a
+thread apiece, and the HTTP client keeps its connections alive between them.
+
+Background jobs whose function is a coroutine function are scheduled here
+with ``submit`` (see ``utils.jobs``) and hold no thread while they wait;
+other threads can call ``run(coro)`` and block on the result. Coroutines
+use ``http_client()`` and the genai ``client.aio`` API.
+"""
+
+import asyncio
+import threading
+from collections import Counter
+
+import httpx
+
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60)
+
+_loop = None
+_client = None
+_lock = threading.Lock()
+_stats = Counter()
+
+
+def loop():
+    """The shared loop, started on first use."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="aio-loop", daemon=True).start()
+        return _loop
+
+
+def submit(coro):
+    """Schedule ``coro`` on the shared loop from any thread; returns its future."""
+    return asyncio.run_coroutine_threadsafe(coro, loop())
+
+
+def run(coro, timeout=None):
+    """Run ``coro`` on the shared loop from any thread and wait for its result."""
+    return submit(coro).result(timeout)
+
+
+def http_client():
+    """Pooled ``httpx.AsyncClient``; only use it from coroutines on the shared loop."""
+    global _client
+    if _client is None:
+        # httpx asks for gzip by default
+        _client = httpx.AsyncClient(limits=HTTP_LIMITS)
+    return _client
+
+
+async def post_json(url, payload, headers=None, timeout=None):
+    _stats["requests"] += 1
+    try:
+        return await http_client().post(url, json=payload, headers=headers, timeout=timeout)
+    except Exception as e:
+        _stats[f"errors.{type(e).__name__}"] += 1
+        raise
+
+
+# ---------------- METRICS ----------------
+def stats():
+    # Only mutated on the loop thread, so a copy is consistent enough
+    return dict(_stats)
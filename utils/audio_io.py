@@ -0,0 +1,182 @@
+"""PCM / WAV helpers shared by every audio page.
+
+Gemini TTS returns raw little-endian PCM (``audio/L16;rate=24000``), either
+as bytes (genai SDK) or as a base64 string (REST). Everything here decodes
+that payload exactly once and then writes the 44-byte WAV header around a
+memoryview of the samples, so turning it into a playable file or a streamed
+buffer never copies the PCM again.
+"""
+
+import binascii
+import io
+import struct
+
+DEFAULT_RATE = 24000
+DEFAULT_CHANNELS = 1
+DEFAULT_SAMPLE_WIDTH = 2
+
+WAV_HEADER_SIZE = 44
+
+
+# ---------------- MIME ----------------
+def parse_audio_mime_type(mime_type):
+    """Return ``{"bits_per_sample", "rate"}`` for e.g. ``audio/L16;rate=24000``."""
+    bits_per_sample = 16
+    rate = DEFAULT_RATE
+
+    for param in (mime_type or "").split(";"):
+        param = param.strip()
+
+        if param.lower().startswith("rate="):
+            try:
+                rate = int(param.split("=", 1)[1])
+            except ValueError:
+                pass
+
+        elif param.startswith("audio/L"):
+            try:
+                bits_per_sample = int(param[len("audio/L"):])
+            except ValueError:
+                pass
+
+    return {"bits_per_sample": bits_per_sample, "rate": rate}
+
+
+def is_wav_mime_type(mime_type):
+    return bool(mime_type) and "wav" in mime_type.lower()
+
+
+# ---------------- HEADER ----------------
+def wav_header(data_size, rate=DEFAULT_RATE, channels=DEFAULT_CHANNELS, sample_width=DEFAULT_SAMPLE_WIDTH):
+    block_align = channels * sample_width
+
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + data_size,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,
+        channels,
+        rate,
+        rate * block_align,
+        block_align,
+        sample_width * 8,
+        b"data",
+        data_size,
+    )
+
+
+# ---------------- BASE64 ----------------
+def _b64_text(data):
+    if isinstance(data, str):
+        data = data.encode("ascii")
+    data = bytes(data).strip()
+
+    # REST payloads occasionally arrive without trailing padding
+    missing = -len(data) % 4
+    return data + b"=" * missing if missing else data
+
+
+def decode_inline_audio(data):
+    """Return inline audio as a bytes-like object, decoding base64 strings."""
+    if isinstance(data, str):
+        return binascii.a2b_base64(_b64_text(data))
+    return memoryview(data)
+
+
+# ---------------- BUFFER ----------------
+class PcmBuffer:
+    """Growable PCM buffer with a reserved WAV header in front.
+
+    Streamed chunks are appended in place; ``wav()`` fills in the header and
+    returns a memoryview over header + samples without copying.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, channels=DEFAULT_CHANNELS, sample_width=DEFAULT_SAMPLE_WIDTH):
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self._buf = bytearray(WAV_HEADER_SIZE)
+
+    @classmethod
+    def from_mime_type(cls, mime_type):
+        params = parse_audio_mime_type(mime_type)
+        return cls(rate=params["rate"], sample_width=params["bits_per_sample"] // 8)
+
+    def __len__(self):
+        return len(self._buf) - WAV_HEADER_SIZE
+
+    @property
+    def duration(self):
+        return len(self) / float(self.rate * self.channels * self.sample_width)
+
+    def append(self, chunk):
+        """Append raw PCM bytes, or a base64 string as sent by the REST API."""
+        if isinstance(chunk, str):
+            self.append_b64(chunk)
+        else:
+            self._buf += memoryview(chunk).cast("B")
+
+    def append_b64(self, data):
+        self._buf += binascii.a2b_base64(_b64_text(data))
+
+    def pcm(self):
+        return memoryview(self._buf)[WAV_HEADER_SIZE:]
+
+    def wav(self):
+        self._buf[:WAV_HEADER_SIZE] = wav_header(len(self), self.rate, self.channels, self.sample_width)
+        return memoryview(self._buf)
+
+    def wav_bytes(self):
+        # Streamlit widgets only accept bytes, so this is the single copy
+        return self.wav().tobytes()
+
+
+# ---------------- WRITERS ----------------
+def pcm_to_wav(pcm, rate=DEFAULT_RATE, channels=DEFAULT_CHANNELS, sample_width=DEFAULT_SAMPLE_WIDTH):
+    """Wrap raw PCM (bytes, memoryview or base64 str) in a WAV container."""
+    if isinstance(pcm, str):
+        pcm = decode_inline_audio(pcm)
+    return b"".join((wav_header(len(memoryview(pcm).cast("B")), rate, channels, sample_width), pcm))
+
+
+def write_wav(target, pcm, rate=DEFAULT_RATE, channels=DEFAULT_CHANNELS, sample_width=DEFAULT_SAMPLE_WIDTH):
+    """Write PCM as a WAV file to a path or binary file object."""
+    if isinstance(pcm, str):
+        pcm = decode_inline_audio(pcm)
+    pcm = memoryview(pcm).cast("B")
+
+    if isinstance(target, (str, bytes)) or hasattr(target, "__fspath__"):
+        with open(target, "wb") as f:
+            f.write(wav_header(len(pcm), rate, channels, sample_width))
+            f.write(pcm)
+    else:
+        target.write(wav_header(len(pcm), rate, channels, sample_width))
+        target.write(pcm)
+
+
+def inline_audio_to_wav(data, mime_type=None):
+    """Turn one inline_data payload into WAV bytes, honouring its MIME type."""
+    if is_wav_mime_type(mime_type):
+        return bytes(decode_inline_audio(data))
+
+    params = parse_audio_mime_type(mime_type)
+    return pcm_to_wav(decode_inline_audio(data), rate=params["rate"], sample_width=params["bits_per_sample"] // 8)
+
+
+# ---------------- UPLOADS ----------------
+def to_wav_bytes(file_bytes):
+    """Re-encode an uploaded or recorded file (anything libsndfile reads) as WAV.
+
+    Raises whatever soundfile raises for formats it cannot read.
+    """
+    # Only the upload paths need libsndfile
+    import soundfile as sf
+
+    with io.BytesIO(file_bytes) as f:
+        data, samplerate = sf.read(f, always_2d=True)
+    out_bytes = io.BytesIO()
+    sf.write(out_bytes, data, samplerate, format="WAV")
+    return out_bytes.getvalue()
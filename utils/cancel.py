@@ -0,0 +1,78 @@
+"""Cooperative cancellation for key-rotation loops and background jobs.
+
+A blocking ``generate_content`` call cannot be interrupted, but every rotation
+loop checks its token before trying the next key, and streaming loops check
+between chunks, so a superseded generation stops at the next safe point
+instead of walking all eleven keys.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+SUPERSEDED = "superseded"
+INPUTS_CHANGED = "inputs_changed"
+DISCONNECTED = "disconnected"
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+class Cancelled(Exception):
+    """Raised at a checkpoint once the owning token has been cancelled."""
+
+
+class CancelToken:
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason=SUPERSEDED):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def raise_if_cancelled(self, skipped=0):
+        """Checkpoint; ``skipped`` is how many key attempts this avoids."""
+        if self._event.is_set():
+            record("aborted_loops")
+            record("skipped_attempts", skipped)
+            raise Cancelled(self.reason)
+
+    async def race(self, awaitable, poll=0.2):
+        """Await ``awaitable`` but give up as soon as the token is cancelled."""
+        task = asyncio.ensure_future(awaitable)
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll)
+            if done:
+                return task.result()
+            if self.cancelled:
+                task.cancel()
+                record("abandoned_calls")
+                self.raise_if_cancelled()
+
+
+def check(token, skipped=0):
+    """``token.raise_if_cancelled`` that tolerates ``token=None``."""
+    if token is not None:
+        token.raise_if_cancelled(skipped)
+
+
+# ---------------- METRICS ----------------
+def record(name, n=1):
+    if n:
+        with _stats_lock:
+            _stats[name] += n
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
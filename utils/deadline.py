@@ -0,0 +1,144 @@
+"""Per-attempt timeouts and an end-to-end budget for key rotation.
+
+Without a timeout a single hung key stalls the user forever before rotation
+moves on. Each rotation now starts a ``Deadline``: every attempt gets a
+timeout estimated from the model and payload size, capped by what is left of
+the page's overall budget, and rotation fails fast once there is not enough
+budget left for a useful attempt.
+
+Pages declare their own ``Timeouts``; deployments can override any field per
+page in secrets, e.g.::
+
+    [timeouts.text2audio]
+    budget = 420
+"""
+
+import os
+import ssl
+import threading
+import time
+from dataclasses import dataclass, replace
+
+from utils.jobs import JobError
+
+# (base seconds, extra seconds per KB of request payload) for one attempt
+MODEL_PROFILES = {
+    "gemini-2.5-flash-lite": (15.0, 0.02),
+    "gemini-2.5-flash": (30.0, 0.02),
+    # TTS time grows with the text: ~1 KB of text is over a minute of speech
+    "gemini-2.5-flash-preview-tts": (30.0, 20.0),
+}
+DEFAULT_PROFILE = (30.0, 0.05)
+
+
+class DeadlineExceeded(JobError):
+    """The page's latency budget ran out before any key answered."""
+
+
+@dataclass(frozen=True)
+class Timeouts:
+    budget: float = 120.0
+    min_attempt: float = 5.0
+    max_attempt: float = 300.0
+    scale: float = 1.0
+
+    @classmethod
+    def configured(cls, page, **defaults):
+        """Page defaults, overridden by ``st.secrets["timeouts"][page]`` if set."""
+        timeouts = cls(**defaults)
+        try:
+            import streamlit as st
+            overrides = dict(st.secrets.get("timeouts", {}).get(page, {}))
+        except Exception:
+            overrides = {}
+
+        fields = {k: float(v) for k, v in overrides.items() if k in cls.__dataclass_fields__}
+        return replace(timeouts, **fields) if fields else timeouts
+
+    def attempt_estimate(self, model, payload_bytes=0):
+        base, per_kb = MODEL_PROFILES.get(model, DEFAULT_PROFILE)
+        estimate = (base + per_kb * payload_bytes / 1024) * self.scale
+        return min(max(estimate, self.min_attempt), self.max_attempt)
+
+    def start(self, model, payload_bytes=0):
+        return Deadline(self, model, payload_bytes)
+
+
+class Deadline:
+
+    def __init__(self, timeouts, model, payload_bytes=0):
+        self.timeouts = timeouts
+        self.model = model
+        self.attempt = timeouts.attempt_estimate(model, payload_bytes)
+        self.started = time.monotonic()
+        self.expires = self.started + timeouts.budget
+
+    @property
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    def _fail(self):
+        raise DeadlineExceeded(
+            f"⏱️ The AI service didn’t respond within {self.timeouts.budget:.0f}s. "
+            "Please try again in a moment."
+        )
+
+    def next_attempt(self):
+        """Timeout in seconds for the next key, or fail if the budget is spent."""
+        remaining = self.remaining
+        if remaining < self.timeouts.min_attempt:
+            self._fail()
+        return min(self.attempt, remaining)
+
+    def check(self):
+        """Checkpoint for long streams: fail once the whole budget is used up."""
+        if self.remaining <= 0:
+            self._fail()
+
+    def http_options(self, timeout=None):
+        """genai ``HttpOptions`` for the next attempt (timeout is in ms there)."""
+        from google.genai import types
+
+        timeout = self.next_attempt() if timeout is None else timeout
+        ctx = ssl_context()
+        # "ssl" is what the SDK's websocket/aiohttp path looks for; httpx drops it
+        return types.HttpOptions(
+            timeout=int(timeout * 1000),
+            client_args={"verify": ctx},
+            async_client_args={"verify": ctx, "ssl": ctx},
+        )
+
+
+# Each attempt builds its own genai Client, and left to itself every Client
+# loads the CA bundle twice (~65 ms). One context, built once, serves them all.
+_ssl_context = None
+_ssl_lock = threading.Lock()
+
+
+def ssl_context():
+    """The process-wide TLS context for genai clients, as the SDK would build it."""
+    global _ssl_context
+    with _ssl_lock:
+        if _ssl_context is None:
+            import certifi
+
+            _ssl_context = ssl.create_default_context(
+                cafile=os.environ.get("SSL_CERT_FILE", certifi.where()),
+                capath=os.environ.get("SSL_CERT_DIR"),
+            )
+        return _ssl_context
+
+
+def payload_size(*parts):
+    """Rough request size in bytes of prompts, inline data and ``contents`` lists."""
+    size = 0
+    for part in parts:
+        if isinstance(part, str):
+            size += len(part.encode("utf-8"))
+        elif isinstance(part, (bytes, bytearray, memoryview)):
+            size += len(part)
+        elif isinstance(part, dict):
+            size += payload_size(*part.values())
+        elif isinstance(part, (list, tuple)):
+            size += payload_size(*part)
+    return size
@@ -0,0 +1,129 @@
+"""Background ffmpeg encoding of generated WAV into smaller download formats.
+
+Raw 24 kHz / 16-bit mono WAV is ~2.9 MB per minute. Opus at 32 kbit/s is
+~0.24 MB per minute and plays in every current browser, so it is the default
+playback variant; MP3 is offered for old players and FLAC for lossless.
+"""
+
+import hashlib
+import logging
+import shutil
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    "opus": {
+        "args": ["-c:a", "libopus", "-b:a", "32k", "-application", "voip", "-f", "ogg"],
+        "ext": "opus",
+        "mime": "audio/ogg",
+        "label": "Opus",
+    },
+    "mp3": {
+        "args": ["-c:a", "libmp3lame", "-b:a", "64k", "-f", "mp3"],
+        "ext": "mp3",
+        "mime": "audio/mpeg",
+        "label": "MP3",
+    },
+    "flac": {
+        "args": ["-c:a", "flac", "-compression_level", "5", "-f", "flac"],
+        "ext": "flac",
+        "mime": "audio/flac",
+        "label": "FLAC",
+    },
+}
+
+DEFAULT_FORMATS = ("opus", "mp3", "flac")
+PLAYBACK_FORMAT = "opus"
+
+ENCODE_TIMEOUT = 120
+MAX_CACHED = 16
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="encode")
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+@dataclass
+class Encoded:
+    fmt: str
+    data: bytes
+    seconds: float
+
+    @property
+    def size(self):
+        return len(self.data)
+
+    @property
+    def mime(self):
+        return FORMATS[self.fmt]["mime"]
+
+    @property
+    def ext(self):
+        return FORMATS[self.fmt]["ext"]
+
+
+def ffmpeg_available():
+    return shutil.which("ffmpeg") is not None
+
+
+def encode(wav_bytes, fmt):
+    """Encode WAV bytes with ffmpeg, piping through stdin/stdout."""
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "wav", "-i", "pipe:0", *FORMATS[fmt]["args"], "pipe:1"]
+
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, input=wav_bytes, capture_output=True, timeout=ENCODE_TIMEOUT, check=False)
+    elapsed = time.perf_counter() - start
+
+    if proc.returncode != 0 or not proc.stdout:
+        raise RuntimeError(f"ffmpeg {fmt} failed: {proc.stderr.decode(errors='replace').strip()}")
+
+    logger.info(
+        "encoded %s: %.0f KB -> %.0f KB in %.2fs",
+        fmt, len(wav_bytes) / 1024, len(proc.stdout) / 1024, elapsed
+    )
+    return Encoded(fmt=fmt, data=proc.stdout, seconds=elapsed)
+
+
+def encode_variants(wav_bytes, formats=DEFAULT_FORMATS):
+    """Queue every format on the worker pool; returns ``{fmt: Future}``.
+
+    Results are kept per content hash, so the reruns Streamlit does on every
+    widget change get the same futures back instead of encoding again.
+    """
+    if not ffmpeg_available():
+        return {}
+
+    digest = hashlib.sha1(wav_bytes).hexdigest()
+
+    with _lock:
+        variants = _cache.get(digest)
+        if variants is None:
+            variants = {}
+            _cache[digest] = variants
+        _cache.move_to_end(digest)
+
+        for fmt in formats:
+            if fmt not in variants:
+                variants[fmt] = _executor.submit(encode, wav_bytes, fmt)
+
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+
+        return {fmt: variants[fmt] for fmt in formats}
+
+
+def result_or_none(future, timeout=None):
+    if future is None:
+        return None
+    try:
+        return future.result(timeout=timeout)
+    except Exception as e:
+        if future.done():
+            logger.warning("encoding failed: %s", e)
+        return None
@@ -0,0 +1,86 @@
+"""Process-wide fonts and styles for PDF exports, plus a script segmenter.
+
+Registering a ``TTFont`` parses the whole TTF, so it happens once per process
+rather than on every export. ReportLab embeds TrueType fonts as subsets of
+the glyphs actually used, so long Hindi/Bhojpuri stories only carry the
+Devanagari glyphs they need.
+
+Each line is split into script runs in one regex pass. Single-script lines
+get that script's style directly; only mixed lines pay for inline font tags.
+"""
+
+import os
+import re
+import threading
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph
+
+FONT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FONTS = {
+    "Latin": "NotoSans-Regular.ttf",
+    "Deva": "NotoSansDevanagari-Regular.ttf",
+}
+
+# Letters decide the script; both fonts carry digits, spaces and punctuation,
+# so those stay in whichever run they fall in
+SCRIPT_RUN = re.compile(r"(?P<Deva>[\u0900-\u097F]+)|(?P<Latin>[A-Za-z\u00C0-\u024F]+)")
+
+_lock = threading.Lock()
+_registered = False
+
+
+def register_fonts():
+    global _registered
+    with _lock:
+        if not _registered:
+            for name, file_name in FONTS.items():
+                pdfmetrics.registerFont(TTFont(name, os.path.join(FONT_DIR, file_name)))
+            _registered = True
+
+
+@lru_cache(maxsize=None)
+def paragraph_styles(size=12):
+    """One body style per font, built once per size."""
+    register_fonts()
+    return {name: ParagraphStyle(name=f"{name}{size}", fontName=name, fontSize=size) for name in FONTS}
+
+
+def segment_scripts(line):
+    """Split ``line`` into ``(font, text)`` runs."""
+    runs = []
+    font = None
+    start = 0
+    for m in SCRIPT_RUN.finditer(line):
+        if m.lastgroup == font:
+            continue
+        if font is not None:
+            runs.append((font, line[start:m.start()]))
+            start = m.start()
+        font = m.lastgroup
+    runs.append((font or "Latin", line[start:]))
+    return runs
+
+
+def markup(runs):
+    """Paragraph markup for mixed-script runs, with the text XML-escaped."""
+    return "".join(
+        escape(text) if font == "Latin" else f'<font name="{font}">{escape(text)}</font>'
+        for font, text in runs
+    )
+
+
+def paragraph(line, size=12):
+    styles = paragraph_styles(size)
+    runs = segment_scripts(line)
+
+    if len(runs) == 1:
+        font, text = runs[0]
+        return Paragraph(escape(text), styles[font])
+
+    return Paragraph(markup(runs), styles["Latin"])
@@ -0,0 +1,104 @@
+"""Compressed, paginated history of generated documents in a local SQLite file.
+
+Keeping every full learning plan in ``st.session_state`` and re-rendering all
+of them on each rerun made long sessions steadily slower and heavier. Entries
+now live on disk, zlib-compressed and keyed by an owner id; pages list one
+page of titles at a time and only load the bodies a user expands.
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+
+from utils import storage
+
+# Holds every user's prompts and results, so it must not be readable by others
+DB_DIR = storage.temp_dir("exploreai_history")
+DB_NAME = "history.sqlite3"
+
+PAGE_SIZE = 5
+
+# Oldest entries beyond this are dropped per owner, and idle owners after the TTL
+MAX_PER_OWNER = 200
+TTL = 7 * 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    created REAL NOT NULL,
+    title TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_owner ON history (owner, id);
+"""
+
+
+class HistoryStore:
+
+    def __init__(self, path=None):
+        if path is None:
+            # Falls back to a fresh private directory for this process
+            db_dir = storage.private_dir(DB_DIR) or tempfile.mkdtemp(prefix="exploreai_history-")
+            path = os.path.join(db_dir, DB_NAME)
+        self.path = path
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # A connection per call keeps this safe from any thread
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def add(self, owner, title, text):
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO history (owner, created, title, size, body) VALUES (?, ?, ?, ?, ?)",
+                (owner, now, title, len(text), zlib.compress(text.encode("utf-8"))),
+            )
+            db.execute(
+                "DELETE FROM history WHERE owner = ? AND id NOT IN "
+                "(SELECT id FROM history WHERE owner = ? ORDER BY id DESC LIMIT ?)",
+                (owner, owner, MAX_PER_OWNER),
+            )
+            db.execute("DELETE FROM history WHERE created < ?", (now - TTL,))
+
+    def count(self, owner):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM history WHERE owner = ?", (owner,)).fetchone()[0]
+
+    def page(self, owner, page=0, page_size=PAGE_SIZE):
+        """Newest first: ``(id, created, title, size)`` rows, without bodies."""
+        with self._connect() as db:
+            return db.execute(
+                "SELECT id, created, title, size FROM history WHERE owner = ? "
+                "ORDER BY id DESC LIMIT ? OFFSET ?",
+                (owner, page_size, page * page_size),
+            ).fetchall()
+
+    def get(self, owner, entry_id):
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT body FROM history WHERE owner = ? AND id = ?", (owner, entry_id)
+            ).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+
+_store = None
+
+
+def store():
+    global _store
+    if _store is None:
+        _store = HistoryStore()
+    return _store
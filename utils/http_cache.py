@@ -0,0 +1,175 @@
+"""Persistent cache for public search APIs (YouTube, GitHub).
+
+Identical goals used to re-query both APIs on every generation, burning the
+YouTube quota and GitHub's small unauthenticated search limit. Responses are
+now kept on disk, keyed by a normalised query:
+
+* younger than ``ttl``: served straight from the cache;
+* younger than ``ttl + stale``: served at once, and refreshed in the
+  background (stale-while-revalidate);
+* older: fetched again before returning.
+
+Every refetch sends ``If-None-Match`` with the stored ETag, so an unchanged
+result costs a 304 with no body. Only the fields the page uses are stored
+(pass ``transform``), and callers should ask the API for just those fields
+where it supports a field mask.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import http_session, storage
+
+logger = logging.getLogger(__name__)
+
+# Cached answers are served as-is, so other local users must not write them
+CACHE_DIR = storage.temp_dir("exploreai_http_cache")
+
+DEFAULT_TTL = 6 * 60 * 60
+DEFAULT_STALE = 3 * 24 * 60 * 60
+REQUEST_TIMEOUT = 10
+
+_revalidator = ThreadPoolExecutor(max_workers=2, thread_name_prefix="revalidate")
+_refreshing = set()
+_lock = threading.Lock()
+
+_stats = Counter()
+
+
+def normalize_query(query):
+    """Case and whitespace differences should not miss the cache."""
+    return " ".join(str(query).lower().split())
+
+
+def cache_key(namespace, **parts):
+    raw = json.dumps([namespace, sorted(parts.items())], default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+
+    def __init__(self, store_dir=CACHE_DIR, ttl=DEFAULT_TTL, stale=DEFAULT_STALE):
+        # Falls back to a fresh private directory for this process
+        self.store_dir = storage.private_dir(store_dir) or tempfile.mkdtemp(prefix="exploreai_http_cache-")
+        self.ttl = ttl
+        self.stale = stale
+
+    # ---------------- STORAGE ----------------
+    def _path(self, key):
+        return os.path.join(self.store_dir, f"{key}.json")
+
+    def _load(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key, entry):
+        tmp = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._path(key))
+        except OSError as e:
+            logger.warning("could not store cache entry %s: %s", key, e)
+
+    # ---------------- FETCH ----------------
+    def _fetch(self, key, url, params, headers, transform, entry):
+        headers = dict(headers or {})
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+
+        r = http_session.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+
+        if r.status_code == 304 and entry:
+            record("revalidated")
+            entry["fetched"] = time.time()
+            self._store(key, entry)
+            return entry["value"]
+
+        r.raise_for_status()
+        record("fetched")
+
+        entry = {
+            "fetched": time.time(),
+            "etag": r.headers.get("ETag"),
+            "value": transform(r.json()) if transform else r.json(),
+        }
+        self._store(key, entry)
+        return entry["value"]
+
+    def _refresh_later(self, key, *args):
+        with _lock:
+            if key in _refreshing:
+                return
+            _refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fetch(key, *args)
+            except Exception as e:
+                record("refresh_failed")
+                logger.info("background refresh of %s failed: %s", key, e)
+            finally:
+                with _lock:
+                    _refreshing.discard(key)
+
+        _revalidator.submit(refresh)
+
+    def get(self, key, url, params=None, headers=None, transform=None):
+        """Cached ``GET url`` returning ``transform(json)``."""
+        entry = self._load(key)
+        age = time.time() - entry["fetched"] if entry else None
+
+        if entry and age < self.ttl:
+            record("hits")
+            return entry["value"]
+
+        if entry and age < self.ttl + self.stale:
+            record("stale_hits")
+            self._refresh_later(key, url, params, headers, transform, entry)
+            return entry["value"]
+
+        record("misses")
+        try:
+            return self._fetch(key, url, params, headers, transform, entry)
+        except Exception:
+            # An outdated answer beats an empty section when the API is down
+            if entry:
+                record("stale_on_error")
+                return entry["value"]
+            raise
+
+
+# ---------------- METRICS ----------------
+def record(name, n=1):
+    with _lock:
+        _stats[name] += n
+
+
+def stats():
+    with _lock:
+        return dict(_stats)
+
+
+_cache = None
+
+
+def default_cache():
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def cached_get(key, url, params=None, headers=None, transform=None):
+    return default_cache().get(key, url, params=params, headers=headers, transform=transform)
@@ -0,0 +1,113 @@
+"""One pooled ``requests`` session for every page's direct HTTP traffic.
+
+A bare ``requests.get``/``post`` opens a new TCP + TLS connection per call.
+The shared session keeps connections alive per host (bounded pool), retries
+connection failures and transient 5xx on idempotent requests, and accepts
+gzip (requests sends ``Accept-Encoding: gzip, deflate`` by default).
+
+A ``Session`` is safe to share across threads as long as callers pass
+per-request headers rather than mutating ``session.headers`` or cookies.
+Rate limits (429) are deliberately not retried here: key rotation moves to
+the next key instead.
+"""
+
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils import telemetry
+
+# Hosts we talk to: generativelanguage, googleapis (YouTube), api.github.com
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+RETRY = Retry(
+    total=2,
+    connect=2,
+    read=0,
+    status=2,
+    backoff_factor=0.3,
+    status_forcelist=(500, 502, 503, 504),
+    allowed_methods=frozenset({"GET", "HEAD"}),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+_session = None
+_lock = threading.Lock()
+_stats = Counter()
+
+
+class _CountingAdapter(HTTPAdapter):
+
+    def send(self, request, **kwargs):
+        with _lock:
+            _stats["requests"] += 1
+        try:
+            with telemetry.track("http", urlsplit(request.url).hostname, request=request.body, kind="http") as call:
+                response = call.response(super().send(request, **kwargs))
+                if response.status_code >= 400:
+                    call.fail(f"HTTP{response.status_code}")
+                return response
+        except Exception as e:
+            with _lock:
+                _stats[f"errors.{type(e).__name__}"] += 1
+            raise
+
+
+def session():
+    """The process-wide session, created on first use."""
+    global _session
+    with _lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = _CountingAdapter(
+                pool_connections=POOL_CONNECTIONS,
+                pool_maxsize=POOL_MAXSIZE,
+                max_retries=RETRY,
+            )
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+        return _session
+
+
+def get(url, **kwargs):
+    return session().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return session().post(url, **kwargs)
+
+
+# ---------------- METRICS ----------------
+def stats():
+    """Request and connection counts; ``reuse`` is the share of requests
+    served on an already-open connection."""
+    with _lock:
+        result = dict(_stats)
+        s = _session
+
+    connections = 0
+    pooled_requests = 0
+    if s is not None:
+        seen = set()
+        for adapter in s.adapters.values():
+            if id(adapter) in seen:
+                continue
+            seen.add(id(adapter))
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    connections += pool.num_connections
+                    pooled_requests += pool.num_requests
+
+    result["connections_opened"] = connections
+    if pooled_requests:
+        result["reuse"] = round(1 - connections / pooled_requests, 3)
+    return result
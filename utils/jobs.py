@@ -0,0 +1,333 @@
+"""Process-wide background jobs for generations that outlive a script run.
+
+Streamlit reruns the page on every widget change, so anything slow started
+inside the script is either blocked on or thrown away. Pages instead submit
+a plain function here and keep only the job id; a fragment polls the job
+(see ``utils.widgets.poll_job``) while the rest of the page stays usable.
+
+Job functions run on a worker thread without a ScriptRunContext, so they must
+not touch ``st.*``: they receive the ``Job`` to report progress, return the
+result, and raise ``JobError`` with a user-facing message on failure. They
+should pass ``job.token`` down to every key-rotation helper so cancelling a
+job stops it at the next checkpoint.
+
+A job function may also be a coroutine function. It then runs on the shared
+event loop in ``utils.aio`` instead of a worker thread, so any number of
+them can wait on the network at once without using up ``MAX_WORKERS``.
+
+A job submitted with a ``key`` (see ``utils.singleflight``) while an identical
+one is still running joins it instead: the sessions share one job id, and
+the job is only cancelled once every session that joined it has let go.
+"""
+
+import inspect
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from utils import cancel, singleflight, storage
+from utils.cancel import Cancelled, CancelToken
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+MAX_WORKERS = 4
+
+# Finished jobs stay in memory this long, and on disk for RESULT_TTL
+MEMORY_TTL = 15 * 60
+RESULT_TTL = 24 * 60 * 60
+
+# A running job nobody has polled for this long, whose owning session is gone,
+# is cancelled. The grace period lets a page reload reattach via the URL.
+ORPHAN_GRACE = 90
+REAP_INTERVAL = 30
+
+# Snapshots are pickles, so only this user may be able to write them
+JOBS_DIR = storage.temp_dir("exploreai_jobs")
+
+
+class JobError(Exception):
+    """Failure whose message is safe to show to the user as-is."""
+
+
+class Job:
+
+    def __init__(self, name, owner=None, inputs=None, key=None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.owner = owner
+        # Every session waiting on this job, the starting one included
+        self.owners = {owner} if owner else set()
+        self.key = key
+        self.inputs = inputs
+        self.token = CancelToken()
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ""
+        self.notices = []
+        self.partial = {}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.last_polled = self.created
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def update(self, progress=None, message=None, **partial):
+        """Report progress from inside the job; ``partial`` is shown early."""
+        if progress is not None:
+            self.progress = min(max(float(progress), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        self.partial.update(partial)
+
+    def notice(self, text):
+        """Queue a non-fatal message for the page to show when the job ends."""
+        self.notices.append(text)
+
+    def snapshot(self):
+        state = dict(self.__dict__)
+        state["partial"] = {}
+        state.pop("token", None)
+        return state
+
+
+class JobExecutor:
+
+    def __init__(self, max_workers=MAX_WORKERS, store_dir=JOBS_DIR, is_session_active=None):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        # flight key -> id of the unfinished job doing that work
+        self._flights = {}
+        self._lock = threading.Lock()
+        # Without a private directory, results live in memory only
+        self._store_dir = storage.private_dir(store_dir)
+        self._is_session_active = is_session_active or _streamlit_session_active
+
+        threading.Thread(target=self._reap_forever, name="job-reaper", daemon=True).start()
+
+    # ---------------- SUBMIT ----------------
+    def submit(self, name, fn, *args, owner=None, inputs=None, key=None, **kwargs):
+        with self._lock:
+            running = self._jobs.get(self._flights.get(key)) if key else None
+            if running is not None and not running.finished and not running.token.cancelled:
+                if owner:
+                    running.owners.add(owner)
+                running.last_polled = time.time()
+                singleflight.record("jobs_joined")
+                return running.id
+
+            job = Job(name, owner=owner, inputs=inputs, key=key)
+            self._jobs[job.id] = job
+            if key:
+                self._flights[key] = job.id
+
+        if inspect.iscoroutinefunction(fn):
+            from utils import aio
+
+            aio.submit(self._run_async(job, fn, args, kwargs))
+        else:
+            self._pool.submit(self._run, job, fn, args, kwargs)
+        self._evict()
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        with self._running(job) as run:
+            if run:
+                job.result = fn(job, *args, **kwargs)
+
+    async def _run_async(self, job, fn, args, kwargs):
+        with self._running(job) as run:
+            if run:
+                job.result = await fn(job, *args, **kwargs)
+
+    @contextmanager
+    def _running(self, job):
+        """Status bookkeeping around a job body; yields False if it was
+        cancelled before it started."""
+        if job.token.cancelled:
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            yield False
+            return
+
+        job.status = RUNNING
+        start = time.perf_counter()
+
+        try:
+            yield True
+            job.token.raise_if_cancelled()
+            job.progress = 1.0
+            job.status = DONE
+        except Cancelled:
+            job.status = CANCELLED
+        except JobError as e:
+            job.error = str(e)
+            job.status = FAILED
+        except Exception:
+            logger.exception("job %s (%s) crashed", job.id, job.name)
+            job.error = "⚠️ Something went wrong. Please try again."
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            self._land(job)
+            logger.info("job %s (%s) %s in %.1fs", job.id, job.name, job.status, time.perf_counter() - start)
+            self._persist(job)
+
+    def _land(self, job):
+        with self._lock:
+            if job.key and self._flights.get(job.key) == job.id:
+                del self._flights[job.key]
+
+    # ---------------- LOOKUP ----------------
+    def get(self, job_id, touch=False):
+        """Find a job; ``touch`` marks it as still wanted by a live page."""
+        if not job_id:
+            return None
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            if touch:
+                job.last_polled = time.time()
+            return job
+
+        return self._load(job_id)
+
+    # ---------------- CANCELLATION ----------------
+    def cancel(self, job_id, reason=cancel.SUPERSEDED, owner=None):
+        """Cancel a job; with ``owner`` set, only that session lets go of it
+        and the job keeps running while other sessions still wait on it."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished or job.token.cancelled:
+                return False
+            if owner is not None:
+                job.owners.discard(owner)
+                if job.owners:
+                    return False
+
+        self._land(job)
+        job.token.cancel(reason)
+        cancel.record(f"jobs_cancelled.{reason}")
+        logger.info("job %s (%s) cancelled: %s", job.id, job.name, reason)
+        return True
+
+    def _reap_forever(self):
+        while True:
+            time.sleep(REAP_INTERVAL)
+            try:
+                self._reap()
+            except Exception:
+                logger.exception("job reaper failed")
+
+    def _reap(self):
+        now = time.time()
+
+        with self._lock:
+            running = [job for job in self._jobs.values() if not job.finished]
+
+        for job in running:
+            if now - job.last_polled < ORPHAN_GRACE:
+                continue
+            if any(self._is_session_active(owner) for owner in job.owners):
+                continue
+            self.cancel(job.id, cancel.DISCONNECTED)
+
+    # ---------------- PERSISTENCE ----------------
+    def _path(self, job_id):
+        return os.path.join(self._store_dir, f"{job_id}.pkl")
+
+    def _persist(self, job):
+        if self._store_dir is None:
+            return
+        tmp = self._path(job.id) + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump(job.snapshot(), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(job.id))
+        except Exception as e:
+            logger.warning("could not persist job %s: %s", job.id, e)
+
+    def _load(self, job_id):
+        # Job ids come from session state / query params, so reject anything odd
+        if self._store_dir is None or len(job_id) != 32 or not job_id.isalnum():
+            return None
+
+        try:
+            with open(self._path(job_id), "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError):
+            return None
+
+        job = Job.__new__(Job)
+        job.__dict__.update(state)
+        job.token = CancelToken()
+        return job
+
+    def _evict(self):
+        now = time.time()
+
+        with self._lock:
+            stale = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished and now - job.finished_at > MEMORY_TTL
+            ]
+            for job_id in stale:
+                del self._jobs[job_id]
+
+        if self._store_dir is None:
+            return
+        try:
+            for entry in os.scandir(self._store_dir):
+                if now - entry.stat().st_mtime > RESULT_TTL:
+                    os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _streamlit_session_active(session_id):
+    try:
+        from streamlit.runtime import Runtime
+        return Runtime.instance().is_active_session(session_id)
+    except Exception:
+        # No runtime (scripts, benchmarks): fall back to the poll heartbeat alone
+        return False
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """The executor shared by every session in this process."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = JobExecutor()
+        return _executor
+
+
+def submit(name, fn, *args, **kwargs):
+    return executor().submit(name, fn, *args, **kwargs)
+
+
+def get(job_id, touch=False):
+    return executor().get(job_id, touch=touch)
+
+
+def cancel_job(job_id, reason=cancel.SUPERSEDED, owner=None):
+    return executor().cancel(job_id, reason, owner=owner)
@@ -0,0 +1,226 @@
+"""Token metering per key, model and page, and quota forecasts for key selection.
+
+Every response carries ``usage_metadata`` but nothing read it, so rotation
+kept trying keys that were about to hit their per-minute or daily quota and
+only found out from a 429. Each call's prompt, candidate and audio tokens are
+now accumulated per key (as a short hash) and model over sliding windows:
+a minute for RPM/TPM, a day for RPD. ``order`` sorts keys so rotation tries
+the one with the most headroom first, and keys that just returned 429 last.
+
+Quotas default to the free tier and can be overridden in secrets::
+
+    [quotas."gemini-2.5-flash-preview-tts"]
+    rpm = 10
+    rpd = 100
+
+The daily window slides over the last 24 hours rather than resetting at the
+provider's midnight, so forecasts err on the side of an exhausted key.
+"""
+
+import hashlib
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, replace
+
+MINUTE = 60
+DAY = 24 * 60 * 60
+
+# Recent request rate used to project daily exhaustion
+RATE_WINDOW = 15 * 60
+
+# How long a key is skipped after a 429 without Retry-After
+THROTTLE_COOLDOWN = 60
+
+
+@dataclass(frozen=True)
+class Quota:
+    rpm: int = 10
+    tpm: int = 250_000
+    rpd: int = 250
+
+
+QUOTAS = {
+    "gemini-2.5-flash": Quota(rpm=10, tpm=250_000, rpd=250),
+    "gemini-2.5-flash-lite": Quota(rpm=15, tpm=250_000, rpd=1000),
+    "gemini-2.5-flash-preview-tts": Quota(rpm=3, tpm=10_000, rpd=15),
+}
+DEFAULT_QUOTA = Quota()
+
+_quotas = {}
+
+
+def quota(model):
+    """Model quota, overridden by ``st.secrets["quotas"][model]`` if set."""
+    if model not in _quotas:
+        try:
+            import streamlit as st
+            overrides = dict(st.secrets.get("quotas", {}).get(model, {}))
+        except Exception:
+            overrides = {}
+        fields = {k: int(v) for k, v in overrides.items() if k in Quota.__dataclass_fields__}
+        _quotas[model] = replace(QUOTAS.get(model, DEFAULT_QUOTA), **fields)
+    return _quotas[model]
+
+
+def key_id(key):
+    """Stable, non-reversible label for an API key."""
+    return hashlib.sha1(str(key).encode("utf-8")).hexdigest()[:8] if key else "-"
+
+
+@dataclass(frozen=True)
+class Usage:
+    prompt: int = 0
+    candidates: int = 0
+    audio: int = 0
+    total: int = 0
+
+
+def _field(meta, snake, camel):
+    if isinstance(meta, dict):
+        return meta.get(camel, meta.get(snake))
+    return getattr(meta, snake, None)
+
+
+def usage(meta):
+    """``Usage`` from SDK ``usage_metadata`` or a REST ``usageMetadata`` dict."""
+    if not meta:
+        return Usage()
+
+    audio = 0
+    for details in ("prompt_tokens_details", "candidates_tokens_details"):
+        camel = details.replace("_tokens", "Tokens").replace("_details", "Details")
+        for entry in _field(meta, details, camel) or []:
+            modality = _field(entry, "modality", "modality")
+            if "AUDIO" in str(getattr(modality, "value", modality)).upper():
+                audio += _field(entry, "token_count", "tokenCount") or 0
+
+    prompt = _field(meta, "prompt_token_count", "promptTokenCount") or 0
+    candidates = _field(meta, "candidates_token_count", "candidatesTokenCount") or 0
+    total = _field(meta, "total_token_count", "totalTokenCount") or prompt + candidates
+    return Usage(prompt, candidates, audio, total)
+
+
+@dataclass(frozen=True)
+class Forecast:
+    key: str
+    model: str
+    quota: Quota
+    rpm: int
+    tpm: int
+    rpd: int
+    throttled_until: float
+    exhausts_at: float
+
+    @property
+    def headroom(self):
+        """Smallest remaining share of any quota, 0..1; -1 while throttled."""
+        if self.throttled_until > time.time():
+            return -1.0
+        shares = (1 - self.rpm / self.quota.rpm, 1 - self.tpm / self.quota.tpm, 1 - self.rpd / self.quota.rpd)
+        return max(min(shares), 0.0)
+
+
+class Meter:
+
+    def __init__(self):
+        # (key id, model) -> deque of (ts, page, Usage)
+        self._events = defaultdict(deque)
+        self._throttled = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, model, page, used, ts=None):
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            events = self._events[(key, model)]
+            events.append((ts, page, used))
+            while events and events[0][0] < ts - DAY:
+                events.popleft()
+
+    def throttle(self, key, model, retry_after=None):
+        with self._lock:
+            self._throttled[(key, model)] = time.time() + (retry_after or THROTTLE_COOLDOWN)
+
+    def forecast(self, key, model, now=None):
+        now = time.time() if now is None else now
+        limit = quota(model)
+        with self._lock:
+            events = list(self._events.get((key, model), ()))
+            throttled_until = self._throttled.get((key, model), 0.0)
+
+        minute = [u for ts, _, u in events if ts >= now - MINUTE]
+        day = [ts for ts, _, _ in events if ts >= now - DAY]
+        recent = sum(1 for ts in day if ts >= now - RATE_WINDOW)
+
+        exhausts_at = 0.0
+        if len(day) >= limit.rpd:
+            # Frees up as the oldest request slides out of the window
+            exhausts_at = now
+        elif recent:
+            exhausts_at = now + (limit.rpd - len(day)) / (recent / RATE_WINDOW)
+
+        return Forecast(key, model, limit, len(minute), sum(u.total for u in minute), len(day),
+                        throttled_until, exhausts_at)
+
+    def order(self, keys, model):
+        """``keys`` with the most quota headroom for ``model`` first; ties shuffled."""
+        keys = list(keys)
+        random.shuffle(keys)
+        now = time.time()
+        return sorted(keys, key=lambda k: -self.forecast(key_id(k), model, now).headroom)
+
+    def known(self):
+        with self._lock:
+            return sorted(set(self._events) | set(self._throttled))
+
+    def by_page(self, seconds=DAY):
+        """``{(page, model): {"requests", "prompt", "candidates", "audio"}}`` over ``seconds``."""
+        since = time.time() - seconds
+        with self._lock:
+            events = [(model, e) for (_, model), q in self._events.items() for e in q]
+
+        totals = defaultdict(lambda: {"requests": 0, "prompt": 0, "candidates": 0, "audio": 0})
+        for model, (ts, page, used) in events:
+            if ts < since:
+                continue
+            row = totals[(page, model)]
+            row["requests"] += 1
+            row["prompt"] += used.prompt
+            row["candidates"] += used.candidates
+            row["audio"] += used.audio
+        return dict(totals)
+
+
+_meter = None
+_meter_lock = threading.Lock()
+
+
+def meter():
+    """The process-wide meter, seeded from the telemetry log on first use so
+    a restart does not forget the day's usage."""
+    global _meter
+    with _meter_lock:
+        if _meter is None:
+            _meter = Meter()
+            _replay(_meter)
+        return _meter
+
+
+def _replay(m):
+    from utils import telemetry
+
+    since = time.time() - DAY
+    try:
+        # The last 24 hours span today's and yesterday's daily logs
+        entries = telemetry.read_log(days=2)
+    except OSError:
+        return
+    for entry in entries:
+        if entry.get("event") == "call" and entry["page"] != "http" and entry["ts"] >= since:
+            tokens = entry.get("tokens") or {}
+            m.record(entry["key"], entry["model"], entry["page"], Usage(**tokens), ts=entry["ts"])
+
+
+def order(keys, model):
+    return meter().order(keys, model)
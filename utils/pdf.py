@@ -0,0 +1,77 @@
+"""On-demand, content-addressed PDF exports.
+
+Report PDFs used to be laid out by ReportLab on every rerun, as the ``data=``
+of a download button, whether or not anyone downloaded them. Pages now only
+build a PDF when asked, and keep the bytes per content hash so later reruns
+(and other sessions exporting the same content) reuse them.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHED = 16
+
+_PAGE_RE = re.compile(rb"/Type\s*/Page\b")
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+@dataclass
+class Pdf:
+    data: bytes
+    seconds: float
+    pages: int
+
+    @property
+    def seconds_per_page(self):
+        return self.seconds / max(self.pages, 1)
+
+
+def content_key(*parts):
+    raw = json.dumps(parts, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def cached(key):
+    with _lock:
+        pdf = _cache.get(key)
+        if pdf is not None:
+            _cache.move_to_end(key)
+        return pdf
+
+
+def build(key, fn, *args):
+    """Return the cached PDF for ``key``, running ``fn(*args)`` on a miss.
+
+    ``fn`` may return bytes or a file-like buffer.
+    """
+    pdf = cached(key)
+    if pdf is not None:
+        return pdf
+
+    start = time.perf_counter()
+    out = fn(*args)
+    data = out if isinstance(out, bytes) else out.getvalue()
+    elapsed = time.perf_counter() - start
+
+    pdf = Pdf(data=data, seconds=elapsed, pages=len(_PAGE_RE.findall(data)))
+    logger.info(
+        "built %s: %d pages, %.0f KB in %.2fs (%.3fs/page)",
+        getattr(fn, "__name__", "pdf"), pdf.pages, len(data) / 1024, elapsed, pdf.seconds_per_page
+    )
+
+    with _lock:
+        _cache[key] = pdf
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+
+    return pdf
@@ -0,0 +1,122 @@
+"""Single-flight: identical concurrent generations share one upstream call.
+
+When several sessions submitted the same podcast topic, the same text or the
+same reference song at the same moment, each made its own upstream call, and
+a double-click on a generate button started the work twice. Work is now
+keyed by a canonical hash of everything that decides its result (model,
+prompt and config; for jobs, the job name and its arguments). While a flight
+with that key is in the air, later callers join it and receive the same
+result, or the same exception.
+
+Only in-flight work is shared: once a flight lands the next caller starts a
+new one, so this never serves stale results. Background jobs coalesce in
+``utils.jobs`` so joiners also share progress and streamed partials without
+holding a worker each; ``do`` covers calls made inside a script run.
+"""
+
+import hashlib
+import json
+import threading
+from collections import Counter
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+# ---------------- KEYS ----------------
+def _canonical(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # Uploaded audio can be megabytes; the digest stands in for it
+        return {"sha256": hashlib.sha256(value).hexdigest()}
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    if callable(value):
+        if getattr(value, "__closure__", None):
+            # Closures with the same name can capture different data
+            raise TypeError("cannot key a closure")
+        return f"{getattr(value, '__module__', '')}.{getattr(value, '__qualname__', repr(value))}"
+    if hasattr(value, "model_dump"):
+        # genai config and content types
+        return value.model_dump(mode="json", exclude_none=True)
+    raise TypeError(f"cannot key {type(value).__name__}")
+
+
+def flight_key(*parts):
+    """Hex digest of ``parts``, or None if something in them has no stable form
+    (such work just runs on its own)."""
+    try:
+        text = json.dumps(parts, sort_keys=True, default=_canonical, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ---------------- FLIGHTS ----------------
+class _Flight:
+
+    def __init__(self):
+        self.landed = threading.Event()
+        self.result = None
+        self.error = None
+        # False if the leader was interrupted (e.g. a Streamlit rerun) without
+        # an outcome; joiners then run the work themselves
+        self.ok = False
+
+
+class Group:
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return ``fn()``, or the result of the identical call already in flight."""
+        if key is None:
+            return fn()
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            record("calls_joined")
+            flight.landed.wait()
+            if flight.error is not None:
+                raise flight.error
+            if not flight.ok:
+                return self.do(key, fn)
+            return flight.result
+
+        record("calls_led")
+        try:
+            flight.result = fn()
+            flight.ok = True
+            return flight.result
+        except Exception as e:
+            # Control flow such as StopException stays in the leader's thread
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.landed.set()
+
+
+_group = Group()
+
+
+def do(key, fn):
+    return _group.do(key, fn)
+
+
+# ---------------- METRICS ----------------
+def record(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,41 @@
+"""Per-user directories for the files the app keeps between reruns.
+
+Job snapshots, cached API responses and the history database used to sit
+at fixed names in the shared temp dir, where any local user could read
+them, or create the path first and plant their own pickles, responses or
+database. Each now lives in a directory named after the current uid,
+created 0700 and checked to be owned by this user before it is used.
+"""
+
+import logging
+import os
+import stat
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def temp_dir(name):
+    """``<tempdir>/<name>-<uid>``: one directory per user of the machine."""
+    if hasattr(os, "getuid"):
+        name = f"{name}-{os.getuid()}"
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+def private_dir(path):
+    """``path`` created or checked as a directory only this user can touch, or
+    None if that cannot be guaranteed (the caller then keeps nothing there)."""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        info = os.lstat(path)
+    except OSError as e:
+        logger.warning("not using %s: %s", path, e)
+        return None
+
+    if not stat.S_ISDIR(info.st_mode):
+        logger.warning("not using %s: not a directory", path)
+        return None
+    if hasattr(os, "getuid") and (info.st_uid != os.getuid() or info.st_mode & 0o077):
+        logger.warning("not using %s: not private to this user", path)
+        return None
+    return path
@@ -0,0 +1,163 @@
+"""Streamed text generation with key rotation that survives mid-stream failures.
+
+``stream_with_key_rotation`` yields text chunks as they arrive, so pages can
+show the first tokens instead of waiting for the whole reply. If a key dies
+part-way through, the next key is asked to continue from the text already
+shown rather than starting over, and any overlap it repeats is trimmed.
+
+In the page, feed the generator to ``st.write_stream``. Inside a background
+job, use ``collect_stream`` to mirror the text into ``job.partial`` and
+``text_stream`` on the page side to replay it with ``st.write_stream``.
+"""
+
+import logging
+import time
+
+from utils import telemetry
+from utils.cancel import Cancelled, check
+from utils.deadline import DeadlineExceeded
+from utils.jobs import JobError
+
+logger = logging.getLogger(__name__)
+
+CONTINUE_PROMPT = (
+    "Your previous reply was cut off. Continue exactly where it stopped, "
+    "without repeating anything or adding any preamble."
+)
+
+# How far back to look for text a resumed stream repeats
+OVERLAP_WINDOW = 200
+# Shorter matches are as likely to be an ordinary continuation ("I lik" + "e")
+MIN_OVERLAP = 16
+
+
+class StreamFailed(JobError):
+    """Every key failed before the stream could finish."""
+
+
+def _as_turns(contents):
+    if isinstance(contents, str):
+        return [{"role": "user", "parts": [{"text": contents}]}]
+    if contents and all(isinstance(c, str) for c in contents):
+        return [{"role": "user", "parts": [{"text": c} for c in contents]}]
+    return list(contents)
+
+
+def _continuation(contents, emitted):
+    return _as_turns(contents) + [
+        {"role": "model", "parts": [{"text": emitted}]},
+        {"role": "user", "parts": [{"text": CONTINUE_PROMPT}]},
+    ]
+
+
+def _trim_overlap(emitted, text):
+    """Drop the start of ``text`` that repeats the end of ``emitted``.
+
+    Only a repeat of at least ``MIN_OVERLAP`` characters that starts on a word
+    boundary counts; anything shorter is kept as new text.
+
+    >>> _trim_overlap("Once upon a time there was a fox", "upon a time there was a fox who")
+    ' who'
+    >>> _trim_overlap("I like", "e-mail")
+    'e-mail'
+    >>> _trim_overlap("Hello world", "d is round")
+    'd is round'
+    """
+    tail = emitted[-OVERLAP_WINDOW:]
+    for n in range(min(len(tail), len(text)), MIN_OVERLAP - 1, -1):
+        if not tail.endswith(text[:n]):
+            continue
+        before = emitted[-n - 1:-n]
+        if before.isalnum() and text[0].isalnum():
+            continue
+        return text[n:]
+    return text
+
+
+def stream_with_key_rotation(keys, model, contents, config=None, deadline=None, cancel=None,
+                             failure_message="⚠️ All API keys failed", page="-"):
+    """Yield text chunks from the first key that works, resuming on failover."""
+    from google import genai
+
+    emitted = ""
+
+    with telemetry.rotation(page, model, contents, kind="stream") as rotation:
+        for idx, key in enumerate(keys):
+            check(cancel, skipped=len(keys) - idx)
+            http_options = deadline.http_options() if deadline else None
+            resumed = bool(emitted)
+            # After a resume, hold text back until a repeat could be told
+            # apart from new text, even if it spans several chunks
+            held = ""
+
+            try:
+                with rotation.attempt(key) as call:
+                    client = genai.Client(api_key=key, http_options=http_options)
+                    request = _continuation(contents, emitted) if resumed else contents
+
+                    for chunk in client.models.generate_content_stream(model=model, contents=request, config=config):
+                        check(cancel)
+                        if deadline:
+                            deadline.check()
+
+                        call.usage(chunk.usage_metadata)
+                        text = chunk.text
+                        if not text:
+                            continue
+                        call.received(text)
+                        if resumed:
+                            held += text
+                            if len(held) < OVERLAP_WINDOW:
+                                continue
+                            text = _trim_overlap(emitted, held)
+                            resumed = False
+                            if not text:
+                                continue
+
+                        emitted += text
+                        yield text
+
+                if held and resumed:
+                    text = _trim_overlap(emitted, held)
+                    if text:
+                        emitted += text
+                        yield text
+                return
+
+            except (Cancelled, DeadlineExceeded):
+                raise
+            except Exception as e:
+                logger.info("stream on key %d failed after %d chars: %s", idx + 1, len(emitted), e)
+                continue
+
+    raise StreamFailed(failure_message)
+
+
+# ---------------- JOBS ----------------
+def collect_stream(job, key, chunks):
+    """Consume ``chunks`` inside a job, publishing the text as ``job.partial[key]``."""
+    text = ""
+    try:
+        for chunk in chunks:
+            text += chunk
+            job.update(**{key: text})
+    finally:
+        job.update(**{f"{key}:done": True})
+    return text
+
+
+def text_stream(partial, key, poll=0.05, idle_timeout=120):
+    """Replay a ``collect_stream`` from the page side, for ``st.write_stream``."""
+    sent = 0
+    idle_since = time.monotonic()
+
+    while True:
+        text = partial.get(key, "")
+        if len(text) > sent:
+            yield text[sent:]
+            sent = len(text)
+            idle_since = time.monotonic()
+        elif partial.get(f"{key}:done") or time.monotonic() - idle_since > idle_timeout:
+            return
+        else:
+            time.sleep(poll)
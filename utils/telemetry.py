@@ -0,0 +1,426 @@
+"""Latency, size, retry and error telemetry for every AI and HTTP call.
+
+Key-rotation loops used to swallow failures with ``except Exception:
+continue``, so nobody could see how often a key failed or what failover cost.
+Every attempt now runs inside ``Rotation.attempt``, which records the page,
+model, key (as a short hash, never the key itself), attempt number, latency,
+request/response bytes and error class. The rotation as a whole records how
+many attempts it took and how long the user waited.
+
+Records are appended to a daily JSONL log (``calls-YYYY-MM-DD.jsonl``, UTC;
+files older than ``KEEP_DAYS`` are deleted) and summarised into a Prometheus text
+file (p50/p95/p99 latency per page and model, errors, bytes, failover time)
+that a node-exporter textfile collector or a sidecar can serve;
+``python -m utils.telemetry`` prints the same figures from the log. Usage::
+
+    with telemetry.rotation("text2audio", ttsmodel, prompt) as rotation:
+        for key in keys:
+            try:
+                with rotation.attempt(key) as call:
+                    response = client.models.generate_content(...)
+                    call.response(response)
+                return response
+            except Exception:
+                continue
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import asdict
+
+from utils import metering
+from utils.cancel import Cancelled
+from utils.metering import Usage, key_id
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_DIR = os.environ.get("EXPLOREAI_TELEMETRY_DIR", os.path.join(tempfile.gettempdir(), "exploreai_telemetry"))
+CALLS_LOG = "calls-{day}.jsonl"
+KEEP_DAYS = 7
+METRICS_FILE = "metrics.prom"
+
+# Ways an attempt ends because the caller stopped waiting, not because the
+# key failed: recorded as cancelled, with no error and no failover time
+CANCELLATIONS = (Cancelled, GeneratorExit, KeyboardInterrupt, SystemExit, asyncio.CancelledError)
+
+# Recent records kept in memory for quantiles, and how often the .prom file is rewritten
+WINDOW = 5000
+EXPORT_INTERVAL = 10.0
+QUANTILES = (0.5, 0.95, 0.99)
+
+_lock = threading.Lock()
+_recent = deque(maxlen=WINDOW)
+_counters = Counter()
+_last_export = 0.0
+_log_day = None
+
+
+def payload_bytes(value):
+    """Best-effort size of a request or response of any shape we send or get back."""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, dict):
+        return sum(payload_bytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_bytes(v) for v in value)
+
+    if hasattr(value, "status_code"):
+        # requests / httpx responses: wire size, without forcing a streamed body to load
+        length = value.headers.get("Content-Length")
+        if length and length.isdigit():
+            return int(length)
+        body = value.__dict__.get("_content")
+        return len(body) if isinstance(body, (bytes, bytearray)) else 0
+
+    # genai objects: responses hold candidates, requests hold Content parts
+    candidates = getattr(value, "candidates", None)
+    if candidates is not None:
+        return sum(payload_bytes(getattr(c, "content", None)) for c in candidates)
+    size = 0
+    for part in getattr(value, "parts", None) or []:
+        size += payload_bytes(getattr(part, "text", None))
+        inline = getattr(part, "inline_data", None)
+        size += payload_bytes(getattr(inline, "data", None))
+    return size
+
+
+class Call:
+
+    def __init__(self, page, model, key, attempt, request_bytes, kind):
+        self.page = page
+        self.model = model
+        self.key = key_id(key)
+        self.attempt = attempt
+        self.kind = kind
+        self.request_bytes = request_bytes
+        self.response_bytes = 0
+        self.tokens = Usage()
+        self.error = None
+        self.cancelled = False
+        self.started = time.time()
+        self.latency = 0.0
+
+    def response(self, value):
+        self.response_bytes = payload_bytes(value)
+        self.usage(getattr(value, "usage_metadata", None))
+        return value
+
+    def usage(self, meta):
+        """Token counts from ``usage_metadata`` (for streams, the latest chunk's)."""
+        if meta:
+            self.tokens = metering.usage(meta)
+
+    def received(self, chunk):
+        """Add a streamed chunk to the response size."""
+        self.response_bytes += payload_bytes(chunk)
+        return chunk
+
+    def fail(self, error):
+        """Mark an attempt that returned but was unusable (e.g. no audio)."""
+        self.error = error
+
+    def as_dict(self):
+        return {
+            "event": "call",
+            "ts": round(self.started, 3),
+            "page": self.page,
+            "model": self.model,
+            "kind": self.kind,
+            "key": self.key,
+            "attempt": self.attempt,
+            "latency": round(self.latency, 4),
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "error": self.error,
+            "cancelled": self.cancelled,
+            "tokens": asdict(self.tokens),
+        }
+
+
+class Rotation:
+
+    def __init__(self, page, model, request=None, kind="generate"):
+        self.page = page
+        self.model = model
+        self.kind = kind
+        self.request_bytes = payload_bytes(request)
+        self.attempts = 0
+        self.ok = False
+        self.cancelled = False
+        self.failover = 0.0
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def attempt(self, key):
+        self.attempts += 1
+        call = Call(self.page, self.model, key, self.attempts, self.request_bytes, self.kind)
+        start = time.perf_counter()
+        try:
+            yield call
+        except CANCELLATIONS:
+            call.cancelled = self.cancelled = True
+            raise
+        except BaseException as e:
+            call.error = type(e).__name__
+            if getattr(e, "code", None) == 429:
+                call.error = "HTTP429"
+            raise
+        finally:
+            call.latency = time.perf_counter() - start
+            if call.cancelled:
+                logger.info("%s %s key %s attempt %d cancelled", self.page, self.model, call.key, call.attempt)
+            elif call.error is None:
+                self.ok = True
+            else:
+                self.failover += call.latency
+                logger.info("%s %s key %s attempt %d failed: %s", self.page, self.model, call.key, call.attempt, call.error)
+            if self.page != "http":
+                meter = metering.meter()
+                meter.record(call.key, self.model, self.page, call.tokens)
+                if call.error == "HTTP429":
+                    meter.throttle(call.key, self.model)
+            record(call.as_dict())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record({
+            "event": "rotation",
+            "page": self.page,
+            "model": self.model,
+            "kind": self.kind,
+            "attempts": self.attempts,
+            "ok": self.ok,
+            "cancelled": self.cancelled and not self.ok,
+            "latency": round(time.perf_counter() - self.started, 4),
+            "failover": round(self.failover, 4),
+        })
+        return False
+
+
+def rotation(page, model, request=None, kind="generate"):
+    return Rotation(page, model, request, kind)
+
+
+def track(page, model, key=None, request=None, kind="generate"):
+    """A single call outside any rotation (``with telemetry.track(...) as call``)."""
+    return Rotation(page, model, request, kind).attempt(key)
+
+
+# ---------------- RECORDING ----------------
+def record(entry):
+    line = json.dumps(entry)
+
+    with _lock:
+        _recent.append(entry)
+        series = (entry["page"], entry["model"], entry["kind"])
+        if entry["event"] == "call":
+            _counters[("calls",) + series] += 1
+            _counters[("request_bytes",) + series] += entry["request_bytes"]
+            _counters[("response_bytes",) + series] += entry["response_bytes"]
+            if entry["error"]:
+                _counters[("errors",) + series + (entry["error"],)] += 1
+        else:
+            _counters[("rotations",) + series + (_outcome(entry),)] += 1
+            _counters[("failover_seconds",) + series] += entry["failover"]
+
+        try:
+            os.makedirs(TELEMETRY_DIR, exist_ok=True)
+            with open(_rotate(time.time()), "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.warning("could not write telemetry: %s", e)
+
+    _maybe_export()
+
+
+def _day(ts):
+    return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+
+def log_path(ts=None):
+    return os.path.join(TELEMETRY_DIR, CALLS_LOG.format(day=_day(time.time() if ts is None else ts)))
+
+
+def _rotate(ts):
+    """Today's log file; on the first write of a day, delete expired ones."""
+    global _log_day
+    day = _day(ts)
+    if day != _log_day:
+        _log_day = day
+        oldest = _day(ts - KEEP_DAYS * metering.DAY)
+        for path in glob.glob(os.path.join(TELEMETRY_DIR, CALLS_LOG.format(day="*"))):
+            if os.path.basename(path) < CALLS_LOG.format(day=oldest):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+    return log_path(ts)
+
+
+def _outcome(rotation):
+    if rotation["ok"]:
+        return "ok"
+    # Logs written before cancellations were told apart have no flag
+    return "cancelled" if rotation.get("cancelled") else "failed"
+
+
+def _quantile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(entries):
+    """Per ``(page, model, kind)``: attempts, errors, latency quantiles (seconds)
+    and failover cost, i.e. time users spent waiting on keys that then failed."""
+    result = {}
+    for entry in entries:
+        series = (entry["page"], entry["model"], entry["kind"])
+        row = result.setdefault(series, {"latencies": [], "calls": 0, "errors": 0,
+                                         "rotations": 0, "retried": 0, "failed": 0, "failover": []})
+        if entry["event"] == "call":
+            row["calls"] += 1
+            row["errors"] += bool(entry["error"])
+            if not entry.get("cancelled"):
+                row["latencies"].append(entry["latency"])
+        else:
+            row["rotations"] += 1
+            row["retried"] += entry["attempts"] > 1
+            row["failed"] += _outcome(entry) == "failed"
+            row["failover"].append(entry["failover"])
+
+    for row in result.values():
+        latencies = row.pop("latencies")
+        failover = row.pop("failover")
+        for q in QUANTILES:
+            row[f"p{int(q * 100)}"] = _quantile(latencies, q) if latencies else None
+        row["failover_total"] = sum(failover)
+        row["failover_p95"] = _quantile(failover, 0.95) if failover else 0.0
+    return result
+
+
+def summary():
+    """``summarize`` over this process's most recent calls."""
+    with _lock:
+        entries = list(_recent)
+    return summarize(entries)
+
+
+def read_log(path=None, days=KEEP_DAYS):
+    """Entries from a JSONL log, e.g. to summarise across processes and restarts.
+
+    Without ``path``, reads the daily logs of the last ``days`` days (UTC),
+    oldest first; days with no log are skipped.
+    """
+    if path:
+        paths = [path]
+    else:
+        now = time.time()
+        paths = [p for p in (log_path(now - i * metering.DAY) for i in reversed(range(days))) if os.path.exists(p)]
+
+    entries = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue  # A line cut short by a crash
+    return entries
+
+
+# ---------------- EXPORT ----------------
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), "")}"' for k, v in labels.items()) + "}"
+
+
+def prometheus_text():
+    """Counters since process start; quantiles over the last ``WINDOW`` records."""
+    with _lock:
+        counters = dict(_counters)
+        entries = list(_recent)
+
+    lines = [
+        "# HELP exploreai_call_latency_seconds Latency of one AI or HTTP call attempt.",
+        "# TYPE exploreai_call_latency_seconds summary",
+    ]
+    for (page, model, kind), row in sorted(summarize(entries).items()):
+        if row["p50"] is not None:
+            for q in QUANTILES:
+                lines.append(f"exploreai_call_latency_seconds{_labels(page=page, model=model, kind=kind, quantile=q)} "
+                             f"{row[f'p{int(q * 100)}']:.4f}")
+
+    metrics = {
+        "calls": ("exploreai_calls_total", "Call attempts, including failed ones."),
+        "errors": ("exploreai_call_errors_total", "Failed call attempts by error class."),
+        "request_bytes": ("exploreai_call_bytes_total", "Request and response payload bytes."),
+        "response_bytes": ("exploreai_call_bytes_total", None),
+        "rotations": ("exploreai_rotations_total", "Key rotations by outcome."),
+        "failover_seconds": ("exploreai_failover_seconds_total", "Time spent on attempts that failed over."),
+    }
+    described = set()
+    for key, n in sorted(counters.items(), key=str):
+        name, help_text = metrics[key[0]]
+        if name not in described:
+            described.add(name)
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+
+        labels = {"page": key[1], "model": key[2], "kind": key[3]}
+        if key[0] == "errors":
+            labels["error"] = key[4]
+        elif key[0] == "rotations":
+            labels["outcome"] = key[4]
+        elif key[0].endswith("_bytes"):
+            labels["direction"] = key[0].split("_")[0]
+        lines.append(f"{name}{_labels(**labels)} {n:.4f}" if isinstance(n, float) else f"{name}{_labels(**labels)} {n}")
+
+    return "\n".join(lines) + "\n"
+
+
+def export(path=None):
+    path = path or os.path.join(TELEMETRY_DIR, METRICS_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+    return path
+
+
+def _maybe_export():
+    global _last_export
+    now = time.monotonic()
+    with _lock:
+        if now - _last_export < EXPORT_INTERVAL:
+            return
+        _last_export = now
+    try:
+        export()
+    except OSError as e:
+        logger.warning("could not export metrics: %s", e)
+
+
+if __name__ == "__main__":
+    # python -m utils.telemetry [calls-YYYY-MM-DD.jsonl]: per-page latency and failover table
+    import sys
+
+    rows = summarize(read_log(sys.argv[1] if len(sys.argv) > 1 else None))
+    print(f"{'page':<13}{'model':<34}{'kind':<9}{'calls':>6}{'errors':>7}"
+          f"{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'retried':>8}{'failover s':>11}")
+    for (page, model, kind), row in sorted(rows.items()):
+        quantiles = "".join(f"{row[p]:>8.2f}" if row[p] is not None else f"{'-':>8}" for p in ("p50", "p95", "p99"))
+        print(f"{page:<13}{model:<34}{kind:<9}{row['calls']:>6}{row['errors']:>7}"
+              f"{quantiles}{row['retried']:>8}{row['failover_total']:>11.2f}")
@@ -0,0 +1,161 @@
+"""Background warm-up of a fresh server process, before its first visitor.
+
+The keep-awake workflow only loads the landing page, so after a wake-up the
+first visitor of each AI page still paid for importing the genai SDK (about
+0.6 s), registering the PDF fonts, loading the CA bundle and opening TLS
+connections. Every page now calls ``start()`` on its first run; the first
+call in a process does all of that on a daemon thread, and later calls
+return at once. Whichever page a visitor lands on, the rest is warm by the
+time they press a button.
+
+Warm connections only last as long as the far end keeps idle connections
+open (a minute or a few), so they mostly help the visitor right after a
+wake-up, which is the one that was slowest.
+
+``python -m utils.warmup`` runs the same steps in the foreground and prints
+how long each took.
+"""
+
+import importlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# What the pages import lazily, heaviest first
+HEAVY_MODULES = (
+    "google.genai",
+    "google.genai.types",
+    "reportlab.platypus",
+    "utils.fonts",
+    "utils.waveform",
+    "soundfile",
+    "PyPDF2",
+    "docx",
+)
+
+GEMINI_BASE_URL = os.environ.get("GOOGLE_GEMINI_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+
+# Hosts the shared requests session talks to; cheap, unauthenticated URLs
+SESSION_URLS = (
+    "https://www.googleapis.com/discovery/v1/apis?fields=kind",
+    "https://api.github.com/",
+)
+
+CONNECT_TIMEOUT = 5
+
+# Let the page that triggered the warm-up render first; importing on another
+# thread holds the GIL for long stretches
+START_DELAY = 1.0
+
+_lock = threading.Lock()
+_started = False
+_report = {}
+
+
+# ---------------- STEPS ----------------
+def _imports():
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.info("warm-up: %s not importable: %s", name, e)
+
+
+def _fonts():
+    from utils.fonts import paragraph_styles
+
+    paragraph_styles()
+
+
+def _clients():
+    # The first Client and config pay for the SDK's lazy setup and pydantic
+    # validators; the shared TLS context is reused by every later attempt
+    from google import genai
+    from google.genai import types
+
+    from utils.deadline import ssl_context
+
+    ctx = ssl_context()
+    options = types.HttpOptions(timeout=CONNECT_TIMEOUT * 1000, client_args={"verify": ctx},
+                                async_client_args={"verify": ctx, "ssl": ctx})
+    genai.Client(api_key="warm-up", http_options=options)
+    types.GenerateContentConfig(
+        response_modalities=["AUDIO"],
+        speech_config=types.SpeechConfig(
+            voice_config=types.VoiceConfig(prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name="Kore"))
+        ),
+    )
+
+
+def _connections():
+    from utils import aio, http_session
+
+    session = http_session.session()
+    for url in SESSION_URLS:
+        try:
+            session.head(url, timeout=CONNECT_TIMEOUT)
+        except Exception as e:
+            logger.info("warm-up: %s unreachable: %s", url, e)
+
+    # singify's REST TTS goes through the async client
+    async def head():
+        return await aio.http_client().head(GEMINI_BASE_URL, timeout=CONNECT_TIMEOUT)
+
+    try:
+        aio.run(head(), timeout=CONNECT_TIMEOUT * 2)
+    except Exception as e:
+        logger.info("warm-up: %s unreachable: %s", GEMINI_BASE_URL, e)
+
+
+STEPS = (
+    ("imports", _imports),
+    ("fonts", _fonts),
+    ("clients", _clients),
+    ("connections", _connections),
+)
+
+
+# ---------------- RUNNING ----------------
+def run(delay=0.0):
+    """Run every step now; returns ``{step: seconds, "total": seconds}``."""
+    time.sleep(delay)
+    report = {}
+    started = time.perf_counter()
+    for name, step in STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning("warm-up step %s failed: %s", name, e)
+        report[name] = round(time.perf_counter() - start, 3)
+    report["total"] = round(time.perf_counter() - started, 3)
+
+    with _lock:
+        _report.update(report)
+    logger.info("warm-up done in %.2fs: %s", report["total"], report)
+    return report
+
+
+def start():
+    """Warm the process in the background; only the first call does anything."""
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=run, args=(START_DELAY,), name="warm-up", daemon=True).start()
+
+
+def report():
+    """Step durations of the finished warm-up; empty while it is running."""
+    with _lock:
+        return dict(_report) if "total" in _report else {}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for step, seconds in run().items():
+        print(f"{step:<12}{seconds:>8.2f}s")
@@ -0,0 +1,139 @@
+"""Energy contours for singing comparison, cached as min/max envelope pyramids.
+
+Singperfect used to re-read both tracks and plot their full-resolution
+contours with a fresh matplotlib figure on every rerun, never closing it.
+Each track's contour is now computed once and reduced into a pyramid of
+min/max envelopes (each level halves the previous one), so a chart is drawn
+from the coarsest level that still has screen resolution: the payload and
+render time stay the same for a 30-second clip and a 10-minute song.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+import soundfile as sf
+from pydub import AudioSegment
+
+FRAME_SECONDS = 0.05
+HOP_SECONDS = 0.025
+
+# Points per trace sent to the browser; roughly a chart's width in pixels
+SCREEN_POINTS = 800
+
+MAX_CACHED = 8
+
+COLORS = ("#1f77b4", "#ff7f0e", "#2ca02c")
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def safe_read_audio(path):
+    try:
+        y, sr = sf.read(path, always_2d=False)
+        if y.ndim > 1:
+            y = np.mean(y, axis=1)
+        return y.astype(float), sr
+    except Exception:
+        audio = AudioSegment.from_file(path)
+        y = np.array(audio.get_array_of_samples()).astype(float)
+        sr = audio.frame_rate
+        return y, sr
+
+
+def load_audio_energy(path):
+    """Mean absolute amplitude per 50 ms frame (25 ms hop), normalised to 0..1."""
+    try:
+        y, sr = safe_read_audio(path)
+        frame_len = int(FRAME_SECONDS * sr)
+        hop = int(HOP_SECONDS * sr)
+        if len(y) <= frame_len:
+            return np.array([])
+
+        # Windowed means from one cumulative sum instead of a Python loop
+        csum = np.concatenate(([0.0], np.cumsum(np.abs(y))))
+        starts = np.arange(0, len(y) - frame_len, hop)
+        energies = (csum[starts + frame_len] - csum[starts]) / frame_len
+
+        if np.max(energies) > 0:
+            energies /= np.max(energies)
+        return energies
+    except Exception:
+        return np.array([])
+
+
+class EnvelopePyramid:
+    """Min/max envelopes of a 1-D signal at halving resolutions."""
+
+    def __init__(self, values, hop_seconds=HOP_SECONDS):
+        values = np.asarray(values, dtype=float)
+        self.hop_seconds = hop_seconds
+        self.levels = [(values, values)]
+
+        lo, hi = values, values
+        while len(lo) > 1:
+            n = len(lo) // 2 * 2
+            tail_lo, tail_hi = lo[n:], hi[n:]
+            lo = np.concatenate((np.minimum(lo[:n:2], lo[1:n:2]), tail_lo))
+            hi = np.concatenate((np.maximum(hi[:n:2], hi[1:n:2]), tail_hi))
+            self.levels.append((lo, hi))
+
+    def __len__(self):
+        return len(self.levels[0][0])
+
+    @property
+    def mean(self):
+        return float(np.mean(self.levels[0][0])) if len(self) else 0.0
+
+    @property
+    def duration(self):
+        return len(self) * self.hop_seconds
+
+    def envelope(self, points=SCREEN_POINTS):
+        """``(seconds, lows, highs)`` from the finest level with at most ``points`` samples."""
+        for level, (lo, hi) in enumerate(self.levels):
+            if len(lo) <= points:
+                break
+        step = self.hop_seconds * (1 << level)
+        return np.arange(len(lo)) * step, lo, hi
+
+
+def energy_pyramid(path):
+    """Cached ``EnvelopePyramid`` of a file's energy contour."""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+
+    with _lock:
+        pyramid = _cache.get(key)
+        if pyramid is not None:
+            _cache.move_to_end(key)
+            return pyramid
+
+    pyramid = EnvelopePyramid(load_audio_energy(path))
+
+    with _lock:
+        _cache[key] = pyramid
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+
+    return pyramid
+
+
+def comparison_figure(tracks, points=SCREEN_POINTS, title="Energy Contour Comparison"):
+    """Plotly figure with one min/max band per ``{label: EnvelopePyramid}``."""
+    fig = go.Figure()
+    for (label, pyramid), color in zip(tracks.items(), COLORS):
+        x, lo, hi = pyramid.envelope(points)
+        line = {"width": 1, "color": color}
+        fig.add_trace(go.Scatter(x=x, y=hi, mode="lines", line=line, name=label, legendgroup=label))
+        fig.add_trace(go.Scatter(
+            x=x, y=lo, mode="lines", line=line, fill="tonexty",
+            name=label, legendgroup=label, showlegend=False,
+        ))
+
+    fig.update_layout(title=title, height=360, margin={"l": 40, "r": 20, "t": 50, "b": 40},
+                      xaxis_title="seconds", yaxis_title="energy", hovermode="x unified")
+    return fig
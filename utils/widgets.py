@@ -0,0 +1,219 @@
+"""Streamlit building blocks shared by several pages."""
+
+import hashlib
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils import cancel, jobs, pdf, singleflight
+from utils.encoding import FORMATS, PLAYBACK_FORMAT, encode_variants, result_or_none
+
+# Seconds between checks for background encodes; the download row polls
+# until every format is ready
+VARIANT_POLL = 1.0
+
+# Seconds between job status checks while a generation is running
+POLL_INTERVAL = 1.0
+
+STOPPED_MESSAGE = "⏹️ Generation stopped because the inputs changed."
+
+
+def _mb(n):
+    return f"{n / (1024 * 1024):.1f} MB"
+
+
+def _playback(wav_bytes, variants):
+    # Whatever the browser got first keeps playing: swapping to Opus once it
+    # is ready would restart playback and send the audio twice
+    chosen = st.session_state.setdefault("_audio_playback", {})
+    digest = hashlib.sha1(wav_bytes).hexdigest()
+    if digest not in chosen:
+        future = variants.get(PLAYBACK_FORMAT)
+        if len(chosen) >= 8:
+            chosen.pop(next(iter(chosen)))
+        chosen[digest] = result_or_none(future) if future is not None and future.done() else None
+    return chosen[digest]
+
+
+def audio_player(wav_bytes, file_stem=None, key=None):
+    """Play generated audio, preferring the compressed variant if it is ready.
+
+    With ``file_stem`` set, also shows one download button per format with
+    its size and encode time, plus the original WAV. Formats still encoding
+    show a caption that turns into their button once done, without
+    blocking the rerun.
+    """
+    variants = encode_variants(wav_bytes)
+    playback = _playback(wav_bytes, variants)
+
+    if playback:
+        st.audio(playback.data, format=playback.mime)
+    else:
+        st.audio(wav_bytes, format="audio/wav")
+
+    if not file_stem:
+        return
+
+    key = key or file_stem
+    pending = not all(future.done() for future in variants.values())
+
+    @st.fragment(run_every=VARIANT_POLL if pending else None)
+    def _downloads():
+        cols = st.columns(len(variants) + 1)
+
+        for col, (fmt, future) in zip(cols, variants.items()):
+            with col:
+                encoded = result_or_none(future) if future.done() else None
+                if encoded:
+                    st.download_button(
+                        f"⬇️ {FORMATS[fmt]['label']} · {_mb(encoded.size)}",
+                        data=encoded.data,
+                        file_name=f"{file_stem}.{encoded.ext}",
+                        mime=encoded.mime,
+                        key=f"{key}_{fmt}",
+                        help=f"Encoded in {encoded.seconds:.1f}s",
+                    )
+                elif not future.done():
+                    st.caption(f"⏳ Preparing {FORMATS[fmt]['label']}…")
+
+        with cols[-1]:
+            st.download_button(
+                f"⬇️ WAV · {_mb(len(wav_bytes))}",
+                data=wav_bytes,
+                file_name=f"{file_stem}.wav",
+                mime="audio/wav",
+                key=f"{key}_wav",
+            )
+
+        # A fragment's interval is fixed when it is defined, so one full rerun
+        # redefines it without polling
+        if pending and all(future.done() for future in variants.values()):
+            st.rerun()
+
+    _downloads()
+
+
+def pdf_download(label, file_name, build_fn, *args, key):
+    """Download button for a PDF that is only built once someone asks for it.
+
+    The PDF is cached by its inputs, so after the first build the download
+    button shows straight away on every rerun.
+    """
+    digest = pdf.content_key(build_fn.__name__, *args)
+    built = pdf.cached(digest)
+
+    if built is None:
+        if not st.button(f"📄 Prepare {label}", key=f"{key}_prepare"):
+            return
+        with st.spinner("📄 Building PDF..."):
+            built = pdf.build(digest, build_fn, *args)
+
+    st.download_button(
+        f"📥 {label}",
+        data=built.data,
+        file_name=file_name,
+        mime="application/pdf",
+        key=key,
+        help=f"{built.pages} pages, built in {built.seconds:.2f}s ({built.seconds_per_page:.3f}s/page)",
+    )
+
+
+# ---------------- BACKGROUND JOBS ----------------
+def session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+
+def start_job(state_key, name, fn, *args, inputs=None, **kwargs):
+    """Submit ``fn`` to the shared executor and remember it under ``state_key``.
+
+    If any session already has an identical job running (same name, function
+    and arguments), this one joins it. A different job already running under
+    the same key is let go of as superseded. The id is mirrored into the URL
+    so a page reload picks the job back up. ``inputs`` is whatever the result
+    depends on; see ``poll_job``.
+    """
+    owner = session_id()
+    previous = st.session_state.get(state_key)
+
+    key = singleflight.flight_key(name, fn, args, kwargs)
+    job_id = jobs.submit(name, fn, *args, owner=owner, inputs=inputs, key=key, **kwargs)
+    # A double-click lands on the job it already started
+    if previous and previous != job_id:
+        jobs.cancel_job(previous, cancel.SUPERSEDED, owner=owner)
+    st.session_state[state_key] = job_id
+    st.query_params[state_key] = job_id
+    return job_id
+
+
+def job_running(state_key):
+    return bool(st.session_state.get(state_key))
+
+
+def _show_job_messages(state_key):
+    for level, text in st.session_state.pop(f"{state_key}_messages", []):
+        getattr(st, level)(text)
+
+
+def _forget_job(state_key):
+    st.session_state.pop(state_key, None)
+    if state_key in st.query_params:
+        del st.query_params[state_key]
+
+
+def _finish_job(state_key, job, on_done):
+    _forget_job(state_key)
+
+    if job is None:
+        return
+
+    messages = [("warning", text) for text in job.notices]
+    if job.status == jobs.DONE:
+        on_done(job.result)
+    elif job.status == jobs.CANCELLED:
+        messages = [("info", STOPPED_MESSAGE)]
+    else:
+        messages.append(("error", job.error))
+    st.session_state[f"{state_key}_messages"] = messages
+
+
+def poll_job(state_key, on_done, label="Working…", render_partial=None, inputs=None, interval=POLL_INTERVAL):
+    """Show progress for the job under ``state_key`` until it finishes.
+
+    Runs as a fragment, so only this block re-executes while polling. When the
+    job ends ``on_done(result)`` is called and the whole page reruns once to
+    render the result; errors and notices are shown on that rerun.
+
+    If ``inputs`` no longer matches what the job was started with, the job is
+    cancelled rather than left to finish work nobody will see; if other
+    sessions joined it, this session just stops following it.
+    """
+    _show_job_messages(state_key)
+
+    if state_key not in st.session_state and state_key in st.query_params:
+        st.session_state[state_key] = st.query_params[state_key]
+
+    job_id = st.session_state.get(state_key)
+    if not job_id:
+        return
+
+    job = jobs.get(job_id, touch=True)
+    if job is not None and inputs is not None and job.inputs is not None and job.inputs != inputs:
+        if not jobs.cancel_job(job_id, cancel.INPUTS_CHANGED, owner=session_id()) and not job.finished:
+            _forget_job(state_key)
+            st.info(STOPPED_MESSAGE)
+            return
+
+    @st.fragment(run_every=interval)
+    def _poll():
+        job = jobs.get(job_id, touch=True)
+
+        if job is None or job.finished:
+            _finish_job(state_key, job, on_done)
+            st.rerun()
+
+        st.progress(job.progress, text=job.message or label)
+        if render_partial:
+            render_partial(job.partial)
+
+    _poll()